@@ -1,6 +1,7 @@
 import os
 import json
 import asyncio
+import shutil
 import uuid
 from typing import List, Optional
 from queue import Queue
@@ -8,9 +9,10 @@ from threading import Thread
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse
-from google.cloud import storage
 
 from src.service import run_pipeline
+from src.archive_source import is_archive
+from src.storage import create_storage_client
 from src.adapters.registry import get_registry
 
 app = FastAPI(title="Database to BigQuery Agentic Migration API")
@@ -25,7 +27,7 @@ def _list_gcs_buckets(project_id: str = "dan-sandpit") -> list[str]:
     select both the source and archive buckets from dropdowns.
     """
     try:
-        client = storage.Client(project=project_id)
+        client = create_storage_client(project_id)
         return sorted([b.name for b in client.list_buckets()])
     except Exception:
         # Fail soft: if listing fails, return an empty list and the
@@ -236,12 +238,25 @@ async def index():
               <label>GCP Project ID
                 <input type="text" name="project" value="{project_id}" />
               </label>
+              <label>Archive object (optional)
+                <input type="text" name="archive_object" placeholder="e.g. Files for POC/WarehouseFiles.zip" />
+              </label>
+              <label>Object prefix (optional)
+                <input type="text" name="prefix" placeholder="e.g. input/" />
+              </label>
+              <label>Include / exclude globs (optional, comma-separated)
+                <input type="text" name="include" placeholder="Include, e.g. *.sql, *.xml" />
+                <input type="text" name="exclude" placeholder="Exclude, e.g. archive/*" />
+              </label>
               <label>Archive results to GCS bucket (optional)
                 <select name="archive_bucket">
                   <option value="">-- None --</option>
                   {_options()}
                 </select>
               </label>
+              <label>Baseline run ID (optional)
+                <input type="text" name="baseline_run_id" placeholder="Re-analyse only files changed since this run" />
+              </label>
               <div class="inline-option">
                 <input type="checkbox" name="skip_analysis" value="true" />
                 <span>Skip analysis (reuse existing <code>analysis_results.json</code> for this run)</span>
@@ -271,12 +286,15 @@ async def index():
                   {_source_system_options("sybase")}
                 </select>
               </label>
-              <label>Files
+              <label>Files (or one .zip / .tar.gz archive)
                 <input type="file" name="files" multiple required />
               </label>
               <label>GCP Project ID
                 <input type="text" name="project" value="dan-sandpit" />
               </label>
+              <label>Baseline run ID (optional)
+                <input type="text" name="baseline_run_id" placeholder="Re-analyse only files changed since this run" />
+              </label>
               <div class="inline-option">
                 <input type="checkbox" name="skip_analysis" value="true" />
                 <span>Skip analysis (not usually needed for uploads)</span>
@@ -541,19 +559,31 @@ async def start_run_gcs(
     project: Optional[str] = Form(None),
     archive_bucket: Optional[str] = Form(None),
     skip_analysis: bool = Form(False),
+    baseline_run_id: Optional[str] = Form(None),
+    prefix: Optional[str] = Form(None),
+    include: Optional[str] = Form(None),
+    exclude: Optional[str] = Form(None),
+    archive_object: Optional[str] = Form(None),
     categorize: bool = Form(False),
     translate: bool = Form(False),
     run_validation: bool = Form(False),
 ):
     run_id = str(uuid.uuid4())
+    archive_object = (archive_object or "").strip()
     
     config = {
-        "source_type": "gcs",
+        # A ZIP / tar.gz object is read in place rather than listing the bucket
+        "source_type": "archive" if archive_object else "gcs",
+        "archive": f"gs://{bucket}/{archive_object}" if archive_object else None,
         "bucket": bucket,
+        "prefix": (prefix or "").strip() or None,
+        "include": include or None,
+        "exclude": exclude or None,
         "source_system": source_system,
         "project": project,
         "archive_bucket": archive_bucket,
         "skip_analysis": skip_analysis,
+        "baseline_run_id": (baseline_run_id or "").strip() or None,
         "categorize": categorize,
         "translate": translate,
         "validate": run_validation,
@@ -586,6 +616,7 @@ async def start_run_local(
     project: Optional[str] = Form(None),
     archive_bucket: Optional[str] = Form(None),
     skip_analysis: bool = Form(False),
+    baseline_run_id: Optional[str] = Form(None),
     categorize: bool = Form(False),
     translate: bool = Form(False),
     run_validation: bool = Form(False),
@@ -598,18 +629,23 @@ async def start_run_local(
     local_paths = []
     for f in files:
         dest_path = os.path.join(input_dir, f.filename)
-        content = await f.read()
+        # Copied in chunks: uploads may be whole-estate archives
         with open(dest_path, "wb") as out:
-            out.write(content)
+            shutil.copyfileobj(f.file, out)
         local_paths.append(dest_path)
 
+    # A single uploaded archive is analysed member by member without being extracted
+    archive = local_paths[0] if len(local_paths) == 1 and is_archive(local_paths[0]) else None
+
     config = {
-        "source_type": "local",
+        "source_type": "archive" if archive else "local",
+        "archive": archive,
         "local_files": local_paths,
         "source_system": source_system,
         "project": project,
         "archive_bucket": archive_bucket,
         "skip_analysis": skip_analysis,
+        "baseline_run_id": (baseline_run_id or "").strip() or None,
         "categorize": categorize,
         "translate": translate,
         "validate": run_validation,
@@ -656,6 +692,7 @@ async def run_summary(request: Request, run_id: str):
     validation_tests = _maybe(os.path.join(output_dir, "validation_tests.json"))
     validation_report = _maybe(os.path.join(output_dir, "validation_report.txt"))
     type_mapping_report = _maybe(os.path.join(output_dir, "type_mapping_report.txt"))
+    llm_metrics_json = _maybe(os.path.join(output_dir, "llm_metrics.json"))
 
     dataform_dir = os.path.join(output_dir, "dataform")
     has_dataform = os.path.isdir(dataform_dir)
@@ -675,12 +712,22 @@ async def run_summary(request: Request, run_id: str):
         "validation_tests": _download_url(validation_tests),
         "validation_report": _download_url(validation_report),
         "type_mapping_report": _download_url(type_mapping_report),
+        "llm_metrics": _download_url(llm_metrics_json),
         "dataform_root": f"/runs/{run_id}/files/dataform" if has_dataform else None,
     }
 
+    llm_usage = None
+    if llm_metrics_json:
+        try:
+            with open(llm_metrics_json, "r", encoding="utf-8") as f:
+                llm_usage = json.load(f).get("totals")
+        except Exception:
+            # Fail soft: the summary page still lists the artefacts.
+            llm_usage = None
+
     accept = request.headers.get("accept", "")
     if "application/json" in accept:
-        return JSONResponse({"run_id": run_id, "artefacts": artefacts})
+        return JSONResponse({"run_id": run_id, "artefacts": artefacts, "llm_usage": llm_usage})
 
     # Simple HTML summary page
     def _row(label: str, key: str) -> str:
@@ -699,10 +746,34 @@ async def run_summary(request: Request, run_id: str):
             _row("Validation tests (JSON)", "validation_tests"),
             _row("Validation report", "validation_report"),
             _row("Type mapping report", "type_mapping_report"),
+            _row("LLM metrics (JSON)", "llm_metrics"),
             _row("Dataform project root", "dataform_root"),
         ]
     )
 
+    usage_html = ""
+    if llm_usage:
+        latency = llm_usage.get("latency_seconds", {})
+        usage_rows = "".join(
+            f"<tr><td>{label}</td><td>{value}</td></tr>"
+            for label, value in [
+                ("LLM calls", f"{llm_usage.get('llm_calls', 0)} ({llm_usage.get('cache_hits', 0)} cached, "
+                              f"{llm_usage.get('coalesced', 0)} coalesced, {llm_usage.get('errors', 0)} errors)"),
+                ("Retries", llm_usage.get("retries", 0)),
+                ("Prompt tokens", f"{llm_usage.get('prompt_tokens', 0):,}"),
+                ("Output tokens", f"{llm_usage.get('output_tokens', 0):,}"),
+                ("Latency p50 / p95 / p99", f"{latency.get('p50', 0)}s / {latency.get('p95', 0)}s / {latency.get('p99', 0)}s"),
+                ("Estimated cost", f"${llm_usage.get('estimated_cost_usd', 0):.4f}"),
+            ]
+        )
+        usage_html = f"""
+      <h2>LLM usage</h2>
+      <table>
+        <tbody>
+          {usage_rows}
+        </tbody>
+      </table>"""
+
     html = f"""<!doctype html>
     <html>
     <head>
@@ -728,6 +799,7 @@ async def run_summary(request: Request, run_id: str):
           {rows}
         </tbody>
       </table>
+      {usage_html}
       <p><a href="/">Back to start</a></p>
     </body>
     </html>"""
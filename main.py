@@ -9,19 +9,45 @@ def main():
     parser.add_argument("--categorize", action="store_true", help="Run data categorization after analysis")
     parser.add_argument("--translate", action="store_true", help="Run schema translation to BigQuery/Dataform")
     parser.add_argument("--validate", action="store_true", help="Generate validation test cases from analysis results")
+    parser.add_argument("--source-system", help="Source system config name (e.g. sybase, oracle)")
+    parser.add_argument("--prefix", help="Only analyse objects under this bucket prefix")
+    parser.add_argument("--include", nargs="+", help="Only analyse files matching these globs (e.g. '*.sql' 'input/*')")
+    parser.add_argument("--exclude", nargs="+", help="Skip files matching these globs")
+    parser.add_argument("--local-files", nargs="+", help="Analyze these local files instead of a GCS bucket")
+    parser.add_argument("--archive", help="Analyze the members of a .zip / .tar.gz (local path or gs:// URI) without extracting it")
+    parser.add_argument("--llm-backend", choices=["vertex", "record", "replay"], help="LLM backend (default: LLM_BACKEND or vertex)")
+    parser.add_argument("--cassette", help="JSONL cassette to record to or replay from")
+    parser.add_argument("--baseline-run-id", help="Reuse analysis of unchanged files from this earlier run")
     args = parser.parse_args()
 
     config = {
-        "source_type": "gcs",
+        "source_type": "archive" if args.archive else "local" if args.local_files else "gcs",
+        "archive": args.archive,
         "bucket": args.bucket,
+        "local_files": args.local_files or [],
+        "prefix": args.prefix,
+        "include": args.include,
+        "exclude": args.exclude,
+        "source_system": args.source_system,
         "project": args.project,
         "skip_analysis": args.skip_analysis,
         "categorize": args.categorize,
         "translate": args.translate,
         "validate": args.validate,
+        "llm_backend": args.llm_backend,
+        "llm_cassette": args.cassette,
+        "baseline_run_id": args.baseline_run_id,
     }
 
-    run_pipeline(config)
+    result = run_pipeline(config)
+    print(f"Run {result['run_id']}")
+    if result.get("incremental"):
+        inc = result["incremental"]
+        print(f"Incremental vs {inc['baseline_run_id']}: {inc['reused']} reused, {inc['analyzed']} analysed, {inc['removed']} removed")
+    dedup = result.get("dedup", {})
+    if dedup.get("duplicate_files") or dedup.get("content_duplicate_files"):
+        print(f"Duplicates: {dedup['duplicate_files']} identical, {dedup['content_duplicate_files']} same content (see dedup_report.json)")
+    print(f"Stage timings (s): {result['stage_timings']} - total {result['total_seconds']}s")
 
 if __name__ == "__main__":
     main()
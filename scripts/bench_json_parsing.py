@@ -0,0 +1,217 @@
+"""
+Micro-benchmark for src/json_utils.py over a corpus of real LLM answers.
+
+The corpus is the raw "analysis" text of analysis_results.json files and the
+"response" text of LLM cassettes (see src/llm_backends.py). Each answer is
+parsed as-is, and again after each of a set of mistakes LLMs make
+(trailing commas, unquoted keys, apostrophes, unescaped quotes, raw
+newlines, SQL backslashes, comments, prose around the JSON). A variant
+counts as correct only if it parses to the same value as the clean answer;
+ambiguous variants (quoted items inside a string) are correct only if
+parsing fails rather than inventing keys.
+Each clean answer is also cut in half, as at the output token limit, to
+count how many truncated answers still yield an object.
+Large answers are tiled into a multi-hundred-KB document to measure
+throughput at Informatica scale.
+
+    python scripts/bench_json_parsing.py
+    python scripts/bench_json_parsing.py --baseline-rev <git rev> --corpus cassettes/poc.jsonl
+
+--baseline-rev loads src/json_utils.py as of that revision from git and
+benchmarks it side by side.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src import json_utils  # noqa: E402
+
+DEFAULT_CORPUS = ["output/analysis_results.json", "runs/*/analysis_results.json"]
+# Target size of the tiled large document
+LARGE_DOCUMENT_BYTES = 400_000
+
+
+def load_corpus(patterns):
+    texts = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if path.endswith(".jsonl"):
+                with open(path, encoding="utf-8") as f:
+                    texts.extend(json.loads(line).get("response") for line in f if line.strip())
+                continue
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                texts.extend(v.get("analysis") for v in data.values() if isinstance(v, dict))
+    return [t for t in texts if isinstance(t, str) and not t.startswith(("Error", "Skipped"))]
+
+
+def _first_string_value(text, transform):
+    """Apply `transform` to the first `"key": "value"` string value in text."""
+    match = re.search(r'(:\s*")((?:[^"\\]|\\.)*)(")', text)
+    if not match:
+        return text
+    return text[:match.start(2)] + transform(match.group(2)) + text[match.end(2):]
+
+
+# Text appended, unescaped, to the first string value of an answer
+STRING_MISTAKES = {
+    "apostrophe_in_string": " (the patron's data)",
+    "unescaped_quotes": ' from the "main" table',
+    "raw_newlines_in_string": "\n  -- continued\tline",
+    "sql_backslash": r" LIKE '\d%\_x'",
+}
+
+# Text appended, unescaped, to the first string value that leaves no way to tell
+# where the string ends; the parser should fail (None) rather than invent keys
+AMBIGUOUS_MISTAKES = {
+    "quoted_items_in_string": ' "id", "name" used',
+}
+
+# name -> function producing a malformed copy of a well-formed answer
+STRUCTURE_MISTAKES = {
+    "trailing_commas": lambda t: re.sub(r'(["\d\]}el])(\s*\n\s*[}\]])', r"\1,\2", t),
+    "missing_commas": lambda t: re.sub(r'",(\s*\n\s*")', r'"\1', t, count=3),
+    "missing_commas_same_line": lambda t: re.sub(r'",\s*\n\s*"', '" "', t, count=3),
+    "unquoted_keys": lambda t: re.sub(r'"([A-Za-z_]\w*)"(\s*:)', r"\1\2", t),
+    "comments": lambda t: re.sub(r'(\{\s*\n)', r"\1  // analysis follows\n", t, count=1),
+    "prose_with_braces": lambda t: "Checked {the DDL} as requested.\n" + t.replace("```json", "").replace("```", "")
+                                   + "\nLet me know if {anything} else is needed.",
+    "python_literals": lambda t: re.sub(r":\s*true\b", ": True", re.sub(r":\s*null\b", ": None", t)),
+}
+
+
+def build_cases(corpus):
+    """(variant name, text, expected value) for every corpus answer and mistake."""
+    cases = []
+    for text in corpus:
+        expected = json_utils.safe_parse_json(text)
+        if expected is None:
+            continue
+        cases.append(("clean", text, expected))
+        for name, mistake in STRUCTURE_MISTAKES.items():
+            broken = mistake(text)
+            if broken != text:
+                cases.append((name, broken, expected))
+        for name, added in STRING_MISTAKES.items():
+            broken = _first_string_value(text, lambda v: v + added)
+            if broken != text:
+                # The same text, escaped properly, is what the value should end with
+                escaped = json.dumps(added)[1:-1]
+                cases.append((name, broken, json_utils.safe_parse_json(_first_string_value(text, lambda v: v + escaped))))
+        for name, added in AMBIGUOUS_MISTAKES.items():
+            broken = _first_string_value(text, lambda v: v + added)
+            if broken != text:
+                cases.append((name, broken, None))
+    return cases
+
+
+def build_large(corpus):
+    """One fenced answer of ~LARGE_DOCUMENT_BYTES built by tiling the largest list fields of real answers."""
+    parsed = [json_utils.safe_parse_json(t) for t in sorted(corpus, key=len, reverse=True)[:5]]
+    parsed = [p for p in parsed if isinstance(p, dict)]
+    if not parsed:
+        return None
+    document = {"files": []}
+    while len(json.dumps(document)) < LARGE_DOCUMENT_BYTES:
+        document["files"].extend(parsed)
+    return "```json\n" + json.dumps(document, indent=2) + "\n```"
+
+
+def load_baseline(rev):
+    source = subprocess.run(["git", "show", f"{rev}:src/json_utils.py"], check=True,
+                            capture_output=True, text=True).stdout
+    module = types.ModuleType(f"json_utils@{rev}")
+    exec(compile(source, f"json_utils@{rev}", "exec"), module.__dict__)
+    return module
+
+
+def _throughput(module, texts, repeat):
+    """MB/s parsing `texts` `repeat` times."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            module.safe_parse_json(text)
+    return sum(len(text) for text in texts) * repeat / (time.perf_counter() - start) / 1e6
+
+
+def _latency_ms(module, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        module.safe_parse_json(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench(module, cases, large, repeat):
+    clean = [t for n, t, _ in cases if n == "clean"]
+    by_variant = {}
+    correct = parsed = 0
+    for name, text, expected in cases:
+        value = module.safe_parse_json(text)
+        parsed += value is not None
+        correct += value == expected
+        ok, total = by_variant.get(name, (0, 0))
+        by_variant[name] = (ok + (value == expected), total + 1)
+    return {
+        "by_variant": by_variant,
+        "correct": correct,
+        "parsed": parsed,
+        "truncated_recovered": sum(isinstance(module.safe_parse_json(t[:len(t) // 2]), dict) for t in clean),
+        "clean_mb_per_s": _throughput(module, clean, repeat),
+        "malformed_mb_per_s": _throughput(module, [t for n, t, _ in cases if n != "clean"], repeat),
+        "large_clean_ms": _latency_ms(module, large, repeat) if large else None,
+        "large_malformed_ms": _latency_ms(module, STRUCTURE_MISTAKES["trailing_commas"](large), repeat) if large else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", nargs="+", default=DEFAULT_CORPUS,
+                        help="analysis_results.json files or LLM cassettes (globs allowed)")
+    parser.add_argument("--baseline-rev", help="Also benchmark src/json_utils.py from this git revision")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing iterations")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No LLM answers found in {args.corpus}")
+    cases = build_cases(corpus)
+    large = build_large(corpus)
+    print(f"{len(corpus)} answers, {len(cases)} cases ({sum(len(t) for _, t, _ in cases) / 1e6:.2f} MB), "
+          f"large document {len(large) / 1e3 if large else 0:.0f} KB")
+
+    implementations = [("current", json_utils)]
+    if args.baseline_rev:
+        implementations.insert(0, (f"baseline {args.baseline_rev}", load_baseline(args.baseline_rev)))
+
+    results = [(label, bench(module, cases, large, args.repeat)) for label, module in implementations]
+    variants = sorted({name for name, _, _ in cases})
+    header = f"{'variant':<24}" + "".join(f"{label:>22}" for label, _ in results)
+    print(header)
+    for name in variants:
+        row = f"{name:<24}"
+        for _, result in results:
+            ok, total = result["by_variant"][name]
+            row += f"{f'{ok}/{total}':>22}"
+        print(row)
+    print("-" * len(header))
+    clean_count = str(sum(name == "clean" for name, _, _ in cases))
+    for key, fmt in (("correct", "{:d}/" + str(len(cases))), ("parsed", "{:d}/" + str(len(cases))),
+                     ("truncated_recovered", "{:d}/" + clean_count),
+                     ("clean_mb_per_s", "{:.1f} MB/s"), ("malformed_mb_per_s", "{:.1f} MB/s"),
+                     ("large_clean_ms", "{:.1f} ms"), ("large_malformed_ms", "{:.1f} ms")):
+        print(f"{key:<24}" + "".join(f"{fmt.format(r[key]) if r[key] is not None else '-':>22}" for _, r in results))
+
+
+if __name__ == "__main__":
+    main()
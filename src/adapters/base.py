@@ -305,6 +305,18 @@ class SourceAdapter:
         # Fall back to top-level function_mappings
         return self._config.get('function_mappings', {})
     
+    # =========================================================================
+    # DDL Parsing
+    # =========================================================================
+    
+    def get_ddl_parsing_config(self) -> Dict[str, Any]:
+        """Get local DDL parser settings (enabled, min_confidence, index_types, ...)."""
+        return self._config.get('ddl_parsing', {})
+    
+    def get_procedure_analysis_config(self) -> Dict[str, Any]:
+        """Get static procedure analysis settings (enabled)."""
+        return self._config.get('procedure_analysis', {})
+    
     # =========================================================================
     # Prompts
     # =========================================================================
@@ -1,35 +1,74 @@
+import asyncio
+import io
+import json
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import xml.etree.ElementTree as ET
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
-from src.llm_client import LLMClient
-from src.prompts import SCHEMA_ANALYSIS_PROMPT, SP_ANALYSIS_PROMPT, INFORMATICA_ANALYSIS_PROMPT
+from src.llm_client import LLMClient, field_progress_callback
+from src.prompts import (
+    SCHEMA_ANALYSIS_PROMPT, SP_ANALYSIS_PROMPT, INFORMATICA_ANALYSIS_PROMPT, INFORMATICA_LOGIC_PROMPT,
+    PROCEDURE_SUMMARY_PROMPT, PACKED_FILES_INSTRUCTIONS,
+)
 from src.adapters.registry import get_adapter
 from src.adapters.base import SourceAdapter
+from src.concurrency import run_sync
+from src.blob_cache import decode_bytes
+from src.preprocess import preprocess_content
+from src.ddl_parser import DDLParser
+from src.chunking import CHUNKING_ENABLED, CHUNK_TOKEN_BUDGET, SPLITTERS, merge_partial_analyses, pack_units
+from src.json_utils import PARTIAL_KEY, is_partial
+from src.procedure_analyzer import ProcedureAnalyzer
+from src.informatica_parser import STREAMING_ENABLED as INFORMATICA_STREAMING_ENABLED, parse_informatica_xml
+from src.models import analysis_object, build_object
 
-# Max parallel LLM calls - balance between speed and API rate limits
-MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", "5"))
+# Small DDL files are packed several to a prompt to cut round-trips
+PACKING_ENABLED = os.getenv("ANALYSIS_PACKING_ENABLED", "true").lower() == "true"
+PACK_TOKEN_BUDGET = int(os.getenv("ANALYSIS_PACK_TOKEN_BUDGET", "6000"))
+PACK_MAX_FILE_TOKENS = int(os.getenv("ANALYSIS_PACK_MAX_FILE_TOKENS", "1500"))
+# Bounds the response size, which grows with every table in the pack
+PACK_MAX_FILES = int(os.getenv("ANALYSIS_PACK_MAX_FILES", "8"))
+
+# Packable DDL files grouped per packing pass when files arrive as a stream
+STREAM_PACK_FILES = int(os.getenv("ANALYSIS_STREAM_PACK_FILES", str(PACK_MAX_FILES * 4)))
+
+# Raw Informatica XML is cut to this many characters when chunking is off; with
+# chunking on, oversized files are split first, so the cap would only drop the
+# tail of every large chunk
+XML_PROMPT_MAX_CHARS = 30000
+
+# Model router task per file type
+ANALYSIS_TASKS = {
+    "sybase_ddl": "ddl_analysis",
+    "sql_transformation": "procedure_analysis",
+    "informatica_xml": "etl_analysis",
+}
+
+
+async def _as_async_iter(files):
+    if hasattr(files, "__aiter__"):
+        async for blob in files:
+            yield blob
+    else:
+        for blob in files:
+            yield blob
 
 
 class AnalysisEngine:
-    def __init__(self, project_id="dan-sandpit", source_system: Optional[str] = None):
-        self.llm_client = LLMClient(project_id)
+    def __init__(self, project_id="dan-sandpit", source_system: Optional[str] = None, llm_client: Optional[LLMClient] = None):
+        self.llm_client = llm_client or LLMClient(project_id)
         self.adapter = get_adapter(source_system)
+        self.ddl_parser = DDLParser(self.adapter.get_ddl_parsing_config())
+        self.procedure_analyzer = ProcedureAnalyzer(self.adapter.get_procedure_analysis_config())
         logger.info(f"AnalysisEngine initialized for source system: {self.adapter.name}")
 
     def _read_blob_content(self, blob):
-        """Read blob content with encoding fallback."""
+        """Read blob content once as bytes and decode it locally (encoding detected)."""
         try:
-            return blob.download_as_text()
-        except UnicodeDecodeError:
-            try:
-                return blob.download_as_bytes().decode('latin-1')
-            except Exception as e:
-                logger.error(f"Failed to read {blob.name} with fallback encoding: {e}")
-                return None
+            return decode_bytes(blob.download_as_bytes())
         except Exception as e:
             logger.error(f"Failed to read {blob.name}: {e}")
             return None
@@ -50,83 +89,467 @@ class AnalysisEngine:
             return SP_ANALYSIS_PROMPT.format(content=content)
         
         elif file_type == "informatica_xml":
+            if not CHUNKING_ENABLED:
+                content = content[:XML_PROMPT_MAX_CHARS]
             custom_prompt = self.adapter.get_etl_analysis_prompt()
             if custom_prompt:
-                return custom_prompt.format(content=content[:30000], name=self.adapter.name)
-            return INFORMATICA_ANALYSIS_PROMPT.format(content=content[:30000])
+                return custom_prompt.format(content=content, name=self.adapter.name)
+            return INFORMATICA_ANALYSIS_PROMPT.format(content=content)
         
         return None
 
-    def _analyze_single_file(self, blob):
-        """Analyze a single file - designed for parallel execution."""
+    async def _analyze_single_file(self, blob, status_callback=None):
+        """Analyze a single file - designed for concurrent execution on the event loop.
+
+        The response is streamed so that progress is reported as each
+        top-level field of the analysis arrives.
+        """
         try:
             # Use adapter for file categorization
             file_type = self.adapter.categorize_file(blob.name)
             logger.info(f"Analyzing {blob.name} as {file_type}")
+
+            if file_type == "informatica_xml" and INFORMATICA_STREAMING_ENABLED:
+                outcome = await self._analyze_informatica(blob, status_callback)
+                if outcome:
+                    return outcome
             
-            content = self._read_blob_content(blob)
-            
-            analysis_result = "Skipped"
-            if content:
-                prompt = self._get_prompt(file_type, content)
-                if prompt:
-                    analysis_result = self.llm_client.generate_content(prompt)
-                else:
-                    analysis_result = "Skipped - no prompt for file type"
-                    logger.warning(f"No prompt available for {blob.name} (type: {file_type})")
-            else:
-                analysis_result = "Error: Could not read file content"
-                logger.error(f"Could not read content from {blob.name}")
-            
-            return blob.name, {
-                "type": file_type,
-                "analysis": analysis_result
-            }
+            # Blob downloads are blocking I/O - keep them off the event loop
+            content = await asyncio.to_thread(self._read_blob_content, blob)
+            return await self._analyze_content(blob.name, file_type, content, status_callback)
         except Exception as e:
             logger.error(f"Exception analyzing {blob.name}: {e}")
             return blob.name, {
                 "type": "unknown",
-                "analysis": f"Error: {e}"
+                "analysis": f"Error: {e}",
+                "parsed": None,
             }
 
+    async def _analyze_content(self, filename, file_type, content, status_callback=None, preprocess_stats=None):
+        """Prompt the LLM for one file's content (minifying it first unless already done)."""
+        analysis_result = "Skipped"
+        parsed = None
+        if content:
+            parsed = self._parse_locally(filename, file_type, content)
+            if parsed:
+                return parsed
+            if preprocess_stats is None:
+                content, preprocess_stats = self._preprocess(filename, file_type, content)
+            if file_type == "sql_transformation" and self.procedure_analyzer.enabled:
+                outcome = await self._analyze_procedure(filename, content, preprocess_stats, status_callback)
+                if outcome:
+                    return outcome
+            prompt = self._get_prompt(file_type, content)
+            chunks = self._split_oversized(filename, file_type, content, preprocess_stats)
+            if prompt and chunks:
+                return await self._analyze_chunked(filename, file_type, chunks, preprocess_stats)
+            if prompt:
+                analysis_result, parsed = await self.llm_client.agenerate_json(
+                    prompt, stage="analysis", filename=filename, task=ANALYSIS_TASKS.get(file_type),
+                    on_chunk=field_progress_callback("analysis", filename, status_callback),
+                )
+            else:
+                analysis_result = "Skipped - no prompt for file type"
+                logger.warning(f"No prompt available for {filename} (type: {file_type})")
+        else:
+            analysis_result = "Error: Could not read file content"
+            logger.error(f"Could not read content from {filename}")
+        
+        result = {
+            "type": file_type,
+            "analysis": analysis_result,
+            "parsed": build_object(parsed),
+        }
+        if preprocess_stats:
+            result["preprocess"] = preprocess_stats
+        return filename, result
+
+    def _split_oversized(self, filename, file_type, content, preprocess_stats):
+        """Split content over ANALYSIS_CHUNK_TOKEN_BUDGET at logical boundaries; None if it fits."""
+        splitter = SPLITTERS.get(file_type)
+        if not CHUNKING_ENABLED or not splitter or not preprocess_stats:
+            return None
+        if preprocess_stats["minified_tokens"] <= CHUNK_TOKEN_BUDGET:
+            return None
+        chunks = splitter(content, CHUNK_TOKEN_BUDGET)
+        if len(chunks) < 2:
+            # No logical boundary inside the content: cut it at lines rather than send it whole
+            chunks = pack_units([content], CHUNK_TOKEN_BUDGET)
+        logger.info(f"Splitting {filename} (~{preprocess_stats['minified_tokens']} tokens) into {len(chunks)} chunks")
+        return chunks
+
+    async def _analyze_chunked(self, filename, file_type, chunks, preprocess_stats):
+        """Analyze chunks of one file concurrently and merge their partial JSON answers."""
+        async def _chunk(index, chunk):
+            try:
+                return await self.llm_client.agenerate_json(
+                    self._get_prompt(file_type, chunk), stage="analysis_chunk", filename=filename,
+                    task=ANALYSIS_TASKS.get(file_type),
+                )
+            except Exception as e:
+                logger.warning(f"Chunk {index + 1}/{len(chunks)} of {filename} failed: {e}")
+                return None, None
+
+        answers = await asyncio.gather(*[_chunk(i, chunk) for i, chunk in enumerate(chunks)])
+        partials = [parsed for _, parsed in answers if isinstance(parsed, dict)]
+        merged = merge_partial_analyses(partials) if partials else None
+        if merged is not None:
+            analysis_result = json.dumps(merged, indent=2)
+        else:
+            # Nothing parseable to merge - keep the first raw answer
+            analysis_result = next((text for text, _ in answers if text), "Error: all chunks failed")
+        result = {
+            "type": file_type,
+            "analysis": analysis_result,
+            "parsed": build_object(merged),
+            "preprocess": preprocess_stats,
+            "chunks": len(chunks),
+        }
+        if len(partials) < len(chunks):
+            result["chunk_errors"] = len(chunks) - len(partials)
+            logger.warning(f"{filename}: {result['chunk_errors']}/{len(chunks)} chunks returned no usable JSON")
+        return filename, result
+
+    async def _analyze_procedure(self, filename, content, preprocess_stats, status_callback=None):
+        """Extract procedure dependencies statically; the LLM only writes logic_summary."""
+        try:
+            analysis = self.procedure_analyzer.analyze_file(content)
+        except Exception as e:
+            logger.warning(f"Static analysis of {filename} failed, using LLM: {e}")
+            return None
+        if analysis is None:
+            return None
+
+        facts = {
+            key: ", ".join(analysis[key]) or "(none)"
+            for key in ("tables_read", "tables_modified", "dependencies", "temp_tables")
+        }
+        chunks = self._split_oversized(filename, "sql_transformation", content, preprocess_stats) or [content]
+        answers = await asyncio.gather(*[
+            self.llm_client.agenerate_json(
+                PROCEDURE_SUMMARY_PROMPT.format(content=chunk, name=self.adapter.name, **facts),
+                stage="analysis" if len(chunks) == 1 else "analysis_chunk", filename=filename,
+                task="procedure_analysis", on_chunk=field_progress_callback("analysis", filename, status_callback),
+            )
+            for chunk in chunks
+        ])
+        summary = merge_partial_analyses([parsed for _, parsed in answers if isinstance(parsed, dict)])
+        analysis["logic_summary"] = summary.get("logic_summary") or ""
+
+        result = {
+            "type": "sql_transformation",
+            "analysis": json.dumps(analysis, indent=2),
+            "parsed": build_object(analysis),
+            "preprocess": preprocess_stats,
+            "parsed_by": "procedure_analyzer",
+        }
+        if len(chunks) > 1:
+            result["chunks"] = len(chunks)
+        return filename, result
+
+    def _parse_locally(self, filename, file_type, content):
+        """Parse table DDL without the LLM; returns (filename, result) or None to fall back."""
+        if file_type != "sybase_ddl" or not self.ddl_parser.enabled:
+            return None
+        try:
+            parsed = self.ddl_parser.parse_confident(content)
+        except Exception as e:
+            logger.warning(f"Local DDL parse of {filename} failed, using LLM: {e}")
+            return None
+        if parsed is None:
+            return None
+        logger.info(f"Parsed {filename} locally (confidence {parsed['parse_confidence']})")
+        return filename, {
+            "type": file_type,
+            "analysis": json.dumps(parsed, indent=2),
+            "parsed": build_object(parsed),
+            "parsed_by": "ddl_parser",
+        }
+
+    def _extract_informatica(self, blob):
+        """Stream-parse an Informatica export; returns None if it isn't a well-formed Informatica export."""
+        try:
+            if hasattr(blob, "open"):
+                with blob.open("rb") as stream:
+                    extract = parse_informatica_xml(stream)
+            else:
+                extract = parse_informatica_xml(io.BytesIO(blob.download_as_bytes()))
+        except ET.ParseError as e:
+            logger.warning(f"Streaming parse of {blob.name} failed, sending raw XML: {e}")
+            return None
+        if extract.is_empty():
+            logger.warning(f"No Informatica objects found in {blob.name}, sending raw XML")
+            return None
+        return extract
+
+    async def _analyze_informatica(self, blob, status_callback=None):
+        """Build the ETL analysis from the streamed extract; only expression logic goes to the LLM."""
+        extract = await asyncio.to_thread(self._extract_informatica, blob)
+        if extract is None:
+            return None
+        analysis = extract.to_analysis()
+        # Large exports are split by mapping and the chunk answers merged
+        chunks = extract.logic_chunks()
+        if chunks:
+            prompts = [
+                INFORMATICA_LOGIC_PROMPT.format(
+                    mapping_name=analysis["mapping_name"],
+                    sources=", ".join(analysis["sources"]) or "(none)",
+                    targets=", ".join(analysis["targets"]) or "(none)",
+                    logic=chunk,
+                )
+                for chunk in chunks
+            ]
+            answers = await asyncio.gather(*[
+                self.llm_client.agenerate_json(
+                    prompt, stage="analysis" if len(prompts) == 1 else "analysis_chunk", filename=blob.name,
+                    task="etl_analysis", on_chunk=field_progress_callback("analysis", blob.name, status_callback),
+                )
+                for prompt in prompts
+            ], return_exceptions=True)
+            failures = [a for a in answers if isinstance(a, Exception)]
+            if len(failures) == len(answers):
+                raise failures[0]
+            for failure in failures:
+                logger.warning(f"Logic chunk of {blob.name} failed: {failure}")
+            parsed = merge_partial_analyses([a[1] for a in answers if isinstance(a, tuple) and isinstance(a[1], dict)])
+            if len(chunks) > 1:
+                logger.info(f"Analyzed {blob.name} logic in {len(chunks)} chunks")
+            if parsed:
+                analysis["logic_summary"] = parsed.get("logic_summary") or ""
+                descriptions = parsed.get("transformation_descriptions")
+                if isinstance(descriptions, dict):
+                    for transformation in analysis["transformations"]:
+                        if not transformation["description"] and descriptions.get(transformation["name"]):
+                            transformation["description"] = descriptions[transformation["name"]]
+        if not analysis["logic_summary"]:
+            analysis["logic_summary"] = extract.summary_without_llm()
+        return blob.name, {
+            "type": "informatica_xml",
+            "analysis": json.dumps(analysis, indent=2),
+            "parsed": build_object(analysis),
+            "parsed_by": "informatica_parser",
+            **({"chunks": len(chunks)} if len(chunks) > 1 else {}),
+        }
+
+    def _preprocess(self, filename, file_type, content):
+        # Strip comments, whitespace and XML bookkeeping the prompts never use
+        content, stats = preprocess_content(file_type, content)
+        if stats["tokens_saved"]:
+            logger.info(f"Minified {filename}: ~{stats['tokens_saved']} tokens saved")
+        return content, stats
+
+    async def _analyze_packed(self, blobs, report, status_callback=None):
+        """Analyze small DDL files several to a prompt.
+
+        Files are read up front and parsed locally where possible; the rest
+        are minified and grouped greedily up to
+        PACK_TOKEN_BUDGET. Files too large to pack, alone in their group, or
+        missing from a packed response are analyzed individually. Every blob
+        is passed to `report` exactly once.
+        """
+        file_type = "sybase_ddl"
+        contents = await asyncio.gather(
+            *[asyncio.to_thread(self._read_blob_content, blob) for blob in blobs], return_exceptions=True
+        )
+
+        singles, packs, current, current_tokens = [], [], [], 0
+        for blob, content in zip(blobs, contents):
+            if isinstance(content, Exception) or not content:
+                singles.append((blob, None, None))
+                continue
+            parsed = self._parse_locally(blob.name, file_type, content)
+            if parsed:
+                await report(blob, parsed, None)
+                continue
+            content, stats = self._preprocess(blob.name, file_type, content)
+            tokens = stats["minified_tokens"]
+            if tokens > PACK_MAX_FILE_TOKENS:
+                singles.append((blob, content, stats))
+                continue
+            if current and (current_tokens + tokens > PACK_TOKEN_BUDGET or len(current) >= PACK_MAX_FILES):
+                packs.append(current)
+                current, current_tokens = [], 0
+            current.append((blob, content, stats))
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+        # A pack of one saves nothing and makes the response harder to parse
+        singles.extend(pack[0] for pack in packs if len(pack) == 1)
+        packs = [pack for pack in packs if len(pack) > 1]
+
+        packed_files = sum(len(pack) for pack in packs)
+        if packs:
+            logger.info(f"Packing {packed_files} small DDL files into {len(packs)} prompts")
+
+        async def _single(blob, content, stats):
+            try:
+                await report(blob, await self._analyze_content(blob.name, file_type, content, status_callback, stats), None)
+            except Exception as e:
+                await report(blob, None, e)
+
+        await asyncio.gather(
+            *[_single(*entry) for entry in singles],
+            *[self._analyze_pack(pack, file_type, report, _single) for pack in packs],
+        )
+
+    async def _analyze_pack(self, pack, file_type, report, retry_single):
+        """Send one packed prompt and split the keyed JSON response back per file."""
+        names = [blob.name for blob, _, _ in pack]
+        packed_content = "\n\n".join(f"=== FILE: {blob.name} ===\n{content}" for blob, content, _ in pack)
+        prompt = self._get_prompt(file_type, packed_content) + PACKED_FILES_INSTRUCTIONS.format(
+            count=len(pack), filenames=", ".join(names)
+        )
+
+        try:
+            _, parsed = await self.llm_client.agenerate_json(
+                prompt, stage="analysis_packed", filename=names[0], task=ANALYSIS_TASKS[file_type]
+            )
+        except Exception as e:
+            logger.warning(f"Packed analysis of {len(pack)} files failed: {e}")
+            parsed = None
+        if not isinstance(parsed, dict):
+            parsed = {}
+        elif is_partial(parsed):
+            # The answer was cut off inside its last file's entry: analyse that file on its own
+            cut_off = [name for name in parsed if name != PARTIAL_KEY][-1:]
+            parsed = {name: entry for name, entry in parsed.items() if name not in cut_off}
+
+        retries = []
+        for blob, content, stats in pack:
+            entry = parsed.get(blob.name)
+            if not isinstance(entry, dict):
+                retries.append((blob, content, stats))
+                continue
+            await report(blob, (blob.name, {
+                "type": file_type,
+                "analysis": json.dumps(entry, indent=2),
+                "parsed": build_object(entry),
+                "preprocess": stats,
+                "packed_with": len(pack),
+            }), None)
+
+        if retries:
+            logger.info(f"Packed response missing {len(retries)}/{len(pack)} files; retrying them individually")
+            await asyncio.gather(*[retry_single(*entry) for entry in retries])
+
     def analyze(self, files, status_callback=None):
-        """Analyzes the provided files in parallel."""
+        """Analyzes the provided files concurrently on a single event loop.
+
+        In-flight LLM calls are bounded by the client's adaptive concurrency
+        limiter rather than a fixed worker pool. Small DDL files are packed
+        several to a prompt unless ANALYSIS_PACKING_ENABLED=false. `files` is a
+        list or an async iterator of blobs (see src/ingestion.py).
+        """
+        return run_sync(self._analyze_async(files, status_callback))
+
+    async def _analyze_async(self, files, status_callback=None, on_result=None):
+        """Analyze files; `on_result(filename, result)` is awaited as each one completes.
+
+        When `files` is an async iterator, analysis starts on each file as it
+        arrives. Packable DDL files are then grouped STREAM_PACK_FILES at a
+        time rather than all together. Each blob's release() hook, if any, is
+        called once its result is in.
+        """
         results = {}
-        total_files = len(files)
+        streamed = not isinstance(files, (list, tuple))
+        total_files = None if streamed else len(files)
+        submitted = 0
         completed = 0
         
         if status_callback:
-            status_callback("analysis", f"Starting parallel analysis of {total_files} files...", 0, total_files)
+            status_callback("analysis", f"Starting parallel analysis of {total_files or 'streamed'} files...", 0, total_files)
         
-        # Use ThreadPoolExecutor for parallel LLM calls
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            # Submit all tasks
-            future_to_blob = {
-                executor.submit(self._analyze_single_file, blob): blob 
-                for blob in files
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_blob):
-                blob = future_to_blob[future]
-                completed += 1
-                try:
-                    filename, result = future.result()
-                    results[filename] = result
-                    
-                    if status_callback:
-                        status_callback("analysis", f"Analyzed {completed}/{total_files}: {blob.name}", completed, total_files)
-                        
-                except Exception as e:
-                    # Even on exception, add an error result so we don't lose track of the file
-                    logger.error(f"Future exception for {blob.name}: {e}")
-                    results[blob.name] = {
-                        "type": "unknown",
-                        "analysis": f"Error: {e}"
-                    }
-                    if status_callback:
-                        status_callback("analysis", f"Error {completed}/{total_files}: {blob.name}", completed, total_files)
+        done = asyncio.Queue()
+        reported = set()
+
+        async def _report(blob, outcome, error):
+            reported.add(id(blob))
+            await done.put((blob, outcome, error))
+
+        async def _run(blob):
+            try:
+                await _report(blob, await self._analyze_single_file(blob, status_callback), None)
+            except Exception as e:
+                await _report(blob, None, e)
+
+        async def _run_packed(blobs):
+            try:
+                await self._analyze_packed(blobs, _report, status_callback)
+            except Exception as e:
+                # Don't leave the collector waiting on files the packer never reported
+                for blob in blobs:
+                    if id(blob) not in reported:
+                        await _report(blob, None, e)
+
+        tasks = []
+
+        async def _feed():
+            nonlocal submitted
+            packable = []
+            async for blob in _as_async_iter(files):
+                submitted += 1
+                if PACKING_ENABLED and self.adapter.categorize_file(blob.name) == "sybase_ddl":
+                    packable.append(blob)
+                    if streamed and len(packable) >= STREAM_PACK_FILES:
+                        tasks.append(asyncio.create_task(_run_packed(packable)))
+                        packable = []
+                else:
+                    tasks.append(asyncio.create_task(_run(blob)))
+            if packable:
+                tasks.append(asyncio.create_task(_run_packed(packable)))
+
+        feeder = asyncio.create_task(_feed())
+        feeder.add_done_callback(lambda _: done.put_nowait(None))
+
+        # Collect results as they complete; None marks the end of the input
+        fed = False
+        while not fed or completed < submitted:
+            item = await done.get()
+            if item is None:
+                fed = True
+                continue
+            blob, outcome, error = item
+            completed += 1
+            total = total_files or (submitted if fed else None)
+            if error is None:
+                filename, result = outcome
+                results[filename] = result
+                
+                if status_callback:
+                    status_callback("analysis", f"Analyzed {completed}/{total or '?'}: {blob.name}", completed, total)
+            else:
+                # Even on exception, add an error result so we don't lose track of the file
+                logger.error(f"Task exception for {blob.name}: {error}")
+                filename = blob.name
+                results[filename] = {
+                    "type": "unknown",
+                    "analysis": f"Error: {error}",
+                    "parsed": None,
+                }
+                if status_callback:
+                    status_callback("analysis", f"Error {completed}/{total or '?'}: {blob.name}", completed, total)
+            release = getattr(blob, "release", None)
+            if release:
+                # Prefetched content is no longer needed
+                release()
+            # Parse once here; every later stage reads results[filename]["parsed"]
+            analysis_object(results[filename])
+            if on_result:
+                # Downstream per-file stages start on this file while the rest are still in flight
+                await on_result(filename, results[filename])
+        # Surfaces listing or download errors raised by the input stream
+        await feeder
+        await asyncio.gather(*tasks)
+        total_files = submitted
         
+        parsed_locally = sum(1 for r in results.values() if r.get("parsed_by") == "ddl_parser")
+        if parsed_locally:
+            logger.info(f"Parsed {parsed_locally}/{total_files} DDL files locally without the LLM")
+        tokens_saved = sum(r.get("preprocess", {}).get("tokens_saved", 0) for r in results.values())
+        if tokens_saved:
+            logger.info(f"Prompt preprocessing saved ~{tokens_saved} tokens across {total_files} files")
+
         if status_callback:
             status_callback("analysis", f"Analysis complete: {len(results)} files processed", total_files, total_files)
         
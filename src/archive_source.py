@@ -0,0 +1,199 @@
+"""
+Archive sources: analyse the members of a ZIP or tar.gz estate without unpacking it.
+
+Members behave like blobs (``name``, ``size``, ``download_as_text()``,
+``download_as_bytes()``, ``open("rb")``), so they flow through planning,
+dedup, the manifest and analysis like any other file. Their names are
+``<archive file name>/<member path>``.
+
+- ZIP: members are listed from the central directory and each one is
+  decompressed on demand when it is read. Reads run in parallel on the
+  ingestion download pool. Each thread opens its own ZipFile over its own
+  reader, so concurrent members don't contend for one file position. Archives
+  in GCS are read with ranged requests (``blob.open("rb")``) and never
+  downloaded in full.
+- tar.gz: gzip can't be read at random offsets, so the archive is streamed
+  once, front to back. Each member's bytes are read as it is passed and
+  handed to analysis. At most ``buffer_size`` members are held in memory
+  until analysis releases them, which bounds memory for any archive size.
+
+Nothing is extracted to disk.
+"""
+import hashlib
+import io
+import logging
+import os
+import tarfile
+import threading
+import zipfile
+from typing import Callable, Iterator, Optional
+
+from src.blob_cache import decode_bytes
+from src.ingestion import PREFETCH_FILES, PrefetchedBlob
+from src.storage import create_storage_client
+
+logger = logging.getLogger(__name__)
+
+# Range-request size when reading archives from GCS
+READ_CHUNK_BYTES = int(os.getenv("ARCHIVE_READ_CHUNK_KB", "1024")) * 1024
+
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar.gz", ".tgz", ".tar")
+# Operating-system bookkeeping that ships inside archives
+_IGNORED_MEMBERS = ("__MACOSX/", ".DS_Store", "Thumbs.db")
+
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ZIP_EXTENSIONS + TAR_EXTENSIONS)
+
+
+def _ignored(member_path: str) -> bool:
+    base = member_path.rsplit("/", 1)[-1]
+    return member_path.startswith(_IGNORED_MEMBERS[0]) or base in _IGNORED_MEMBERS or base.startswith("._")
+
+
+class ZipMember:
+    """One file inside a ZIP archive, decompressed when read."""
+
+    def __init__(self, archive: "ZipArchive", info: zipfile.ZipInfo):
+        self._archive = archive
+        self._info = info
+        self.name = f"{archive.name}/{info.filename}"
+        self.size = info.file_size
+        # Central-directory checksum: lets incremental runs compare members without reading them
+        self.crc32 = f"{info.CRC:08x}"
+
+    def open(self, mode: str = "rb"):
+        if mode != "rb":
+            raise ValueError("archive members are read-only")
+        return self._archive._zip_file().open(self._info)
+
+    def download_as_bytes(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+    def download_as_text(self) -> str:
+        return decode_bytes(self.download_as_bytes())
+
+
+class ZipArchive:
+    """A ZIP archive on local disk or in GCS, read member by member."""
+
+    streamed = False
+
+    def __init__(self, name: str, opener: Callable):
+        self.name = name
+        # Returns a new seekable binary file object for the archive
+        self._opener = opener
+        self._local = threading.local()
+        self._open_files = []
+        self._lock = threading.Lock()
+
+    def _zip_file(self) -> zipfile.ZipFile:
+        """This thread's ZipFile; each has its own reader and file position."""
+        zf = getattr(self._local, "zip_file", None)
+        if zf is None:
+            zf = zipfile.ZipFile(self._opener())
+            self._local.zip_file = zf
+            with self._lock:
+                self._open_files.append(zf)
+        return zf
+
+    def members(self, admit: Optional[Callable] = None) -> Iterator[ZipMember]:
+        for info in self._zip_file().infolist():
+            if info.is_dir() or _ignored(info.filename):
+                continue
+            member = ZipMember(self, info)
+            if admit and not admit(member):
+                continue
+            yield member
+
+    def close(self):
+        with self._lock:
+            for zf in self._open_files:
+                try:
+                    fp = zf.fp
+                    zf.close()
+                    if fp:
+                        fp.close()
+                except Exception:
+                    pass
+            self._open_files = []
+
+
+class _TarEntry:
+    """Metadata of a tar member whose bytes were read as the archive streamed past."""
+
+    def __init__(self, name: str, size: int, content_hash: str):
+        self.name = name
+        self.size = size
+        # Hashed while streaming, so the manifest needn't read the member again
+        self.content_hash = content_hash
+
+    def download_as_bytes(self) -> bytes:
+        raise RuntimeError(f"{self.name} has been released; tar members can only be read while buffered")
+
+    def download_as_text(self) -> str:
+        return decode_bytes(self.download_as_bytes())
+
+    def open(self, mode: str = "rb"):
+        return io.BytesIO(self.download_as_bytes())
+
+
+class TarArchive:
+    """A (gzipped) tar archive on local disk or in GCS, streamed front to back."""
+
+    streamed = True
+
+    def __init__(self, name: str, opener: Callable):
+        self.name = name
+        self._opener = opener
+
+    def members(self, admit: Optional[Callable] = None, buffer_size: int = PREFETCH_FILES) -> Iterator[PrefetchedBlob]:
+        """Buffered members in archive order; call release() on each once it has been analysed.
+
+        Members `admit` rejects are skipped without being read.
+        """
+        slots = threading.BoundedSemaphore(max(1, buffer_size))
+        with self._opener() as raw, tarfile.open(fileobj=raw, mode="r|*") as tar:
+            for info in tar:
+                if not info.isfile() or _ignored(info.name):
+                    continue
+                entry = _TarEntry(f"{self.name}/{info.name.removeprefix('./')}", info.size, "")
+                if admit and not admit(entry):
+                    continue
+                # Waits here while analysis holds `buffer_size` members
+                slots.acquire()
+                with tar.extractfile(info) as f:
+                    data = f.read()
+                entry.content_hash = hashlib.sha256(data).hexdigest()
+                yield PrefetchedBlob(entry, data, on_release=slots.release)
+
+    def close(self):
+        pass
+
+
+def open_archive(location: str, project_id: Optional[str] = None):
+    """ZipArchive or TarArchive for a local path or a gs://bucket/object URI."""
+    name = os.path.basename(location.rstrip("/"))
+    if location.startswith("gs://"):
+        bucket_name, _, object_name = location[len("gs://"):].partition("/")
+        if not object_name:
+            raise ValueError(f"Archive URI has no object name: {location}")
+        blob = create_storage_client(project_id).bucket(bucket_name).blob(object_name)
+
+        def opener():
+            return blob.open("rb", chunk_size=READ_CHUNK_BYTES)
+    else:
+        if not os.path.isfile(location):
+            raise ValueError(f"Archive not found: {location}")
+
+        def opener():
+            return open(location, "rb")
+
+    lower = name.lower()
+    if lower.endswith(ZIP_EXTENSIONS):
+        return ZipArchive(name, opener)
+    if lower.endswith(TAR_EXTENSIONS):
+        return TarArchive(name, opener)
+    raise ValueError(f"Unsupported archive type: {location} (expected .zip, .tar.gz, .tgz or .tar)")
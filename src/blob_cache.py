@@ -0,0 +1,340 @@
+"""
+Local read-through cache for GCS source objects.
+
+Objects are keyed by (bucket, name, generation): a new generation is a new
+entry, so the cache can never serve stale content and needs no validation
+call. Each object is downloaded once, as bytes, and decoded locally
+(decode_bytes), so a file that isn't UTF-8 is no longer fetched a second
+time for the fallback decode. Streamed reads (open) download straight into
+the cache file and read it from disk, so a large export is never held in
+memory. Warm re-runs over an unchanged bucket only list it.
+
+Contents are stored as one file per object under BLOB_CACHE_DIR, with an
+SQLite index of sizes and access times. Entries are evicted
+least-recently-used once the cache exceeds BLOB_CACHE_MAX_MB.
+"""
+import codecs
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("BLOB_CACHE_ENABLED", "true").lower() == "true"
+DEFAULT_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", os.path.join(".cache", "blobs"))
+DEFAULT_MAX_MB = int(os.getenv("BLOB_CACHE_MAX_MB", "2048"))
+
+# Evict down to this fraction of the cap so we don't evict on every write
+_EVICT_TARGET_RATIO = 0.9
+
+# Byte-order marks, longest first so UTF-32 isn't mistaken for UTF-16
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+def detect_encoding(data: bytes) -> str:
+    """Best guess at the encoding of source text.
+
+    BOMs win. Without one, UTF-16 exports (common from SQL Server and Sybase
+    tools) show up as NUL bytes in every other position of ASCII text; then
+    UTF-8 is tried, then Windows-1252, and latin-1 (which decodes anything)
+    is the last resort.
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding
+    sample = data[:4096]
+    if len(sample) >= 4:
+        even_nuls = sample[0::2].count(0)
+        odd_nuls = sample[1::2].count(0)
+        if odd_nuls > len(sample) // 4 and even_nuls == 0:
+            return "utf-16-le"
+        if even_nuls > len(sample) // 4 and odd_nuls == 0:
+            return "utf-16-be"
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            data.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def decode_bytes(data: bytes) -> str:
+    """Decode source bytes with detect_encoding(), dropping any BOM."""
+    encoding = detect_encoding(data)
+    text = data.decode(encoding, errors="replace")
+    return text[1:] if text.startswith("\ufeff") else text
+
+
+def _cache_key(bucket: str, name: str, generation) -> str:
+    return hashlib.sha256(f"{bucket}\0{name}\0{generation}".encode("utf-8")).hexdigest()
+
+
+class BlobContentCache:
+    """Disk-backed LRU cache of object contents.
+
+    A single instance is safe to share between threads. Several processes may
+    also point at the same directory; SQLite's WAL mode serialises writers and
+    content files are written atomically.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_mb: int = DEFAULT_MAX_MB):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, "index.sqlite3")
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                key TEXT PRIMARY KEY,
+                bucket TEXT NOT NULL,
+                name TEXT NOT NULL,
+                generation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access)")
+        self._conn.commit()
+        logger.info(f"Blob content cache opened at {cache_dir}")
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def path_for(self, bucket: str, name: str, generation) -> Optional[str]:
+        """Path of the cached content file, or None on a miss. Marks the entry as used."""
+        key = _cache_key(bucket, name, generation)
+        path = self._file(key)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM blobs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(path) or os.path.getsize(path) != row[0]:
+                # Content file removed or truncated behind our back
+                self._conn.execute("DELETE FROM blobs WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE blobs SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return path
+
+    def _tmp_path(self, key: str) -> str:
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def put(self, bucket: str, name: str, generation, data: bytes):
+        """Store an object's content and evict old entries if the cache is over its cap."""
+        key = _cache_key(bucket, name, generation)
+        tmp_path = self._tmp_path(key)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._file(key))
+        self._index(key, bucket, name, generation, len(data))
+
+    def put_download(self, bucket: str, name: str, generation, blob):
+        """Download `blob` straight into the cache without holding it in memory.
+
+        Returns the cached content opened for reading (still valid if the
+        entry is evicted straight away) and its size.
+        """
+        key = _cache_key(bucket, name, generation)
+        tmp_path = self._tmp_path(key)
+        try:
+            blob.download_to_filename(tmp_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        size = os.path.getsize(tmp_path)
+        path = self._file(key)
+        os.replace(tmp_path, path)
+        stream = open(path, "rb")
+        self._index(key, bucket, name, generation, size)
+        return stream, size
+
+    def _index(self, key: str, bucket: str, name: str, generation, size: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs (key, bucket, name, generation, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, bucket, name, str(generation), size, now, now),
+            )
+            self._conn.commit()
+            self._evict_to_size()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and total stored bytes."""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {"entries": count, "bytes": total, "path": self.cache_dir}
+
+    def _evict_to_size(self):
+        """Evict least-recently-used entries until under the size cap. Caller holds the lock."""
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * _EVICT_TARGET_RATIO)
+        evicted = 0
+        rows = self._conn.execute("SELECT key, size FROM blobs ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM blobs WHERE key = ?", (key,))
+            try:
+                os.remove(self._file(key))
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+        self._conn.commit()
+        logger.info(f"Evicted {evicted} cached blobs (LRU) to stay under {self.max_bytes} bytes")
+
+
+class CachedBlob:
+    """A listed GCS blob whose content is read through a BlobContentCache.
+
+    The object is downloaded at most once per generation, as bytes; text is
+    decoded locally. Listing metadata is read through from the blob.
+    """
+
+    def __init__(self, blob, bucket_name: str, cache: BlobContentCache, counters: Optional["CacheCounters"] = None):
+        self._blob = blob
+        self._bucket_name = bucket_name
+        self._cache = cache
+        self._counters = counters
+
+    def __getattr__(self, attr):
+        return getattr(self._blob, attr)
+
+    def _cached_path(self) -> Optional[str]:
+        """Path of the cached content, or None on a miss (or for objects without a generation)."""
+        generation = getattr(self._blob, "generation", None)
+        if generation is None:
+            return None
+        try:
+            path = self._cache.path_for(self._bucket_name, self._blob.name, generation)
+        except Exception as e:
+            logger.warning(f"Blob cache lookup failed for {self._blob.name}: {e}")
+            return None
+        if path is not None and self._counters:
+            self._counters.hit()
+        return path
+
+    def _fetch(self) -> bytes:
+        """Download the object once and store it for later runs."""
+        data = self._blob.download_as_bytes()
+        if self._counters:
+            self._counters.miss(len(data))
+        generation = getattr(self._blob, "generation", None)
+        if generation is not None:
+            try:
+                self._cache.put(self._bucket_name, self._blob.name, generation, data)
+            except Exception as e:
+                logger.warning(f"Could not cache {self._blob.name}: {e}")
+        return data
+
+    def download_as_bytes(self) -> bytes:
+        path = self._cached_path()
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except OSError:
+                pass
+        return self._fetch()
+
+    def download_as_text(self) -> str:
+        return decode_bytes(self.download_as_bytes())
+
+    def open(self, mode: str = "rb"):
+        if mode != "rb":
+            return self._blob.open(mode)
+        path = self._cached_path()
+        if path is not None:
+            # Streams large exports from disk without loading them
+            try:
+                return open(path, "rb")
+            except OSError:
+                pass
+        generation = getattr(self._blob, "generation", None)
+        if generation is not None:
+            # Miss: stream the download into the cache and read it back from disk
+            try:
+                stream, size = self._cache.put_download(self._bucket_name, self._blob.name, generation, self._blob)
+            except Exception as e:
+                logger.warning(f"Could not stream {self._blob.name} into the blob cache: {e}")
+            else:
+                if self._counters:
+                    self._counters.miss(size)
+                return stream
+        return io.BytesIO(self._fetch())
+
+
+class CacheCounters:
+    """Hits, misses and bytes downloaded through a cache, for one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self, size: int):
+        with self._lock:
+            self.misses += 1
+            self.bytes_downloaded += size
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes_downloaded": self.bytes_downloaded}
+
+
+_default_cache: Optional[BlobContentCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_blob_cache() -> Optional[BlobContentCache]:
+    """Return the process-wide blob cache, or None if it is disabled.
+
+    Controlled by BLOB_CACHE_ENABLED (default true). Failing to open the
+    cache disables it rather than failing the run.
+    """
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = BlobContentCache()
+            except Exception as e:
+                logger.warning(f"Blob content cache unavailable, continuing without it: {e}")
+                return None
+        return _default_cache
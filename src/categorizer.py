@@ -3,15 +3,18 @@ import os
 import logging
 from typing import Optional
 from src.llm_client import LLMClient
-from src.json_utils import safe_parse_json, extract_json, repair_json
+from src.models import Table, analysis_object
 from src.adapters.registry import get_adapter
 
 logger = logging.getLogger(__name__)
 
+# Tables per categorization prompt
+BATCH_SIZE = 8
+
 class DataCategorizer:
-    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None):
+    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None, llm_client: Optional[LLMClient] = None):
         self.output_dir = output_dir
-        self.llm_client = LLMClient(project_id)
+        self.llm_client = llm_client or LLMClient(project_id)
         self.adapter = get_adapter(source_system)
         logger.info(f"DataCategorizer initialized for source system: {self.adapter.name}")
 
@@ -51,27 +54,11 @@ class DataCategorizer:
         
         # Collect all table names and sample columns
         table_summary = []
-        for filename, data in analysis_results.items():
-            analysis = data.get('analysis', '')
-            if 'table_name' in analysis:
-                try:
-                    # Use safe JSON parsing with repair
-                    info = safe_parse_json(analysis)
-                    if not info:
-                        logger.warning(f"Could not parse JSON for {filename}")
-                        continue
-                    
-                    table_name = info.get("table_name")
-                    columns = [col.get("name") for col in info.get("columns", [])][:10]  # First 10 columns
-                    
-                    if table_name:
-                        table_summary.append({
-                            "table": table_name,
-                            "sample_columns": columns
-                        })
-                except Exception as e:
-                    logger.warning(f"Failed to process {filename}: {e}")
-                    continue
+        for table in self._tables(analysis_results):
+            table_summary.append({
+                "table": table.name,
+                "sample_columns": [col.name for col in table.columns][:10]  # First 10 columns
+            })
         
         # Create prompt for domain inference
         prompt = f"""You are analyzing a {self.adapter.name} database schema for a gaming/casino business.
@@ -96,7 +83,7 @@ Focus on domains that are:
 3. Comprehensive enough to cover most tables
 """
 
-        response = self.llm_client.generate_content(prompt)
+        response = self.llm_client.generate_content(prompt, stage="domain_inference", task="domain_inference")
         
         try:
             # Parse domains
@@ -125,46 +112,43 @@ Focus on domains that are:
         logger.info("Categorizing fields...")
         
         categorizations = {}
-        domain_list = "\n".join([f"- {d['domain_name']}: {d['description']}" for d in domains])
+        domain_list = self._format_domains(domains)
+        for batch in self._table_batches(analysis_results):
+            categorizations.update(self._categorize_batch(batch, domain_list))
         
-        # Collect all tables first
+        return categorizations
+
+    def _tables(self, analysis_results):
+        """Parsed tables among the analysis results."""
+        for data in analysis_results.values():
+            table = analysis_object(data)
+            if isinstance(table, Table):
+                yield table
+
+    def _format_domains(self, domains):
+        return "\n".join([f"- {d['domain_name']}: {d['description']}" for d in domains])
+
+    def _table_batches(self, analysis_results):
+        """Collect table names and columns, batched for the categorization prompt."""
         tables_to_categorize = []
-        for filename, data in analysis_results.items():
-            analysis = data.get('analysis', '')
-            if 'table_name' not in analysis:
-                continue
-            
-            try:
-                info = safe_parse_json(analysis)
-                if not info:
-                    continue
-                
-                table_name = info.get("table_name")
-                columns = info.get("columns", [])
-                
-                if table_name and columns:
-                    # Only include column names for efficiency
-                    col_names = [c.get("name", "") for c in columns if c.get("name")]
-                    tables_to_categorize.append({
-                        "table": table_name,
-                        "columns": col_names
-                    })
-            except Exception as e:
-                logger.warning(f"Failed to parse {filename}: {e}")
-                continue
-        
-        if not tables_to_categorize:
-            return categorizations
+        for table in self._tables(analysis_results):
+            if table.columns:
+                # Only include column names for efficiency
+                tables_to_categorize.append({
+                    "table": table.name,
+                    "columns": [col.name for col in table.columns]
+                })
         
         # Batch tables into groups of 5-10 for efficient LLM calls
-        BATCH_SIZE = 8
-        for i in range(0, len(tables_to_categorize), BATCH_SIZE):
-            batch = tables_to_categorize[i:i + BATCH_SIZE]
-            batch_names = [t['table'] for t in batch]
-            logger.info(f"Categorizing batch {i//BATCH_SIZE + 1}: {', '.join(batch_names)}")
-            
-            # Create batched prompt
-            prompt = f"""Categorize each column in the following tables to one of the business domains.
+        return [tables_to_categorize[i:i + BATCH_SIZE] for i in range(0, len(tables_to_categorize), BATCH_SIZE)]
+
+    def _categorize_batch(self, batch, domain_list):
+        """Map each column of a batch of tables to a domain; returns {table: {column: domain}}."""
+        batch_names = [t['table'] for t in batch]
+        logger.info(f"Categorizing batch: {', '.join(batch_names)}")
+        
+        # Create batched prompt
+        prompt = f"""Categorize each column in the following tables to one of the business domains.
 
 Tables and their columns:
 {json.dumps(batch, indent=2)}
@@ -183,19 +167,16 @@ Return ONLY a JSON object with this structure:
   }}
 }}
 """
-            
-            try:
-                response = self.llm_client.generate_content(prompt)
-                batch_result = safe_parse_json(response)
-                
-                if batch_result:
-                    categorizations.update(batch_result)
-                else:
-                    logger.warning(f"Failed to parse batch response for tables: {batch_names}")
-            except Exception as e:
-                logger.warning(f"Failed to categorize batch: {e}")
         
-        return categorizations
+        try:
+            _, batch_result = self.llm_client.generate_json(prompt, stage="categorization", task="categorization")
+            
+            if isinstance(batch_result, dict):
+                return batch_result
+            logger.warning(f"Failed to parse batch response for tables: {batch_names}")
+        except Exception as e:
+            logger.warning(f"Failed to categorize batch: {e}")
+        return {}
 
     def _save_results(self, domains, categorizations):
         """Save categorization results to JSON."""
@@ -0,0 +1,145 @@
+"""
+Map-reduce helpers for files too large for one analysis prompt.
+
+Content is split at logical boundaries - MAPPING/MAPPLET/SESSION/WORKFLOW/WORKLET
+elements for Informatica XML, ``go`` batch separators and CREATE
+PROCEDURE/FUNCTION/TRIGGER/VIEW statements for SQL - and consecutive units are
+packed into chunks of up to ANALYSIS_CHUNK_TOKEN_BUDGET estimated tokens. A unit
+larger than the budget on its own is split at line boundaries as a last resort,
+and a single line larger than the budget is cut into fixed-size pieces, so no
+chunk ever exceeds the budget.
+
+AnalysisEngine analyses the chunks concurrently and folds the partial JSON
+answers back into one analysis with merge_partial_analyses, so a file's latency
+is bounded by its largest chunk rather than its total size.
+"""
+import json
+import logging
+import os
+import re
+from typing import Callable, Dict, List
+
+from src.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+CHUNKING_ENABLED = os.getenv("ANALYSIS_CHUNKING_ENABLED", "true").lower() == "true"
+# Files whose (minified) content exceeds this are split; chunks are packed up to it
+CHUNK_TOKEN_BUDGET = int(os.getenv("ANALYSIS_CHUNK_TOKEN_BUDGET", "8000"))
+
+_SQL_BATCH = re.compile(r"^\s*go\s*$", re.IGNORECASE | re.MULTILINE)
+_SQL_OBJECT_START = re.compile(
+    r"^\s*create\s+(?:or\s+replace\s+)?(?:proc|procedure|function|trigger|view)\b", re.IGNORECASE | re.MULTILINE
+)
+_XML_UNIT_START = re.compile(r"^\s*<(?:MAPPING|MAPPLET|SESSION|WORKFLOW|WORKLET)\b", re.MULTILINE)
+
+# Ordinal fields merged by taking the highest value seen in any chunk
+_RANKED_VALUES = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+# Free-text fields whose chunk answers are concatenated rather than first-wins
+_TEXT_FIELD_SUFFIXES = ("summary", "description", "notes")
+
+
+def _split_at(content: str, starts: List[int]) -> List[str]:
+    bounds = sorted({0, *starts, len(content)})
+    return [content[a:b] for a, b in zip(bounds, bounds[1:]) if content[a:b].strip()]
+
+
+def _split_lines(unit: str, max_tokens: int) -> List[str]:
+    """Last resort for a single oversized unit: cut at line boundaries (and inside overlong lines)."""
+    # estimate_tokens counts ~4 characters per token
+    max_chars = max_tokens * 4
+    pieces, current = [], []
+    for line in unit.splitlines(keepends=True):
+        if len(line) > max_chars:
+            if current:
+                pieces.append("".join(current))
+                current = []
+            pieces.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+            continue
+        current.append(line)
+        if estimate_tokens("".join(current)) >= max_tokens:
+            pieces.append("".join(current))
+            current = []
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def pack_units(units: List[str], max_tokens: int) -> List[str]:
+    """Pack consecutive units greedily into chunks of at most max_tokens."""
+    chunks, current, current_tokens = [], [], 0
+    for unit in units:
+        tokens = estimate_tokens(unit)
+        pieces = _split_lines(unit, max_tokens) if tokens > max_tokens else [unit]
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def split_sql(content: str, max_tokens: int = CHUNK_TOKEN_BUDGET) -> List[str]:
+    """Split SQL at batch separators and object boundaries."""
+    starts = [m.end() for m in _SQL_BATCH.finditer(content)]
+    starts += [m.start() for m in _SQL_OBJECT_START.finditer(content)]
+    return pack_units(_split_at(content, starts), max_tokens)
+
+
+def split_informatica_xml(content: str, max_tokens: int = CHUNK_TOKEN_BUDGET) -> List[str]:
+    """Split an Informatica export at MAPPING/SESSION/WORKFLOW element starts."""
+    starts = [m.start() for m in _XML_UNIT_START.finditer(content)]
+    return pack_units(_split_at(content, starts), max_tokens)
+
+
+SPLITTERS: Dict[str, Callable[[str, int], List[str]]] = {
+    "sybase_ddl": split_sql,
+    "sql_transformation": split_sql,
+    "informatica_xml": split_informatica_xml,
+}
+
+
+def _merge_value(key: str, current, new):
+    if current in (None, "", [], {}):
+        return new
+    if new in (None, "", [], {}):
+        return current
+    if isinstance(current, list) and isinstance(new, list):
+        seen = {json.dumps(item, sort_keys=True, default=str) for item in current}
+        merged = list(current)
+        for item in new:
+            fingerprint = json.dumps(item, sort_keys=True, default=str)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                merged.append(item)
+        return merged
+    if isinstance(current, dict) and isinstance(new, dict):
+        merged = dict(current)
+        for child_key, value in new.items():
+            merged[child_key] = _merge_value(child_key, merged.get(child_key), value)
+        return merged
+    if isinstance(current, str) and isinstance(new, str):
+        if current.upper() in _RANKED_VALUES and new.upper() in _RANKED_VALUES:
+            return max(current, new, key=lambda v: _RANKED_VALUES[v.upper()])
+        if key.endswith(_TEXT_FIELD_SUFFIXES) and new not in current:
+            return f"{current}\n\n{new}"
+    # Scalars (names, flags, numbers): the first chunk wins
+    return current
+
+
+def merge_partial_analyses(partials: List[dict]) -> dict:
+    """Fold per-chunk analysis objects into one, in chunk order.
+
+    Lists are unioned, nested objects merged key by key, free text
+    (summaries, descriptions) concatenated, LOW/MEDIUM/HIGH ratings take the
+    highest and other scalars keep the first non-empty value.
+    """
+    merged: dict = {}
+    for partial in partials:
+        for key, value in partial.items():
+            merged[key] = _merge_value(key, merged.get(key), value)
+    return merged
@@ -0,0 +1,239 @@
+"""
+Concurrency helpers for LLM calls.
+
+AdaptiveConcurrencyLimiter implements AIMD (additive increase, multiplicative
+decrease) on the number of in-flight LLM requests: it grows the limit while
+latency and error rate stay healthy and halves it when Vertex AI signals quota
+exhaustion or deadline errors. It can be awaited from any event loop and also
+acquired from plain threads, so async engines and the remaining synchronous
+callers share one budget.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "8"))
+MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+TARGET_LATENCY_SECONDS = float(os.getenv("LLM_TARGET_LATENCY_SECONDS", "60"))
+
+# Error-rate EWMA above which we stop growing the limit
+_MAX_HEALTHY_ERROR_RATE = 0.1
+_ERROR_RATE_ALPHA = 0.2
+
+# Markers in exception class names / messages that mean "slow down"
+_BACKOFF_MARKERS = (
+    "resourceexhausted", "toomanyrequests", "429", "quota", "rate limit",
+    "deadlineexceeded", "deadline", "504", "serviceunavailable", "503",
+)
+
+
+def is_backoff_error(error: Optional[BaseException]) -> bool:
+    """True if an exception indicates quota exhaustion or an overloaded backend."""
+    if error is None:
+        return False
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _BACKOFF_MARKERS)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limiter on in-flight requests, shared by threads and event loops."""
+
+    def __init__(self, initial: int = INITIAL_CONCURRENCY, min_limit: int = MIN_CONCURRENCY,
+                 max_limit: int = MAX_CONCURRENCY, target_latency: float = TARGET_LATENCY_SECONDS,
+                 decrease_factor: float = 0.5):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._error_rate = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        # Requests started before the last decrease shouldn't trigger another one
+        self._generation = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> int:
+        """Wait for a slot from inside an event loop. Returns a token for release()."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return self._generation
+            fut = loop.create_future()
+            waiter = (loop, fut)
+            self._waiters.append(waiter)
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif fut.done() and not fut.cancelled():
+                    # Slot was granted just as we were cancelled - hand it back
+                    self._in_flight -= 1
+                    self._wake()
+            raise
+        return self._generation
+
+    def acquire_sync(self) -> int:
+        """Block the calling thread until a slot is free. Returns a token for release()."""
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return self._generation
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+        return self._generation
+
+    def release(self, token: int, latency: float, error: Optional[BaseException] = None):
+        """Return a slot and feed the outcome into the AIMD controller."""
+        with self._lock:
+            self._in_flight -= 1
+            failed = error is not None
+            self._error_rate += _ERROR_RATE_ALPHA * ((1.0 if failed else 0.0) - self._error_rate)
+
+            if is_backoff_error(error):
+                if token == self._generation:
+                    old = self.limit
+                    self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                    self._generation += 1
+                    logger.warning(f"LLM backoff ({type(error).__name__}): concurrency {old} -> {self.limit}")
+            elif not failed and latency <= self.target_latency and self._error_rate < _MAX_HEALTHY_ERROR_RATE:
+                # Additive increase: roughly +1 per window of `limit` successes
+                old = self.limit
+                self._limit = min(self.max_limit, self._limit + 1.0 / max(self._limit, 1.0))
+                if self.limit != old:
+                    logger.debug(f"LLM concurrency raised {old} -> {self.limit}")
+
+            self._wake()
+
+    def _wake(self):
+        """Grant slots to queued waiters in FIFO order. Caller holds the lock."""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            self._in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, fut = waiter
+                try:
+                    loop.call_soon_threadsafe(self._grant, fut)
+                except RuntimeError:
+                    # Loop already closed - nobody will use this slot
+                    self._in_flight -= 1
+
+    def _grant(self, fut):
+        if fut.done():
+            # Waiter was cancelled after being dequeued
+            with self._lock:
+                self._in_flight -= 1
+                self._wake()
+            return
+        fut.set_result(None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "queued": len(self._waiters),
+                "error_rate": round(self._error_rate, 4),
+            }
+
+
+def run_sync(coro):
+    """Run a coroutine to completion from synchronous code.
+
+    run_pipeline is called both from worker threads and directly from FastAPI
+    request handlers (the JSON code path), where an event loop is already
+    running in the current thread. In that case the coroutine gets its own
+    loop on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+_END = object()
+
+
+async def iterate_in_thread(iterable: Iterable) -> AsyncIterator:
+    """Consume a blocking iterable on a helper thread and yield its items in the event loop.
+
+    The iterable is expected to bound its own read-ahead (BlobPrefetcher does);
+    items are forwarded as soon as they're produced. Exceptions raised by the
+    iterable are re-raised here.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def _put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # Loop closed - the consumer is gone
+            stop.set()
+
+    def _produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                _put(item)
+        except BaseException as e:
+            _put(_END, e)
+            return
+        _put(_END)
+
+    # Daemon thread: a producer blocked on an abandoned consumer mustn't hold up interpreter exit
+    threading.Thread(target=_produce, name="iterate-in-thread", daemon=True).start()
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+_shared_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_limiter() -> AdaptiveConcurrencyLimiter:
+    """Return the process-wide concurrency limiter.
+
+    Every pipeline run in the process shares it, so N concurrent runs don't
+    multiply the number of in-flight calls against one Vertex AI quota.
+    """
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = AdaptiveConcurrencyLimiter()
+        return _shared_limiter
@@ -0,0 +1,405 @@
+"""
+Deterministic parser for T-SQL / Sybase CREATE TABLE scripts.
+
+Produces the same JSON shape the schema analysis prompt asks the LLM for
+(table_name, columns, primary_keys, foreign_keys, indexes, description) from
+one table's DDL file, so AnalysisEngine can skip the LLM for plain table
+definitions. Dialect details - index types, identity keywords, statements to
+ignore and the confidence threshold - come from the `ddl_parsing` section of
+the source system config.
+
+Each parse returns a confidence score. Anything the parser doesn't
+recognise (an unexpected statement, a column definition with unknown
+trailing tokens, zero or several CREATE TABLE statements) lowers it, and the
+caller falls back to the LLM below `min_confidence`.
+"""
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.preprocess import minify_sql
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DDL_PARSING = {
+    "enabled": True,
+    "min_confidence": 0.9,
+    "index_types": ["HG", "LF", "HNG", "WD", "DATE", "TIME", "DTTM", "CMP", "TEXT", "CLUSTERED", "NONCLUSTERED"],
+    "identity_keywords": ["IDENTITY", "AUTOINCREMENT"],
+    "ignored_statements": ["GRANT", "REVOKE", "COMMENT", "SETUSER", "USE", "PRINT", "CREATE DOMAIN"],
+}
+
+# Keywords that end a column's data type and start its options
+_COLUMN_OPTION_KEYWORDS = {
+    "NULL", "NOT", "DEFAULT", "IDENTITY", "AUTOINCREMENT", "CONSTRAINT", "PRIMARY", "UNIQUE", "CHECK",
+    "REFERENCES", "COLLATE", "COMPUTE", "IQ", "IN", "ON",
+}
+_TABLE_CONSTRAINT_KEYWORDS = {"PRIMARY", "FOREIGN", "UNIQUE", "CHECK", "CONSTRAINT"}
+_ORDER_KEYWORDS = {"ASC", "DESC"}
+
+_TOKEN = re.compile(
+    r"""
+    "(?:[^"]|"")*"            # "quoted identifier"
+    | \[[^\]]*\]              # [bracketed identifier]
+    | `[^`]*`                 # `backtick identifier`
+    | '(?:[^']|'')*'          # 'string literal'
+    | [A-Za-z_@#$][\w@#$]*    # word / identifier
+    | \d+(?:\.\d+)?           # number
+    | [(),;.]                 # punctuation
+    | \S                      # anything else (operators)
+    """,
+    re.VERBOSE,
+)
+
+
+def _join(tokens: List["Token"], use_value: bool = False) -> str:
+    """Re-join tokens as SQL text without spaces around parentheses and commas."""
+    out = ""
+    for token in tokens:
+        text = token.value if use_value else token.text
+        if out and not out.endswith("(") and token.text not in "(),":
+            out += " "
+        out += text
+    return out
+
+
+class Token:
+    __slots__ = ("text", "value", "quoted")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.quoted = text[0] in "\"[`"
+        if self.quoted:
+            self.value = text[1:-1].replace('""', '"')
+        else:
+            self.value = text
+
+    @property
+    def upper(self) -> str:
+        # Quoted identifiers are never keywords
+        return "" if self.quoted else self.value.upper()
+
+    def __repr__(self):
+        return self.text
+
+
+def tokenize_sql(sql: str) -> List[Token]:
+    """Split SQL into identifier, literal, number and punctuation tokens (comments must already be stripped)."""
+    return [Token(m.group(0)) for m in _TOKEN.finditer(sql)]
+
+
+class DDLParser:
+    """Parses one table's DDL into the schema-analysis JSON shape."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = {**DEFAULT_DDL_PARSING, **(config or {})}
+        self.enabled = bool(config.get("enabled", True))
+        self.min_confidence = float(config.get("min_confidence", 0.9))
+        self.index_types = {t.upper() for t in config.get("index_types", [])}
+        self.identity_keywords = {k.upper() for k in config.get("identity_keywords", [])}
+        self.ignored_statements = [tuple(s.upper().split()) for s in config.get("ignored_statements", [])]
+
+    def parse(self, content: str) -> Tuple[Optional[dict], float, List[str]]:
+        """Parse DDL. Returns (analysis or None, confidence, issues)."""
+        issues: List[str] = []
+        statements = self._split_statements(tokenize_sql(minify_sql(content)))
+
+        tables, alters, indexes = [], [], []
+        for stmt in statements:
+            head = tuple(t.upper for t in stmt[:3])
+            if head[:2] == ("CREATE", "TABLE"):
+                tables.append(stmt)
+            elif head[:2] == ("ALTER", "TABLE"):
+                alters.append(stmt)
+            elif head[0] == "CREATE" and "INDEX" in [t.upper for t in stmt[:5]]:
+                indexes.append(stmt)
+            elif not any(head[:len(ignored)] == ignored for ignored in self.ignored_statements):
+                issues.append(f"unrecognised statement: {' '.join(t.text for t in stmt[:4])}")
+
+        if len(tables) != 1:
+            issues.append(f"expected one CREATE TABLE, found {len(tables)}")
+            return None, 0.0, issues
+
+        try:
+            analysis = self._parse_create_table(tables[0], issues)
+        except (IndexError, ValueError) as e:
+            issues.append(f"CREATE TABLE not understood: {e}")
+            return None, 0.0, issues
+
+        table_key = analysis["table_name"].lower()
+        for stmt in alters:
+            self._apply_alter(stmt, table_key, analysis, issues)
+        for stmt in indexes:
+            self._apply_index(stmt, table_key, analysis, issues)
+
+        confidence = max(0.0, 1.0 - 0.2 * len(issues))
+        return analysis, round(confidence, 2), issues
+
+    def parse_confident(self, content: str) -> Optional[dict]:
+        """Return the analysis if the parse meets min_confidence, else None."""
+        if not self.enabled:
+            return None
+        analysis, confidence, issues = self.parse(content)
+        if analysis is None or confidence < self.min_confidence:
+            if issues:
+                logger.debug(f"Local DDL parse rejected (confidence {confidence}): {issues}")
+            return None
+        analysis["parse_confidence"] = confidence
+        return analysis
+
+    # -------------------------------------------------------------------------
+    # Tokenizing
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _split_statements(tokens: List[Token]) -> List[List[Token]]:
+        statements, current, depth = [], [], 0
+        for token in tokens:
+            if token.text == "(":
+                depth += 1
+            elif token.text == ")":
+                depth -= 1
+            if token.text == ";" and depth == 0:
+                if current:
+                    statements.append(current)
+                current = []
+                continue
+            # Batch separators, if any survived preprocessing
+            if token.upper == "GO" and not current:
+                continue
+            current.append(token)
+        if current:
+            statements.append(current)
+        return statements
+
+    # -------------------------------------------------------------------------
+    # Statement parsing
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _qualified_name(tokens: List[Token], i: int) -> Tuple[List[str], int]:
+        """Read a dotted name starting at tokens[i]; returns (parts, next index)."""
+        parts = [tokens[i].value]
+        i += 1
+        while i + 1 < len(tokens) and tokens[i].text == ".":
+            parts.append(tokens[i + 1].value)
+            i += 2
+        return parts, i
+
+    @staticmethod
+    def _paren_group(tokens: List[Token], i: int) -> Tuple[List[Token], int]:
+        """Return the tokens inside the parenthesis opening at tokens[i] and the index after it."""
+        if tokens[i].text != "(":
+            raise ValueError(f"expected '(' at {tokens[i].text}")
+        depth, start = 0, i
+        while i < len(tokens):
+            if tokens[i].text == "(":
+                depth += 1
+            elif tokens[i].text == ")":
+                depth -= 1
+                if depth == 0:
+                    return tokens[start + 1:i], i + 1
+            i += 1
+        raise ValueError("unbalanced parentheses")
+
+    @staticmethod
+    def _split_top_level(tokens: List[Token]) -> List[List[Token]]:
+        parts, current, depth = [], [], 0
+        for token in tokens:
+            if token.text == "(":
+                depth += 1
+            elif token.text == ")":
+                depth -= 1
+            if token.text == "," and depth == 0:
+                parts.append(current)
+                current = []
+            else:
+                current.append(token)
+        if current:
+            parts.append(current)
+        return parts
+
+    def _column_list(self, tokens: List[Token]) -> List[str]:
+        return [part[0].value for part in self._split_top_level(tokens) if part and part[0].upper not in _ORDER_KEYWORDS]
+
+    def _parse_create_table(self, stmt: List[Token], issues: List[str]) -> dict:
+        name_parts, i = self._qualified_name(stmt, 2)
+        body, _ = self._paren_group(stmt, i)
+
+        analysis = {
+            "table_name": name_parts[-1],
+            "columns": [],
+            "primary_keys": [],
+            "foreign_keys": [],
+            "indexes": [],
+        }
+        if len(name_parts) > 1:
+            analysis["schema"] = name_parts[-2]
+
+        for element in self._split_top_level(body):
+            if not element:
+                continue
+            if element[0].upper in _TABLE_CONSTRAINT_KEYWORDS:
+                self._apply_constraint(element, analysis, issues)
+            else:
+                column = self._parse_column(element, issues)
+                if column:
+                    if column.pop("_inline_pk", False):
+                        self._add_primary_keys(analysis, [column["name"]])
+                    analysis["columns"].append(column)
+
+        if not analysis["columns"]:
+            raise ValueError("no columns")
+        pk = set(analysis["primary_keys"])
+        for column in analysis["columns"]:
+            if column["name"] in pk:
+                column["nullable"] = False
+        analysis["description"] = (
+            f"{analysis['table_name']}: {len(analysis['columns'])} columns"
+            + (f", keyed on {', '.join(analysis['primary_keys'])}" if analysis["primary_keys"] else "")
+            + " (parsed from DDL)"
+        )
+        return analysis
+
+    def _parse_column(self, element: List[Token], issues: List[str]) -> Optional[dict]:
+        name = element[0].value
+        i = 1
+        type_tokens = []
+        while i < len(element) and element[i].upper not in _COLUMN_OPTION_KEYWORDS:
+            type_tokens.append(element[i])
+            i += 1
+        if not type_tokens:
+            issues.append(f"column {name}: no data type")
+            return None
+
+        column = {
+            "name": name,
+            "type": _join(type_tokens, use_value=True),
+            "nullable": True,
+            "default_value": None,
+            "is_identity": False,
+        }
+        while i < len(element):
+            word = element[i].upper
+            if word == "NOT" and i + 1 < len(element) and element[i + 1].upper == "NULL":
+                column["nullable"] = False
+                i += 2
+            elif word == "NULL":
+                i += 1
+            elif word == "DEFAULT":
+                i += 1
+                if i < len(element) and element[i].upper in self.identity_keywords:
+                    column["is_identity"] = True
+                    i += 1
+                    continue
+                value_tokens = []
+                while i < len(element) and element[i].upper not in _COLUMN_OPTION_KEYWORDS:
+                    value_tokens.append(element[i])
+                    i += 1
+                column["default_value"] = _join(value_tokens) or None
+            elif word in self.identity_keywords:
+                column["is_identity"] = True
+                i += 1
+                if i < len(element) and element[i].text == "(":
+                    # IDENTITY(seed, increment)
+                    _, i = self._paren_group(element, i)
+            elif word == "PRIMARY" and i + 1 < len(element) and element[i + 1].upper == "KEY":
+                column["nullable"] = False
+                column["_inline_pk"] = True
+                i += 2
+            elif word == "IQ" and i + 2 < len(element) and element[i + 1].upper == "UNIQUE":
+                # Sybase IQ cardinality hint: IQ UNIQUE ( n )
+                _, i = self._paren_group(element, i + 2)
+            else:
+                issues.append(f"column {name}: unexpected '{element[i].text}'")
+                break
+        return column
+
+    def _apply_constraint(self, element: List[Token], analysis: dict, issues: List[str]):
+        i, name = 0, None
+        if element[0].upper == "CONSTRAINT":
+            name, i = element[1].value, 2
+        # Sybase allows "CONSTRAINT fk NOT NULL FOREIGN KEY ..." (mandatory relationship)
+        if element[i].upper == "NOT" and i + 1 < len(element) and element[i + 1].upper == "NULL":
+            i += 2
+        word = element[i].upper
+        if word == "PRIMARY":
+            group, _ = self._paren_group(element, self._find(element, "(", i))
+            self._add_primary_keys(analysis, self._column_list(group))
+        elif word == "FOREIGN":
+            fk = self._parse_foreign_key(element, i, name)
+            if fk:
+                analysis["foreign_keys"].append(fk)
+        elif word == "UNIQUE":
+            group, _ = self._paren_group(element, self._find(element, "(", i))
+            analysis["indexes"].append({"name": name, "columns": self._column_list(group), "is_unique": True})
+        elif word == "CHECK":
+            pass
+        else:
+            issues.append(f"unrecognised table constraint: {' '.join(t.text for t in element[:3])}")
+
+    def _parse_foreign_key(self, element: List[Token], i: int, name: Optional[str]) -> Optional[dict]:
+        columns_group, j = self._paren_group(element, self._find(element, "(", i))
+        ref = self._find(element, "REFERENCES", j)
+        ref_parts, k = self._qualified_name(element, ref + 1)
+        ref_columns = []
+        if k < len(element) and element[k].text == "(":
+            ref_group, _ = self._paren_group(element, k)
+            ref_columns = self._column_list(ref_group)
+        return {
+            "name": name,
+            "columns": self._column_list(columns_group),
+            "references_table": ref_parts[-1],
+            "references_columns": ref_columns,
+        }
+
+    def _apply_alter(self, stmt: List[Token], table_key: str, analysis: dict, issues: List[str]):
+        name_parts, i = self._qualified_name(stmt, 2)
+        if name_parts[-1].lower() != table_key:
+            # e.g. a foreign key on another table that references this one
+            return
+        if i >= len(stmt) or stmt[i].upper != "ADD":
+            issues.append(f"unrecognised ALTER TABLE: {' '.join(t.text for t in stmt[i:i + 3])}")
+            return
+        element = stmt[i + 1:]
+        if not element or element[0].upper not in _TABLE_CONSTRAINT_KEYWORDS:
+            issues.append(f"unrecognised ALTER TABLE ADD: {' '.join(t.text for t in stmt[i + 1:i + 4])}")
+            return
+        self._apply_constraint(element, analysis, issues)
+
+    def _apply_index(self, stmt: List[Token], table_key: str, analysis: dict, issues: List[str]):
+        i = 1
+        is_unique = False
+        index_type = None
+        while i < len(stmt) and stmt[i].upper != "INDEX":
+            word = stmt[i].upper
+            if word == "UNIQUE":
+                is_unique = True
+            elif word in self.index_types:
+                index_type = word
+            else:
+                issues.append(f"unknown index option '{stmt[i].text}'")
+            i += 1
+        name = stmt[i + 1].value
+        on = self._find(stmt, "ON", i + 1)
+        table_parts, j = self._qualified_name(stmt, on + 1)
+        if table_parts[-1].lower() != table_key:
+            return
+        group, _ = self._paren_group(stmt, j)
+        index = {"name": name, "columns": self._column_list(group), "is_unique": is_unique}
+        if index_type:
+            index["index_type"] = index_type
+        analysis["indexes"].append(index)
+
+    @staticmethod
+    def _add_primary_keys(analysis: dict, columns: List[str]):
+        for column in columns:
+            if column not in analysis["primary_keys"]:
+                analysis["primary_keys"].append(column)
+
+    @staticmethod
+    def _find(tokens: List[Token], text: str, start: int) -> int:
+        for i in range(start, len(tokens)):
+            if tokens[i].text == text or tokens[i].upper == text:
+                return i
+        raise ValueError(f"expected {text}")
@@ -0,0 +1,150 @@
+"""
+Content deduplication of source objects.
+
+Uploads often carry the same object more than once: identical files under
+input/ and Files for POC/, or a copy re-saved with different indentation,
+line endings or comments. Ingestion already skips byte-identical GCS objects
+by MD5; ContentDeduplicator also catches copies that differ only in
+formatting by fingerprinting a normalised form of each file:
+
+- SQL: the prompt minifier's output (comments, ``go`` separators and
+  GRANT/REVOKE lines removed - analysis ignores all of them), whitespace
+  collapsed
+- XML: comments removed, whitespace between tags dropped, other whitespace
+  collapsed
+- anything else: whitespace collapsed
+
+The file type is part of the fingerprint, so files only alias when they would
+be analysed the same way. The first file of each group is analysed; the rest
+get its result with ``duplicate_of`` set, and the groups are written to
+dedup_report.json.
+"""
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.blob_cache import decode_bytes
+from src.preprocess import minify_sql
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("CONTENT_DEDUP_ENABLED", "true").lower() == "true"
+# Files downloaded concurrently for fingerprinting
+DEDUP_READ_WORKERS = int(os.getenv("CONTENT_DEDUP_READ_WORKERS", "8"))
+DEDUP_REPORT_FILENAME = "dedup_report.json"
+
+_WHITESPACE = re.compile(r"\s+")
+_XML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_XML_BETWEEN_TAGS = re.compile(r">\s+<")
+
+
+def normalize_content(file_type: str, content: str) -> str:
+    """Content with formatting and comment differences removed."""
+    content = content.lstrip("\ufeff")
+    if file_type in ("sybase_ddl", "sql_transformation"):
+        content = minify_sql(content)
+    elif file_type == "informatica_xml" or content.lstrip().startswith("<"):
+        content = _XML_BETWEEN_TAGS.sub("><", _XML_COMMENT.sub("", content))
+    return _WHITESPACE.sub(" ", content).strip()
+
+
+def content_fingerprint(file_type: str, content: str) -> str:
+    digest = hashlib.sha256(file_type.encode("utf-8") + b"\0")
+    digest.update(normalize_content(file_type, content).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_text(blob) -> str:
+    # One download, decoded locally, rather than a second read on UnicodeDecodeError
+    return decode_bytes(blob.download_as_bytes())
+
+
+class ContentDeduplicator:
+    """Groups files whose normalised content is identical."""
+
+    def __init__(self, categorize_file: Callable[[str], str], workers: int = DEDUP_READ_WORKERS):
+        self.categorize_file = categorize_file
+        self.workers = max(1, workers)
+        # canonical name -> {"fingerprint", "file_type", "aliases"}
+        self.groups: Dict[str, dict] = {}
+        # normalised-content fingerprint of every file checked, by name
+        self.fingerprints: Dict[str, str] = {}
+        self.files_checked = 0
+        self._canonical_by_fingerprint: Dict[str, str] = {}
+
+    def _fingerprint(self, blob) -> Optional[str]:
+        try:
+            return content_fingerprint(self.categorize_file(blob.name), _read_text(blob))
+        except Exception as e:
+            # Unreadable files are analysed (and reported) individually
+            logger.warning(f"Could not fingerprint {blob.name} for dedup: {e}")
+            return None
+
+    def _assign(self, blob, fp: Optional[str]) -> Optional[str]:
+        """Record one fingerprinted blob; returns its canonical file's name if it's a copy."""
+        self.files_checked += 1
+        if not fp:
+            return None
+        self.fingerprints[blob.name] = fp
+        canonical = self._canonical_by_fingerprint.setdefault(fp, blob.name)
+        if canonical == blob.name:
+            return None
+        group = self.groups.setdefault(canonical, {
+            "fingerprint": fp, "file_type": self.categorize_file(canonical), "aliases": [],
+        })
+        group["aliases"].append(blob.name)
+        logger.info(f"Skipping {blob.name}: same content as {canonical}")
+        return canonical
+
+    def add_known(self, fp: str, name: str):
+        """Register a file whose result already exists (reused from a baseline run) as canonical for `fp`."""
+        self._canonical_by_fingerprint.setdefault(fp, name)
+
+    def check(self, blob) -> Optional[str]:
+        """Fingerprint one blob as it is listed; returns the canonical name if an earlier file has its content.
+
+        Used by streaming ingestion, where the blob's content is already in
+        memory, so the first file seen with any content is the one analysed.
+        """
+        return self._assign(blob, self._fingerprint(blob))
+
+    def duplicates(self) -> Dict[str, List[str]]:
+        """{canonical name: [alias names]} for every group found so far."""
+        return {name: group["aliases"] for name, group in self.groups.items()}
+
+    def dedupe(self, blobs: List, known: Optional[Dict[str, str]] = None) -> Tuple[List, Dict[str, List[str]]]:
+        """Returns (blobs to analyse, {canonical name: [alias names]}), keeping listing order.
+
+        `known` maps fingerprints to files whose results already exist (reused
+        from a baseline run); blobs with the same content alias to them.
+        """
+        for fp, name in (known or {}).items():
+            self.add_known(fp, name)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            fingerprints = list(pool.map(self._fingerprint, blobs))
+
+        unique = [blob for blob, fp in zip(blobs, fingerprints) if self._assign(blob, fp) is None]
+        duplicates = self.duplicates()
+        if duplicates:
+            skipped = sum(len(aliases) for aliases in duplicates.values())
+            logger.info(f"Content dedup: {skipped} duplicate files; {len(unique)} unique files to analyze")
+        return unique, duplicates
+
+    def report(self, exact_duplicates: Optional[Dict[str, List[str]]] = None) -> dict:
+        """dedup_report.json content: byte-identical (listing) and normalised-content groups."""
+        exact_duplicates = exact_duplicates or {}
+        content_groups = [
+            {"canonical": name, "aliases": group["aliases"], "file_type": group["file_type"],
+             "fingerprint": group["fingerprint"]}
+            for name, group in self.groups.items()
+        ]
+        return {
+            "files_checked": self.files_checked,
+            "identical_files": sum(len(aliases) for aliases in exact_duplicates.values()),
+            "content_duplicate_files": sum(len(group["aliases"]) for group in content_groups),
+            "identical": [{"canonical": name, "aliases": aliases} for name, aliases in exact_duplicates.items()],
+            "content": content_groups,
+        }
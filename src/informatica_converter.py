@@ -3,7 +3,7 @@ import os
 import logging
 from typing import Optional
 from src.llm_client import LLMClient
-from src.json_utils import safe_parse_json
+from src.models import Mapping, analysis_object, is_partial_object
 from src.adapters.registry import get_adapter
 from src.adapters.base import SourceAdapter
 
@@ -17,22 +17,17 @@ class InformaticaConverter:
     SQL conversion from the source database dialect to BigQuery.
     """
     
-    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None):
+    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None, llm_client: Optional[LLMClient] = None):
         self.output_dir = output_dir
         self.dataform_dir = os.path.join(output_dir, "dataform")
-        self.llm_client = LLMClient(project_id)
+        self.llm_client = llm_client or LLMClient(project_id)
         self.adapter = get_adapter(source_system)
         logger.info(f"InformaticaConverter initialized for source system: {self.adapter.name}")
 
     def convert_informatica_mappings(self, analysis_results, categorization_results):
         """Converts Informatica mappings to Dataform transformation SQL."""
         logger.info("Starting Informatica transformation conversion...")
-        
-        # Create staging and intermediate directories
-        staging_dir = os.path.join(self.dataform_dir, "definitions", "staging")
-        intermediate_dir = os.path.join(self.dataform_dir, "definitions", "intermediate")
-        os.makedirs(staging_dir, exist_ok=True)
-        os.makedirs(intermediate_dir, exist_ok=True)
+        self._prepare_output_dirs()
         
         # Track shared objects for documentation
         shared_objects = []
@@ -40,55 +35,62 @@ class InformaticaConverter:
         
         # Process each Informatica XML
         for filename, data in analysis_results.items():
-            if data.get('type') != 'informatica_xml':
-                continue
-            
-            analysis = data.get('analysis', '')
-            if not analysis or 'mapping_name' not in analysis:
-                continue
-            
-            try:
-                # Use safe JSON parsing with repair
-                mapping_info = safe_parse_json(analysis)
-                if not mapping_info:
-                    logger.warning(f"Could not parse JSON for {filename}, skipping")
-                    continue
-                
-                mapping_name = mapping_info.get("mapping_name")
-                
-                # Check if this is a shared/reusable object (not a mapping)
-                if self._is_shared_object(mapping_name, mapping_info):
-                    shared_objects.append({
-                        "filename": filename,
-                        "description": mapping_name,
-                        "transformations": mapping_info.get("transformations", []),
-                        "logic_summary": mapping_info.get("logic_summary", "")
-                    })
-                    logger.info(f"Found shared object in {filename}: {mapping_name}")
-                    continue
-                
-                if not mapping_name or mapping_name == "null":
-                    logger.info(f"Skipping {filename} - no mapping name found")
-                    continue
-                
-                logger.info(f"Converting Informatica mapping: {mapping_name}")
+            kind, payload = self._classify_mapping(filename, data)
+            if kind == "shared":
+                shared_objects.append(payload)
+            elif kind == "mapping":
+                logger.info(f"Converting Informatica mapping: {payload.name}")
                 
                 # Generate transformation SQL using LLM
-                self._generate_transformation_sql(filename, mapping_info, categorization_results)
+                self._generate_transformation_sql(filename, payload, categorization_results)
                 converted_count += 1
-                
-            except Exception as e:
-                logger.warning(f"Failed to convert {filename}: {e}")
-                continue
         
         # Generate shared objects reference document
         if shared_objects:
             self._generate_shared_objects_doc(shared_objects)
         
         logger.info(f"Informatica conversion complete: {converted_count} mappings converted, {len(shared_objects)} shared objects documented.")
+
+    def _prepare_output_dirs(self):
+        """Create the staging and intermediate definition directories."""
+        os.makedirs(os.path.join(self.dataform_dir, "definitions", "staging"), exist_ok=True)
+        os.makedirs(os.path.join(self.dataform_dir, "definitions", "intermediate"), exist_ok=True)
+
+    def _classify_mapping(self, filename, data):
+        """Classify one analysis result.
+
+        Returns ("mapping", Mapping) for a convertible mapping,
+        ("shared", doc_entry) for a shared/reusable object, or (None, None).
+        """
+        if data.get('type') != 'informatica_xml':
+            return None, None
+        
+        mapping = analysis_object(data)
+        if not isinstance(mapping, Mapping):
+            return None, None
+        if is_partial_object(mapping):
+            logger.warning(f"Skipping {filename} - its analysis was truncated")
+            return None, None
+        
+        # Check if this is a shared/reusable object (not a mapping)
+        if self._is_shared_object(mapping):
+            logger.info(f"Found shared object in {filename}: {mapping.name}")
+            return "shared", {
+                "filename": filename,
+                "description": mapping.name,
+                "transformations": mapping.transformations,
+                "logic_summary": mapping.logic_summary
+            }
+        
+        if not mapping.name:
+            logger.info(f"Skipping {filename} - no mapping name found")
+            return None, None
+        
+        return "mapping", mapping
     
-    def _is_shared_object(self, mapping_name, mapping_info):
+    def _is_shared_object(self, mapping):
         """Detect if this is a shared/reusable object rather than a mapping."""
+        mapping_name = mapping.name
         if not mapping_name:
             return False
         
@@ -108,9 +110,7 @@ class InformaticaConverter:
                 return True
         
         # Also check if sources and targets are both empty/null (typical for shared objects)
-        sources = mapping_info.get("sources") or []
-        targets = mapping_info.get("targets") or []
-        if not sources and not targets:
+        if not mapping.sources and not mapping.targets:
             return True
         
         return False
@@ -152,13 +152,24 @@ class InformaticaConverter:
         
         logger.info(f"Generated shared objects reference: {doc_path}")
 
-    def _generate_transformation_sql(self, filename, mapping_info, categorization_results):
+    def _generate_transformation_sql(self, filename, mapping, categorization_results):
         """Generates transformation SQL for an Informatica mapping using LLM."""
-        mapping_name = mapping_info.get("mapping_name", filename.replace(".XML", ""))
-        sources = mapping_info.get("sources", [])
-        targets = mapping_info.get("targets", [])
-        transformations = mapping_info.get("transformations", [])
-        logic_summary = mapping_info.get("logic_summary", "")
+        try:
+            sql = self._transformation_sql(filename, mapping)
+            
+            # Generate .sqlx file
+            self._create_transformation_sqlx(mapping.name, sql, mapping.sources, mapping.targets, categorization_results)
+            
+        except Exception as e:
+            logger.error(f"Failed to generate SQL for {mapping.name}: {e}")
+
+    def _transformation_sql(self, filename, mapping):
+        """Ask the LLM for the BigQuery SQL of one mapping. Independent of categorization."""
+        mapping_name = mapping.name or filename.replace(".XML", "")
+        sources = mapping.sources
+        targets = mapping.targets
+        transformations = mapping.transformations
+        logic_summary = mapping.logic_summary
         
         # Get function mappings from adapter to help with SQL conversion
         function_mappings = self.adapter.get_function_mappings()
@@ -226,17 +237,10 @@ class InformaticaConverter:
 Return ONLY the SQL query, no explanation.
 """
 
-        try:
-            sql_response = self.llm_client.generate_content(prompt)
-            
-            # Clean up response
-            sql = sql_response.replace("```sql", "").replace("```", "").strip()
-            
-            # Generate .sqlx file
-            self._create_transformation_sqlx(mapping_name, sql, sources, targets, categorization_results)
-            
-        except Exception as e:
-            logger.error(f"Failed to generate SQL for {mapping_name}: {e}")
+        sql_response = self.llm_client.generate_content(prompt, stage="informatica_sql", filename=filename, task="informatica_sql")
+        
+        # Clean up response
+        return sql_response.replace("```sql", "").replace("```", "").strip()
 
     def _create_transformation_sqlx(self, mapping_name, sql, sources, targets, categorization_results):
         """Creates a Dataform .sqlx file for the transformation."""
@@ -0,0 +1,390 @@
+"""
+Streaming extractor for Informatica PowerCenter XML exports.
+
+Walks POWERMART/REPOSITORY/FOLDER content with ``xml.etree.ElementTree.iterparse``
+and builds sources, targets, transformations, mapping data flow (connectors
+aggregated per instance pair), sessions (with their SQL overrides), command
+tasks and workflows without loading the document tree. Every element is
+cleared and detached from its parent at its end event - elements whose
+children are read are cleared once they have been read - so memory stays
+bounded by the largest single TRANSFORMATION rather than the export size.
+
+The structural part of the ETL analysis (mapping_name, sources, targets,
+transformations) comes straight from the extract. Only the expression-level
+detail - port expressions, SQL overrides, lookup/filter/join conditions,
+router groups, session overrides, commands and workflow link conditions - is
+handed to the LLM, which writes the logic summary.
+
+Set INFORMATICA_STREAMING_ENABLED=false to send the (truncated) raw XML instead.
+"""
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STREAMING_ENABLED = os.getenv("INFORMATICA_STREAMING_ENABLED", "true").lower() == "true"
+# Expression detail per LLM call; larger exports are split by mapping and analysed in parallel
+MAX_LOGIC_CHARS = int(os.getenv("INFORMATICA_MAX_LOGIC_CHARS", "32000"))
+# Longer single expressions / SQL overrides are cut to this length
+MAX_EXPRESSION_CHARS = 2000
+
+# Table attributes that carry logic worth interpreting
+LOGIC_ATTRIBUTES = {
+    "Sql Query", "User Defined Join", "Source Filter", "Pre SQL", "Post SQL",
+    "Lookup Sql Override", "Lookup table name", "Lookup condition", "Lookup Source Filter",
+    "Filter Condition", "Update Strategy Expression", "Join Condition", "Join Type",
+    "Sorter Key", "Group By",
+}
+# Element tags whose content (children included) is consumed when the element ends
+_HANDLED = {
+    "SOURCE", "TARGET", "TRANSFORMATION", "SHORTCUT", "INSTANCE", "CONNECTOR",
+    "SESSTRANSFORMATIONINST", "TASKINSTANCE", "WORKFLOWLINK",
+}
+_IDENTIFIER = re.compile(r"^[A-Za-z_$][\w$]*$")
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_EXPRESSION_CHARS else text[:MAX_EXPRESSION_CHARS] + " ..."
+
+
+class InformaticaExtract:
+    """Structured content of one Informatica export."""
+
+    def __init__(self):
+        self.folders: List[str] = []
+        self.sources: Dict[str, dict] = {}
+        self.targets: Dict[str, dict] = {}
+        # (mapping name or None for reusable, transformation name) -> definition
+        self.transformations: Dict[tuple, dict] = {}
+        self.shortcuts: Dict[str, str] = {}
+        self.mappings: List[dict] = []
+        self.sessions: List[dict] = []
+        self.commands: List[dict] = []
+        self.workflows: List[dict] = []
+
+    def is_empty(self) -> bool:
+        """True when nothing Informatica-shaped was found (e.g. some other XML document)."""
+        return not (self.sources or self.targets or self.transformations or self.mappings
+                    or self.sessions or self.commands or self.workflows)
+
+    # -------------------------------------------------------------------------
+    # Resolution helpers
+    # -------------------------------------------------------------------------
+
+    def resolve(self, name: str) -> str:
+        """Follow a Shortcut_To_X name to the object it references."""
+        return self.shortcuts.get(name, name)
+
+    def transformation(self, mapping: Optional[str], name: str) -> Optional[dict]:
+        return (self.transformations.get((mapping, name))
+                or self.transformations.get((None, name))
+                or self.transformations.get((None, self.resolve(name))))
+
+    # -------------------------------------------------------------------------
+    # Output
+    # -------------------------------------------------------------------------
+
+    def to_analysis(self) -> dict:
+        """The ETL analysis JSON shape (logic_summary is filled in by the caller)."""
+        sources, targets, transformations, seen = [], [], [], set()
+        mappings = []
+        for mapping in self.mappings:
+            m_transformations = []
+            for instance in mapping["instances"]:
+                if instance["kind"] == "SOURCE":
+                    name = self.resolve(instance["transformation_name"])
+                    if name not in sources:
+                        sources.append(name)
+                elif instance["kind"] == "TARGET":
+                    name = self.resolve(instance["transformation_name"])
+                    if name not in targets:
+                        targets.append(name)
+                else:
+                    definition = self.transformation(mapping["name"], instance["transformation_name"]) or {}
+                    entry = {
+                        "name": instance["name"],
+                        "type": instance["type"],
+                        "description": instance["description"] or definition.get("description", ""),
+                    }
+                    m_transformations.append(entry["name"])
+                    if (mapping["name"], entry["name"]) not in seen:
+                        seen.add((mapping["name"], entry["name"]))
+                        transformations.append(entry)
+            mappings.append({
+                "name": mapping["name"],
+                "kind": mapping["kind"],
+                "description": mapping["description"],
+                "transformations": m_transformations,
+                "data_flow": [
+                    {"from": src, "to": dst, "fields": count}
+                    for (src, dst), count in mapping["flow"].items()
+                ],
+                "target_load_order": mapping["load_order"],
+            })
+
+        if not self.mappings:
+            # Definition-only exports (shared folders): list the reusable objects
+            transformations = [
+                {"name": name, "type": t["type"], "description": t["description"]}
+                for (mapping, name), t in self.transformations.items() if mapping is None
+            ]
+
+        # Prefer a mapping over the mapplets it uses, and a workflow over its worklets
+        named = ([m for m in self.mappings if m["kind"] == "mapping"] or self.mappings
+                 or [w for w in self.workflows if w["kind"] == "workflow"] or self.workflows)
+        if named:
+            mapping_name = named[0]["name"]
+        else:
+            # Session exports: the mapping the session runs
+            mapping_name = next((s["mapping_name"] or s["name"] for s in self.sessions), None)
+        return {
+            "mapping_name": mapping_name,
+            "sources": sources,
+            "targets": targets,
+            "transformations": transformations,
+            "logic_summary": "",
+            "mappings": mappings,
+            "sessions": [
+                {"name": session["name"], "mapping_name": session["mapping_name"]} for session in self.sessions
+            ],
+            "commands": [{"name": task["name"], "commands": task["logic"]} for task in self.commands],
+            "workflows": self.workflows,
+            "folders": self.folders,
+        }
+
+    def logic_chunks(self, max_chars: int = MAX_LOGIC_CHARS) -> List[str]:
+        """Expression-level detail for the LLM, in mapping order, packed into chunks of ~max_chars.
+
+        Each chunk repeats the header and data flow of the mapping it
+        continues. Returns [] when nothing in the export needs interpreting.
+        """
+        groups = []
+        for mapping in self.mappings:
+            header = [f"{mapping['kind'].upper()} {mapping['name']}"
+                      + (f" -- {_clip(mapping['description'])}" if mapping["description"] else "")]
+            flow = " ; ".join(f"{src} -> {dst}" for src, dst in mapping["flow"])
+            if flow:
+                header.append(f"  flow: {_clip(flow)}")
+            members = [
+                (instance["type"], instance["name"],
+                 (self.transformation(mapping["name"], instance["transformation_name"]) or {}).get("logic"))
+                for instance in mapping["instances"] if instance["kind"] not in ("SOURCE", "TARGET")
+            ]
+            groups.append((header, members))
+        if not self.mappings:
+            members = [(t["type"], name, t["logic"]) for (owner, name), t in self.transformations.items() if owner is None]
+            groups.append((["REUSABLE TRANSFORMATIONS"], members))
+        for session in self.sessions:
+            members = [(kind, name, logic) for kind, name, logic in session["overrides"]]
+            groups.append(([f"SESSION {session['name']} (mapping {session['mapping_name']})"], members))
+        if self.commands:
+            groups.append((["COMMAND TASKS"], [("Command", task["name"], task["logic"]) for task in self.commands]))
+        for workflow in self.workflows:
+            links = [
+                f"{link['from']} -> {link['to']}" + (f" when {_clip(link['condition'])}" if link.get("condition") else "")
+                for link in workflow["links"]
+            ]
+            groups.append(([f"{workflow['kind'].upper()} {workflow['name']}"], [("links", "task order", links)]))
+
+        chunks, current, used = [], [], 0
+        for header, members in groups:
+            header_size = sum(len(line) + 1 for line in header)
+            in_chunk = False
+            for t_type, name, logic in members:
+                if not logic:
+                    continue
+                block = [f"  [{t_type}] {name}"] + [f"    {line}" for line in logic]
+                size = sum(len(line) + 1 for line in block)
+                if current and used + size + (0 if in_chunk else header_size) > max_chars:
+                    chunks.append("\n".join(current))
+                    current, used, in_chunk = [], 0, False
+                if not in_chunk:
+                    current.extend(header)
+                    used += header_size
+                    in_chunk = True
+                current.extend(block)
+                used += size
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def summary_without_llm(self) -> str:
+        """A deterministic logic summary for exports with no expression logic."""
+        parts = []
+        for workflow in self.workflows:
+            sessions = [t["task"] for t in workflow["tasks"] if t["type"] == "Session"]
+            parts.append(
+                f"{workflow['kind'].title()} {workflow['name']} runs {len(workflow['tasks'])} tasks"
+                + (f" including sessions {', '.join(sessions)}" if sessions else "") + "."
+            )
+        for session in self.sessions:
+            parts.append(f"Session {session['name']} executes mapping {session['mapping_name']}.")
+        for mapping in self.mappings:
+            parts.append(f"Mapping {mapping['name']} moves data through {len(mapping['instances'])} instances.")
+        if not parts and self.transformations:
+            parts.append(f"Shared folder export with {len(self.transformations)} reusable transformations, "
+                         f"{len(self.sources)} source and {len(self.targets)} target definitions.")
+        return " ".join(parts)
+
+
+class InformaticaXMLParser:
+    """Builds an InformaticaExtract from an export stream in bounded memory."""
+
+    def parse(self, source) -> InformaticaExtract:
+        """Parse a path or binary file object. Raises ET.ParseError on malformed XML."""
+        extract = InformaticaExtract()
+        stack: List[ET.Element] = []
+        mapping: Optional[dict] = None
+        session: Optional[dict] = None
+        task: Optional[dict] = None
+        workflow_stack: List[dict] = []
+        # Open _HANDLED elements; their descendants are kept until they have been read
+        reading = 0
+
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                stack.append(elem)
+                if tag in _HANDLED:
+                    reading += 1
+                elif tag == "FOLDER":
+                    extract.folders.append(elem.get("NAME", ""))
+                elif tag == "MAPPING" or tag == "MAPPLET":
+                    mapping = {
+                        "name": elem.get("NAME", ""),
+                        "kind": tag.lower(),
+                        "description": elem.get("DESCRIPTION", ""),
+                        "instances": [],
+                        "flow": {},
+                        "load_order": [],
+                    }
+                elif tag == "SESSION":
+                    session = {
+                        "name": elem.get("NAME", ""),
+                        "mapping_name": elem.get("MAPPINGNAME", ""),
+                        "overrides": [],
+                    }
+                elif tag == "TASK" and elem.get("TYPE") == "Command":
+                    task = {"name": elem.get("NAME", ""), "logic": []}
+                elif tag in ("WORKFLOW", "WORKLET"):
+                    workflow_stack.append({
+                        "name": elem.get("NAME", ""),
+                        "kind": tag.lower(),
+                        "description": elem.get("DESCRIPTION", ""),
+                        "tasks": [],
+                        "links": [],
+                    })
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if tag in _HANDLED:
+                reading -= 1
+                self._handle(tag, elem, extract, mapping, session, workflow_stack)
+            elif reading:
+                # Read together with its enclosing handled element
+                continue
+            elif tag == "TARGETLOADORDER" and mapping is not None:
+                mapping["load_order"].append(elem.get("TARGETINSTANCE", ""))
+            elif tag in ("MAPPING", "MAPPLET") and mapping is not None:
+                extract.mappings.append(mapping)
+                mapping = None
+            elif tag == "SESSION" and session is not None:
+                extract.sessions.append(session)
+                session = None
+            elif tag == "TASK" and task is not None:
+                if task["logic"]:
+                    extract.commands.append(task)
+                task = None
+            elif tag in ("WORKFLOW", "WORKLET") and workflow_stack:
+                extract.workflows.append(workflow_stack.pop())
+            elif tag == "VALUEPAIR" and task is not None and (elem.get("VALUE") or "").strip():
+                task["logic"].append(f"{elem.get('NAME', '')}: {_clip(elem.get('VALUE'))}")
+            elif tag == "SESSIONCOMPONENT" and session is not None and elem.get("REFOBJECTNAME"):
+                # Pre/post-session commands defined as reusable Command tasks
+                session["overrides"].append(("component", elem.get("TYPE", ""), [f"runs {elem.get('REFOBJECTNAME')}"]))
+            # Detach everything that has been read so the tree never grows past one object
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+
+        return extract
+
+    def _handle(self, tag, elem, extract: InformaticaExtract, mapping, session, workflow_stack):
+        if tag == "SOURCE":
+            extract.sources[elem.get("NAME", "")] = {
+                "database_type": elem.get("DATABASETYPE", ""),
+                "owner": elem.get("OWNERNAME", ""),
+                "fields": sum(1 for child in elem if child.tag == "SOURCEFIELD"),
+            }
+        elif tag == "TARGET":
+            extract.targets[elem.get("NAME", "")] = {
+                "database_type": elem.get("DATABASETYPE", ""),
+                "fields": sum(1 for child in elem if child.tag == "TARGETFIELD"),
+            }
+        elif tag == "SHORTCUT":
+            extract.shortcuts[elem.get("NAME", "")] = elem.get("REFOBJECTNAME", "") or elem.get("NAME", "")
+        elif tag == "TRANSFORMATION":
+            key = (mapping["name"] if mapping is not None else None, elem.get("NAME", ""))
+            extract.transformations[key] = {
+                "type": elem.get("TYPE", ""),
+                "description": elem.get("DESCRIPTION", ""),
+                "logic": self._transformation_logic(elem),
+            }
+        elif tag == "INSTANCE" and mapping is not None:
+            mapping["instances"].append({
+                "name": elem.get("NAME", ""),
+                "transformation_name": elem.get("TRANSFORMATION_NAME", "") or elem.get("NAME", ""),
+                "type": elem.get("TRANSFORMATION_TYPE", ""),
+                "kind": elem.get("TYPE", ""),
+                "description": elem.get("DESCRIPTION", ""),
+            })
+        elif tag == "CONNECTOR" and mapping is not None:
+            pair = (elem.get("FROMINSTANCE", ""), elem.get("TOINSTANCE", ""))
+            mapping["flow"][pair] = mapping["flow"].get(pair, 0) + 1
+        elif tag == "SESSTRANSFORMATIONINST" and session is not None:
+            # Session-level SQL overrides, pre/post SQL and source filters of one instance
+            overrides = [
+                f"{child.get('NAME', '')}: {_clip(child.get('VALUE'))}"
+                for child in elem
+                if child.tag == "ATTRIBUTE" and child.get("NAME") in LOGIC_ATTRIBUTES and (child.get("VALUE") or "").strip()
+            ]
+            if overrides:
+                session["overrides"].append((elem.get("TRANSFORMATIONTYPE", ""), elem.get("SINSTANCENAME", ""), overrides))
+        elif tag == "TASKINSTANCE" and workflow_stack:
+            workflow_stack[-1]["tasks"].append({
+                "name": elem.get("NAME", ""),
+                "task": elem.get("TASKNAME", ""),
+                "type": elem.get("TASKTYPE", ""),
+            })
+        elif tag == "WORKFLOWLINK" and workflow_stack:
+            link = {"from": elem.get("FROMTASK", ""), "to": elem.get("TOTASK", "")}
+            if elem.get("CONDITION"):
+                link["condition"] = elem.get("CONDITION")
+            workflow_stack[-1]["links"].append(link)
+
+    @staticmethod
+    def _transformation_logic(elem) -> List[str]:
+        """Non-trivial port expressions, logic-bearing attributes and router groups."""
+        logic = []
+        for child in elem:
+            if child.tag == "TRANSFORMFIELD":
+                expression = (child.get("EXPRESSION") or "").strip()
+                # Pass-through ports (the expression is just a port name) carry no logic
+                if expression and not _IDENTIFIER.match(expression):
+                    logic.append(f"{child.get('NAME', '')} = {_clip(expression)}")
+            elif child.tag == "TABLEATTRIBUTE":
+                name, value = child.get("NAME", ""), (child.get("VALUE") or "").strip()
+                if value and name in LOGIC_ATTRIBUTES:
+                    logic.append(f"{name}: {_clip(value)}")
+            elif child.tag == "GROUP" and child.get("EXPRESSION"):
+                logic.append(f"group {child.get('NAME', '')}: {_clip(child.get('EXPRESSION'))}")
+        return logic
+
+
+def parse_informatica_xml(source) -> InformaticaExtract:
+    return InformaticaXMLParser().parse(source)
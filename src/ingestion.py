@@ -1,25 +1,208 @@
-from google.cloud import storage
+"""
+GCS ingestion.
+
+Objects are listed page by page and downloaded ahead of analysis by a
+dedicated pool of threads sharing one HTTP connection pool, so network I/O
+overlaps LLM latency instead of running inside the analysis tasks.
+BlobPrefetcher keeps at most INGESTION_PREFETCH_FILES downloaded files that
+analysis hasn't finished with; listing and downloads pause while analysis
+catches up, which bounds memory on buckets with tens of thousands of objects.
+Listed objects read through the local blob cache (src/blob_cache.py), so
+unchanged objects are downloaded once across runs.
+"""
+import io
 import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+from src.blob_cache import CacheCounters, CachedBlob, decode_bytes, get_default_blob_cache
+from src.storage import create_storage_client
 
 logger = logging.getLogger(__name__)
 
+STREAMING_ENABLED = os.getenv("INGESTION_STREAMING_ENABLED", "true").lower() == "true"
+# Objects per list_blobs page
+PAGE_SIZE = int(os.getenv("INGESTION_PAGE_SIZE", "1000"))
+# Download threads; the HTTP connection pool is sized to match
+DOWNLOAD_WORKERS = int(os.getenv("INGESTION_DOWNLOAD_WORKERS", "16"))
+# Downloaded files held for analysis before listing and downloads wait
+PREFETCH_FILES = int(os.getenv("INGESTION_PREFETCH_FILES", "128"))
+
+
 class IngestionEngine:
-    def __init__(self, bucket_name):
+    def __init__(self, bucket_name, prefix: Optional[str] = None, page_size: int = PAGE_SIZE,
+                 download_workers: int = DOWNLOAD_WORKERS):
         self.bucket_name = bucket_name
-        self.client = storage.Client()
+        self.prefix = prefix or None
+        self.page_size = max(1, page_size)
+        self.download_workers = max(1, download_workers)
+        # Every download thread shares this client and its connection pool
+        self.client = create_storage_client(pool_size=self.download_workers)
         self.bucket = self.client.bucket(bucket_name)
+        # canonical blob name -> names of byte-identical copies skipped at listing
+        self.duplicates = {}
+        self.total_listed = 0
+        self.blob_cache = get_default_blob_cache()
+        self.cache_counters = CacheCounters()
+
+    def _cached(self, blob):
+        """`blob`, reading its content through the blob cache when one is enabled."""
+        if self.blob_cache is None:
+            return blob
+        return CachedBlob(blob, self.bucket_name, self.blob_cache, self.cache_counters)
+
+    def iter_files(self, admit: Optional[Callable] = None) -> Iterator:
+        """Yields the bucket's files under `prefix` page by page, skipping byte-identical duplicates.
+
+        Objects with the same MD5 and size as one already listed (e.g. the same
+        DDL under both input/ and Files for POC/) are recorded in
+        self.duplicates instead of being yielded, so each is analysed once.
+        Objects `admit` rejects (see src/ingestion_planner.py) are dropped first.
+        """
+        self.total_listed = 0
+        self.duplicates = {}
+        seen = {}
+        yielded = 0
+        pages = self.client.list_blobs(self.bucket_name, prefix=self.prefix, page_size=self.page_size).pages
+        for page_number, page in enumerate(pages, start=1):
+            blobs = list(page)
+            self.total_listed += len(blobs)
+            logger.debug(f"Listed page {page_number} of {self.bucket_name}: {len(blobs)} blobs")
+            for blob in blobs:
+                if admit and not admit(blob):
+                    continue
+                fingerprint = (blob.md5_hash, blob.size) if blob.md5_hash else None
+                if fingerprint and fingerprint in seen:
+                    canonical = seen[fingerprint]
+                    self.duplicates.setdefault(canonical, []).append(blob.name)
+                    logger.info(f"Skipping {blob.name}: identical to {canonical}")
+                    continue
+                if fingerprint:
+                    seen[fingerprint] = blob.name
+                yielded += 1
+                yield self._cached(blob)
 
-    def list_files(self):
-        """Lists all files in the bucket."""
+        logger.info(f"Listed {self.total_listed} blobs from gs://{self.bucket_name}/{self.prefix or ''}")
+        if self.duplicates:
+            skipped = sum(len(aliases) for aliases in self.duplicates.values())
+            logger.info(f"Skipped {skipped} duplicate blobs; {yielded} unique files to analyze")
+
+    def list_files(self, admit: Optional[Callable] = None):
+        """Lists all files in the bucket, skipping byte-identical duplicates."""
         try:
-            blobs = list(self.client.list_blobs(self.bucket_name))
-            logger.info(f"Listed {len(blobs)} blobs from {self.bucket_name}")
-            return blobs
+            return list(self.iter_files(admit))
         except Exception as e:
             logger.error(f"Error accessing bucket {self.bucket_name}: {e}")
             return []
 
+    def prefetch(self, blobs: Iterable, buffer_size: int = PREFETCH_FILES) -> "BlobPrefetcher":
+        """Download `blobs` ahead of analysis on this engine's download pool."""
+        return BlobPrefetcher(blobs, workers=self.download_workers, buffer_size=buffer_size)
+
+    def dedup_stats(self):
+        """Summary of duplicates skipped by the last listing."""
+        return {
+            "files_listed": self.total_listed,
+            "duplicate_files": sum(len(aliases) for aliases in self.duplicates.values()),
+            "duplicates": self.duplicates,
+        }
+
+    def cache_stats(self):
+        """Blob cache hits, misses and bytes downloaded by this engine."""
+        if self.blob_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache_counters.to_dict(), **self.blob_cache.stats()}
+
     def read_file(self, blob_name):
         """Reads content of a blob."""
         blob = self.bucket.blob(blob_name)
         return blob.download_as_text()
+
+
+class PrefetchedBlob:
+    """A listed blob whose content has already been downloaded.
+
+    Reads are served from memory until release() is called, after which they
+    go back to the underlying blob. Listing metadata (name, md5_hash, crc32c,
+    generation, size) is read through from the blob.
+    """
+
+    def __init__(self, blob, data: bytes, on_release=None):
+        self._blob = blob
+        self._data = data
+        self._on_release = on_release
+
+    def __getattr__(self, attr):
+        return getattr(self._blob, attr)
+
+    def download_as_bytes(self) -> bytes:
+        data = self._data
+        return data if data is not None else self._blob.download_as_bytes()
+
+    def download_as_text(self) -> str:
+        data = self._data
+        return decode_bytes(data) if data is not None else self._blob.download_as_text()
+
+    def open(self, mode: str = "rb"):
+        data = self._data
+        if data is not None and mode == "rb":
+            return io.BytesIO(data)
+        return self._blob.open(mode)
+
+    def release(self):
+        """Drop the buffered content and give its prefetch slot back; safe to call twice."""
+        self._data = None
+        on_release, self._on_release = self._on_release, None
+        if on_release:
+            on_release()
+
+
+class BlobPrefetcher:
+    """Downloads blobs on a thread pool and yields them, in listing order, as PrefetchedBlobs.
+
+    At most `buffer_size` yielded blobs may be unreleased; iteration (and with
+    it listing) waits for consumers to call release() beyond that.
+    """
+
+    def __init__(self, blobs: Iterable, workers: int = DOWNLOAD_WORKERS, buffer_size: int = PREFETCH_FILES):
+        self.blobs = blobs
+        self.workers = max(1, workers)
+        self.buffer_size = max(1, buffer_size)
+        self._slots = threading.BoundedSemaphore(self.buffer_size)
+        # Download threads update the counters concurrently
+        self._stats_lock = threading.Lock()
+        self.files_downloaded = 0
+        self.bytes_downloaded = 0
+
+    def _download(self, blob) -> PrefetchedBlob:
+        try:
+            data = blob.download_as_bytes()
+        except Exception as e:
+            # The analyzer downloads (and reports) it again on its own
+            logger.warning(f"Prefetch of {blob.name} failed: {e}")
+            data = None
+        else:
+            with self._stats_lock:
+                self.files_downloaded += 1
+                self.bytes_downloaded += len(data)
+        return PrefetchedBlob(blob, data, on_release=self._slots.release)
+
+    def __iter__(self) -> Iterator[PrefetchedBlob]:
+        window = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gcs-download") as pool:
+            for blob in self.blobs:
+                # Hand over finished downloads while waiting for a free slot
+                while not self._slots.acquire(blocking=False):
+                    if not window:
+                        self._slots.acquire()
+                        break
+                    yield window.popleft().result()
+                window.append(pool.submit(self._download, blob))
+                while window and window[0].done():
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+        logger.info(f"Prefetched {self.files_downloaded} files ({self.bytes_downloaded / 1e6:.1f} MB)")
@@ -1,4 +1,18 @@
-"""Utilities for parsing and repairing JSON from LLM responses."""
+"""Utilities for parsing and repairing JSON from LLM responses.
+
+Well-formed answers never reach Python-level scanning: the JSON is located
+with str.find (inside a ```json fence if there is one) and decoded in place
+with JSONDecoder.raw_decode, which stops at the end of the value. Answers
+that don't decode go through repair_json, a single pass over a regex
+tokenizer that knows where strings start and end. Repairs are therefore
+applied only to the structure and never to the text inside strings.
+
+An answer cut off at the model's output token limit is recovered rather than
+dropped: the repair closes the open arrays and objects and discards whatever
+the cut left incomplete - a key, a string or number, or an object that was an
+array element - so no half-written identifier survives. The resulting prefix
+is marked with PARTIAL_KEY so callers can ask for the rest (see LLMClient).
+"""
 
 import json
 import re
@@ -6,85 +20,454 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+_DECODER = json.JSONDecoder()
+_NO_JSON = "No JSON found in text"
+# Set to True on a dict recovered from a truncated answer
+PARTIAL_KEY = "_partial"
+
+# Opening markdown fence, preferring one tagged json
+_JSON_FENCE = re.compile(r"```[ \t]*json[ \t]*\r?\n", re.IGNORECASE)
+_ANY_FENCE = re.compile(r"```[\w+-]*[ \t]*\r?\n")
+_ROOT_START = re.compile(r"[{\[]")
+# A bracket with nothing but indentation before it on its line
+_LINE_ROOT_START = re.compile(r"^[ \t]*([{\[])", re.MULTILINE)
+# Strings are matched whole so brackets inside them are never counted
+_BRACKET_OR_STRING = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]', re.DOTALL)
+
+_WHITESPACE = re.compile(r"\s+")
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?(?:\*/|\Z)", re.DOTALL)
+# String bodies up to (not including) the next unescaped quote; may run to the end of the text
+_DQ_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+_SQ_BODY = re.compile(r"(?:[^'\\]|\\.)*", re.DOTALL)
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_WORD = re.compile(r"[A-Za-z_$][\w$.-]*")
+_VALID_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?\Z")
+# A backslash and the escape it starts; group 1 is empty for escapes JSON doesn't allow (e.g. SQL's \d)
+_ESCAPE = re.compile(r'\\(["\\/bfnrt]|u[0-9a-fA-F]{4})?')
+# Characters that, straight after a quote, show it closed the string ("" is the end of the text)
+_ENDS_STRING = frozenset(("", ",", ":", "}", "]", "\n", "\r"))
+# An object key after a quote: the quote closed a value and the comma before the key is missing
+_KEY_AHEAD = re.compile(r'\s*"(?:[^"\\\n]|\\.)*"\s*:')
+# The same for array items: whole strings, then the end of the item
+_ITEMS_AHEAD = re.compile(r'(?:[ \t]*"(?:[^"\\\n]|\\.)*")+[ \t]*(?:[,\]\n]|$)')
+_CONTROL_CHARS = re.compile(r"[\x00-\x1f]")
+_STRUCTURE = " \t\r\n,:{}[]"
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_LITERALS = {"true": "true", "false": "false", "null": "null",
+             "True": "true", "False": "false", "None": "null"}
+# Initial span decoded when checking whether a container is already valid
+_DECODE_WINDOW = 16 * 1024
+_CLOSERS = {"{": "}", "[": "]"}
+_OPENERS = {"}": "{", "]": "["}
+
+
+def _json_region(text: str) -> int:
+    """Offset to search for JSON from: just inside the first (preferably ```json) fence, else 0."""
+    fence = _JSON_FENCE.search(text) or _ANY_FENCE.search(text)
+    if fence and _ROOT_START.search(text, fence.end()):
+        return fence.end()
+    return 0
+
+
+def _root_candidates(text: str):
+    """Likely start offsets of the JSON value: the first bracket starting a line, then the first bracket."""
+    region = _json_region(text)
+    candidates = []
+    line_start = _LINE_ROOT_START.search(text, region)
+    if line_start:
+        candidates.append(line_start.start(1))
+    first = _ROOT_START.search(text, region)
+    if first and first.start() not in candidates:
+        candidates.append(first.start())
+    return candidates
+
+
+def _matching_end(text: str, start: int) -> int:
+    """Offset just past the bracket closing the one at `start`, or -1 if it never closes."""
+    depth = 0
+    for match in _BRACKET_OR_STRING.finditer(text, start):
+        token = match.group()
+        if token in "{[":
+            depth += 1
+        elif token in "}]":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return -1
+
 
 def extract_json(text: str) -> str:
-    """Extract JSON from text that may contain markdown code blocks or other content."""
+    """Extract JSON from text that may contain markdown code blocks or other content.
+
+    Returns the first complete object or array (braces inside strings don't
+    count), or everything from its opening bracket if it never closes.
+    """
     if not text:
         return ""
-    
-    # Remove markdown code blocks
-    text = text.replace("```json", "").replace("```", "").strip()
-    
-    # Find the JSON object or array
-    # Try to find object first
-    if "{" in text:
-        start = text.find("{")
-        # Find matching closing brace
-        depth = 0
-        for i, char in enumerate(text[start:], start):
-            if char == "{":
-                depth += 1
-            elif char == "}":
-                depth -= 1
-                if depth == 0:
-                    return text[start:i+1]
-    
-    # Try to find array
-    if "[" in text:
-        start = text.find("[")
-        depth = 0
-        for i, char in enumerate(text[start:], start):
-            if char == "[":
-                depth += 1
-            elif char == "]":
-                depth -= 1
-                if depth == 0:
-                    return text[start:i+1]
-    
-    return text
+    candidates = _root_candidates(text)
+    if not candidates:
+        return text.strip()
+    for start in candidates:
+        end = _matching_end(text, start)
+        if end > 0:
+            return text[start:end]
+    return text[candidates[0]:].strip()
+
+
+def _escape_string_body(body: str) -> str:
+    if "\\" in body:
+        body = _ESCAPE.sub(lambda m: m.group() if m.group(1) else "\\\\", body)
+    if _CONTROL_CHARS.search(body):
+        body = _CONTROL_CHARS.sub(lambda m: _CONTROL_ESCAPES.get(m.group(), ""), body)
+    return body
+
+
+def _closes_string(text: str, pos: int, in_array: bool = False) -> bool:
+    """True if the quote at `pos` plausibly ends a string.
+
+    It does if structure, a line break, the next key (or, in an array, the
+    next items) or the end of the input follows it; otherwise it is an
+    unescaped quote inside the string (``"the "main" table"``).
+    """
+    if text[pos + 1:pos + 2] in _ENDS_STRING:
+        return True
+    following = text[pos + 1:pos + 64]
+    rest = following.lstrip()
+    return not rest or rest[0] in ",:}]" or rest.startswith("```") \
+        or "\n" in following[:len(following) - len(rest)] \
+        or (rest[0] == '"' and (_ITEMS_AHEAD if in_array else _KEY_AHEAD).match(text, pos + 1) is not None)
+
+
+class _Repairer:
+    """One pass over the tokens of malformed JSON, writing out a corrected copy.
+
+    Arrays and objects that are already valid are copied through whole, so
+    only the containers around an error are tokenized.
+
+    Tracks the open containers and what each expects next (key, colon, value
+    or comma), which is enough to fix the mistakes LLMs make:
+    - trailing, doubled and missing commas; missing colons
+    - unquoted keys, single-quoted strings, Python True/False/None
+    - // and /* */ comments, prose or fences after the value
+    - raw control characters, stray unescaped quotes and invalid backslash
+      escapes inside strings
+    - a closing bracket of the wrong kind, when the right one was skipped
+    - truncation: containers still open at the end of the input are closed
+      (and `truncated` set), dropping a trailing key that has no value, a
+      string cut off mid-value and an array element object that was cut off
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.out = []
+        # [opener, expected, key offset in out, start offset in out] per open container;
+        # expected is key | colon | value | comma
+        self.stack = []
+        # Offset in out of a string the input ended inside (its comma included)
+        self.cut_at = None
+        self.comma_pending = False
+        self.root_done = False
+        self.truncated = False
+        # Set when the quoting couldn't be resolved; the output is then not trustworthy
+        self.unresolved = False
+
+    def repair(self) -> str:
+        text = self.text
+        pos, length = 0, len(text)
+        while pos < length and not self.root_done:
+            char = text[pos]
+            if char.isspace():
+                pos = _WHITESPACE.match(text, pos).end()
+            elif char == '"':
+                pos = self._double_quoted(pos)
+            elif char == "'":
+                body_end = _SQ_BODY.match(text, pos + 1).end()
+                body = text[pos + 1:body_end].replace("\\'", "'").replace('"', '\\"')
+                self._string('"' + _escape_string_body(body) + '"')
+                pos = body_end + 1
+            elif char in "{[":
+                pos = self._container(pos)
+            elif char in "}]":
+                self._close(_OPENERS[char])
+                pos += 1
+            elif char == ",":
+                if self.stack and self.stack[-1][1] == "comma":
+                    self.stack[-1][1] = "key" if self.stack[-1][0] == "{" else "value"
+                    self.comma_pending = True
+                pos += 1
+            elif char == ":":
+                if self.stack and self.stack[-1][1] == "colon":
+                    self.out.append(":")
+                    self.stack[-1][1] = "value"
+                pos += 1
+            elif char == "/" and (comment := _COMMENT.match(text, pos)):
+                pos = comment.end()
+            elif number := _NUMBER.match(text, pos):
+                # A number at the very end may have lost digits to truncation
+                if number.end() < length or not self.stack:
+                    self._scalar(self._number(number.group()))
+                pos = number.end()
+            elif word := _WORD.match(text, pos):
+                if word.end() < length or not self.stack or word.group() in _LITERALS:
+                    self._word(word.group())
+                pos = word.end()
+            else:
+                # Stray character (prose, fence backticks): drop it
+                pos += 1
+        if self.stack:
+            if _matching_end(text, _ROOT_START.search(text).start()) > 0:
+                # The brackets do balance, so the input wasn't cut off: quoting the
+                # repair couldn't resolve left containers open. Fail rather than guess.
+                return "".join(self.out)
+            self._close_truncated()
+        return "".join(self.out)
+
+    def _container(self, pos: int) -> int:
+        """Copy a well-formed array / object through whole (decoded in C); otherwise open it for repair."""
+        char = self.text[pos]
+        start = len(self.out)
+        if not self._before_value(is_key=False):
+            return pos + 1
+        end = self._valid_end(pos)
+        if end is None:
+            self.out.append(char)
+            self.stack.append([char, "key" if char == "{" else "value", None, start])
+            return pos + 1
+        self._after_value()
+        self.out.append(self.text[pos:end])
+        return end
+
+    def _valid_end(self, pos: int):
+        """End of the well-formed JSON value starting at `pos`, or None.
+
+        Decodes a window of the text that grows until the value fits: a
+        JSONDecodeError counts lines from the start of whatever it was given,
+        and on the whole text that made every failed attempt O(n).
+        """
+        text = self.text
+        window = _DECODE_WINDOW
+        while True:
+            chunk = text[pos:pos + window]
+            try:
+                return pos + _DECODER.raw_decode(chunk)[1]
+            except json.JSONDecodeError as e:
+                cut_short = pos + window < len(text) and (
+                    e.pos >= len(chunk) - 16 or e.msg.startswith("Unterminated string"))
+                if not cut_short:
+                    return None
+                window *= 4
+
+    def _double_quoted(self, pos: int) -> int:
+        text = self.text
+        body_start = pos + 1
+        body_end = _DQ_BODY.match(text, body_start).end()
+        # In a value, an unescaped quote followed by more text is part of the string, not its end
+        is_key = self._expects_key()
+        in_array = bool(self.stack) and self.stack[-1][0] == "["
+        while not is_key and body_end < len(text) and not _closes_string(text, body_end, in_array):
+            body_end = _DQ_BODY.match(text, body_end + 1).end()
+        body = text[body_start:body_end]
+        if is_key and body and (not body.strip(_STRUCTURE) or "\n" in body):
+            # Structure read as a key: an earlier quote was misread and the
+            # rest of the text is out of step
+            self.unresolved = True
+        if '"' in body:
+            body = re.sub(r'(?<!\\)"', '\\"', body)
+        if body_end >= len(text):
+            # No closing quote: the input was cut off inside this string
+            self.cut_at = len(self.out)
+        self._string('"' + _escape_string_body(body) + '"')
+        return body_end + 1
+
+    def _expects_key(self) -> bool:
+        return bool(self.stack) and self.stack[-1][0] == "{" and self.stack[-1][1] in ("key", "comma")
+
+    def _before_value(self, is_key: bool) -> bool:
+        """Emit any comma / colon the value (or key) about to be written needs; False to drop it."""
+        if not self.stack:
+            return not self.root_done
+        top = self.stack[-1]
+        mark = len(self.out)
+        if top[1] == "comma":
+            # Missing comma between two values
+            self.comma_pending = True
+            top[1] = "key" if top[0] == "{" else "value"
+        if self.comma_pending:
+            self.out.append(",")
+            self.comma_pending = False
+        if top[0] == "{":
+            if top[1] == "key":
+                if not is_key:
+                    return False
+                top[1] = "colon"
+                top[2] = mark
+                return True
+            if top[1] == "colon":
+                # Missing colon after a key
+                self.out.append(":")
+        top[1] = "comma"
+        return True
+
+    def _string(self, token: str):
+        if self._before_value(is_key=self._expects_key()):
+            self._after_value()
+            self.out.append(token)
+
+    def _scalar(self, token: str):
+        if self._expects_key():
+            self._string('"' + token + '"')
+        elif self._before_value(is_key=False):
+            self._after_value()
+            self.out.append(token)
+
+    def _word(self, word: str):
+        if not self._expects_key() and word in _LITERALS:
+            self._scalar(_LITERALS[word])
+        else:
+            self._string(json.dumps(word))
+
+    def _after_value(self):
+        if not self.stack:
+            self.root_done = True
+
+    @staticmethod
+    def _number(token: str) -> str:
+        if _VALID_NUMBER.match(token):
+            return token
+        token = token.lstrip("+")
+        sign = "-" if token.startswith("-") else ""
+        digits = token.lstrip("-")
+        mantissa, _, exponent = digits.replace("E", "e").partition("e")
+        whole, _, fraction = mantissa.partition(".")
+        whole = whole.lstrip("0") or "0"
+        number = sign + whole + ("." + fraction if fraction else "")
+        return number + ("e" + exponent if exponent else "")
+
+    def _close(self, opener: str):
+        if not any(entry[0] == opener for entry in self.stack):
+            return
+        while self.stack:
+            entry = self.stack.pop()
+            if entry[0] == "{" and entry[1] == "colon":
+                self.out.append(":null")
+            elif entry[0] == "{" and entry[1] == "value":
+                self.out.append("null")
+            # Trailing comma: simply never written
+            self.comma_pending = False
+            self.out.append(_CLOSERS[entry[0]])
+            if entry[0] == opener:
+                break
+        if self.stack:
+            self.stack[-1][1] = "comma"
+        else:
+            self.root_done = True
+
+    def _close_truncated(self):
+        """The input ended inside a container: keep the complete entries and close everything."""
+        for depth in range(1, len(self.stack)):
+            if self.stack[depth][0] == "{" and self.stack[depth - 1][0] == "[":
+                # An array element cut off part-way: drop the whole element
+                del self.out[self.stack[depth][3]:]
+                del self.stack[depth:]
+                self.cut_at = None
+                break
+        top = self.stack[-1]
+        if top[0] == "{" and (top[1] in ("colon", "value") or self.cut_at is not None):
+            # A key (and its comma) whose value was cut off
+            del self.out[top[2]:]
+        elif self.cut_at is not None:
+            # An array item cut off mid-string
+            del self.out[self.cut_at:]
+        self.comma_pending = False
+        while self.stack:
+            self.out.append(_CLOSERS[self.stack.pop()[0]])
+        self.truncated = True
+        self.root_done = True
 
 
 def repair_json(json_str: str) -> str:
-    """Attempt to repair common JSON errors from LLM responses."""
+    """Attempt to repair common JSON errors from LLM responses (see _Repairer)."""
     if not json_str:
         return json_str
-    
-    original = json_str
-    
-    # Fix trailing commas before closing brackets/braces
-    json_str = re.sub(r',\s*}', '}', json_str)
-    json_str = re.sub(r',\s*]', ']', json_str)
-    
-    # Fix missing commas between elements (common LLM error)
-    # Pattern: "value"\n  "key" -> "value",\n  "key"
-    json_str = re.sub(r'"\s*\n\s*"', '",\n"', json_str)
-    
-    # Pattern: }\n  { -> },\n  {
-    json_str = re.sub(r'}\s*\n\s*{', '},\n{', json_str)
-    
-    # Pattern: ]\n  [ -> ],\n  [
-    json_str = re.sub(r']\s*\n\s*\[', '],\n[', json_str)
-    
-    # Fix unquoted keys (key: value -> "key": value)
-    json_str = re.sub(r'([{,]\s*)([a-zA-Z_][a-zA-Z0-9_]*)\s*:', r'\1"\2":', json_str)
-    
-    # Fix single quotes to double quotes
-    # Be careful not to replace single quotes inside strings
-    # Simple approach: replace ' with " when it looks like a string delimiter
-    json_str = re.sub(r"'([^']*)'", r'"\1"', json_str)
-    
-    # Remove any control characters that might have snuck in
-    json_str = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', json_str)
-    
-    if json_str != original:
-        logger.debug(f"JSON repaired: {len(original)} -> {len(json_str)} chars")
-    
-    return json_str
+    repaired = _Repairer(json_str).repair()
+    if repaired != json_str:
+        logger.debug(f"JSON repaired: {len(json_str)} -> {len(repaired)} chars")
+    return repaired
+
+
+def _parse(text: str, allow_partial: bool = False):
+    """(value, None, truncated) or (None, error message, False) for an LLM response.
+
+    A value recovered from a truncated answer is only returned with
+    `allow_partial`, and only if no candidate parses completely.
+    """
+    if not text:
+        return None, "Empty text", False
+    candidates = _root_candidates(text)
+    if not candidates:
+        return None, _NO_JSON, False
+
+    first_error = None
+    for start in candidates:
+        try:
+            return _DECODER.raw_decode(text, start)[0], None, False
+        except json.JSONDecodeError as e:
+            first_error = first_error or e
+    logger.debug(f"Initial JSON parse failed: {first_error}")
+
+    repaired = partial = None
+    for start in candidates:
+        repairer = _Repairer(text[start:])
+        repaired = repairer.repair()
+        if repairer.unresolved:
+            continue
+        try:
+            value = json.loads(repaired)
+        except json.JSONDecodeError:
+            continue
+        if not repairer.truncated:
+            return value, None, False
+        if partial is None:
+            partial = value
+    if partial is not None:
+        if allow_partial:
+            return partial, None, True
+        return None, f"JSON parse failed: {first_error} (answer truncated)", False
+    logger.debug(f"Failed JSON (first 500 chars): {repaired[:500] if repaired else ''}")
+    return None, f"JSON parse failed: {first_error}", False
+
+
+def recover_truncated_json(text: str):
+    """Parse an LLM response that may have been cut off mid-answer.
+
+    Returns (value, truncated): the complete value with truncated False, or
+    the valid prefix of a cut-off answer (open strings, arrays and objects
+    closed) with truncated True. value is None if nothing could be parsed.
+    """
+    value, _, truncated = _parse(text, allow_partial=True)
+    return value, truncated
+
+
+def mark_partial(value):
+    """Mark a value recovered from a truncated answer. Only objects can carry
+    the marker; for arrays, check the answer with recover_truncated_json."""
+    if isinstance(value, dict):
+        value[PARTIAL_KEY] = True
+    return value
+
+
+def is_partial(value) -> bool:
+    """True for a dict recovered from a truncated answer (see mark_partial)."""
+    return isinstance(value, dict) and value.get(PARTIAL_KEY) is True
 
 
 def safe_parse_json(text: str, default=None):
     """Safely parse JSON from LLM response with extraction and repair.
-    
+
+    An answer cut off mid-way (e.g. at the output token limit) yields its
+    valid prefix; objects recovered this way carry PARTIAL_KEY = True
+    (arrays can't; use recover_truncated_json to tell).
+
     Args:
         text: Raw text that may contain JSON
         default: Value to return if parsing fails (default: None)
@@ -94,53 +477,158 @@ def safe_parse_json(text: str, default=None):
     """
     if not text:
         return default
-    
-    # Step 1: Extract JSON from text
-    json_str = extract_json(text)
-    
-    if not json_str:
-        logger.warning("No JSON found in text")
-        return default
-    
-    # Step 2: Try parsing as-is
-    try:
-        return json.loads(json_str)
-    except json.JSONDecodeError as e:
-        logger.debug(f"Initial JSON parse failed: {e}")
-    
-    # Step 3: Try with repairs
-    repaired = repair_json(json_str)
-    try:
-        return json.loads(repaired)
-    except json.JSONDecodeError as e:
-        logger.warning(f"JSON parse failed even after repair: {e}")
-        logger.debug(f"Failed JSON (first 500 chars): {repaired[:500]}")
+    value, error, truncated = _parse(text, allow_partial=True)
+    if error is not None:
+        logger.warning(error if error == _NO_JSON else f"{error} (even after repair)")
         return default
+    if truncated:
+        logger.warning(f"JSON answer was truncated after {len(text)} chars; keeping the complete part")
+        mark_partial(value)
+    return value
 
 
 def safe_parse_json_with_error(text: str):
     """Parse JSON and return (result, error) tuple.
     
+    Truncated answers count as errors here; use recover_truncated_json for them.
+
     Returns:
         Tuple of (parsed_json, None) on success, or (None, error_message) on failure
     """
-    if not text:
-        return None, "Empty text"
-    
-    json_str = extract_json(text)
-    
-    if not json_str:
-        return None, "No JSON found in text"
-    
-    # Try parsing as-is
-    try:
-        return json.loads(json_str), None
-    except json.JSONDecodeError as e:
-        original_error = str(e)
-    
-    # Try with repairs
-    repaired = repair_json(json_str)
-    try:
-        return json.loads(repaired), None
-    except json.JSONDecodeError as e:
-        return None, f"JSON parse failed: {original_error}"
+    value, error, _ = _parse(text)
+    return value, error
+
+
+# Marker for a streamed value that json.loads rejected
+_UNPARSED = object()
+
+
+class IncrementalJSONParser:
+    """Parses a streamed JSON object, returning top-level fields as soon as they complete.
+
+    Feed it chunks of an LLM response as they arrive. Leading prose or
+    markdown fences before the first '{' are ignored. Each call to feed()
+    returns the (key, value) pairs whose values finished in that chunk, so
+    consumers can act on e.g. "table_name" long before a large "columns"
+    array has finished streaming. Values that fail to parse are skipped here;
+    the caller should still run safe_parse_json on the complete text.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        # Scanned text from offset _base on, kept as received and joined only when a
+        # key or value is sliced out; appending to one string would recopy it per chunk
+        self._pieces = []
+        self._base = 0
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expecting = "key"
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self.fields = {}
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str):
+        """Consume a chunk and return the list of newly completed (key, value) pairs."""
+        if self._done or not chunk:
+            return []
+        if not self._started:
+            self._buffer.append(chunk)
+            pending = "".join(self._buffer)
+            start = pending.find("{")
+            if start < 0:
+                return []
+            self._buffer = []
+            self._started = True
+            chunk = pending[start:]
+        self._pieces.append(chunk)
+        completed = self._scan(chunk)
+        self._trim()
+        return completed
+
+    def _slice(self, start: int, end: int) -> str:
+        """Scanned text between absolute offsets `start` and `end`."""
+        if len(self._pieces) > 1:
+            self._pieces = ["".join(self._pieces)]
+        return self._pieces[0][start - self._base:end - self._base]
+
+    def _trim(self):
+        """Drop scanned text before the earliest offset a pending key or value still needs."""
+        keep = self._pos
+        if self._expecting == "key_end":
+            keep = self._key_start
+        elif self._value_start is not None:
+            keep = self._value_start
+        if keep > self._base:
+            self._pieces = ["".join(self._pieces)[keep - self._base:]]
+            self._base = keep
+
+    def _scan(self, chunk: str):
+        completed = []
+        offset = self._pos
+        j = 0
+        while j < len(chunk):
+            char = chunk[j]
+            i = offset + j
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expecting == "key_end":
+                        self._key = self._loads(self._slice(self._key_start, i + 1))
+                        self._expecting = "colon"
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expecting == "key":
+                    self._key_start = i
+                    self._expecting = "key_end"
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_value(self._slice(self._value_start, i) if self._value_start is not None else None, completed)
+                    self._done = True
+                    break
+            elif self._depth == 1:
+                if char == ":" and self._expecting == "colon":
+                    self._expecting = "value"
+                    self._value_start = i + 1
+                elif char == "," and self._expecting == "value":
+                    self._complete_value(self._slice(self._value_start, i), completed)
+                    self._expecting = "key"
+            j += 1
+        self._pos = offset + j
+        return completed
+
+    def _complete_value(self, raw, completed):
+        key, self._key, self._value_start = self._key, None, None
+        if key is None or raw is None or not raw.strip():
+            return
+        value = self._loads(raw)
+        if value is _UNPARSED:
+            value = self._loads(repair_json(raw.strip()))
+        if value is _UNPARSED:
+            logger.debug(f"Could not parse streamed field {key!r}")
+            return
+        self.fields[key] = value
+        completed.append((key, value))
+
+    @staticmethod
+    def _loads(raw):
+        try:
+            return json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return _UNPARSED
+
@@ -0,0 +1,335 @@
+"""
+Pluggable backends for LLMClient.
+
+- VertexBackend calls Gemini on Vertex AI (the default).
+- RecordingBackend wraps another backend and appends every prompt/response
+  pair to a JSONL cassette.
+- ReplayBackend serves responses from a cassette with no network access, with
+  configurable synthetic latency and error injection so that run_pipeline
+  throughput can be benchmarked and regression-tested offline.
+
+Every backend can also stream: astream() yields LLMResponse chunks whose text
+concatenates to the full response; usage is reported on the last chunk.
+
+Select with LLM_BACKEND=vertex|record|replay and LLM_CASSETTE_PATH, or the
+"llm_backend" / "llm_cassette" keys of the pipeline config.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional
+
+from src.llm_cache import make_cache_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", os.path.join("cassettes", "llm_cassette.jsonl"))
+# Milliseconds per replayed call, or "recorded" to reuse the latency captured while recording
+REPLAY_LATENCY_MS = os.getenv("LLM_REPLAY_LATENCY_MS", "0")
+REPLAY_ERROR_RATE = float(os.getenv("LLM_REPLAY_ERROR_RATE", "0"))
+REPLAY_SEED = int(os.getenv("LLM_REPLAY_SEED", "0"))
+# Size of the chunks ReplayBackend.astream splits a recorded response into
+REPLAY_CHUNK_CHARS = 512
+
+
+class LLMResponse:
+    """Text plus token usage for one generation."""
+
+    def __init__(self, text: str, usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.usage = usage or {}
+
+    @property
+    def total_tokens(self) -> Optional[int]:
+        return self.usage.get("total_tokens") or None
+
+
+class InjectedLLMError(Exception):
+    """Synthetic quota error raised by ReplayBackend's error injection."""
+
+
+class CassetteMissError(Exception):
+    """A replayed prompt was not found in the cassette."""
+
+
+class LLMBackend:
+    """Interface implemented by all backends."""
+
+    name = "base"
+    available = True
+
+    def generate(self, model_name: str, prompt: str, generation_config: Dict[str, Any]) -> LLMResponse:
+        raise NotImplementedError
+
+    async def agenerate(self, model_name: str, prompt: str, generation_config: Dict[str, Any]) -> LLMResponse:
+        raise NotImplementedError
+
+    async def astream(self, model_name: str, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[LLMResponse]:
+        """Yield the response in chunks. Backends without streaming yield it whole."""
+        yield await self.agenerate(model_name, prompt, generation_config)
+
+
+# Process-wide model handles, keyed by (project, location, model name), so that
+# vertexai.init and GenerativeModel construction happen once per process
+# rather than once per engine per run.
+_shared_models = {}
+_shared_models_lock = threading.Lock()
+
+
+def get_shared_model(project_id, location, model_name):
+    """Return the process-wide GenerativeModel for a project/location/model."""
+    # Imported lazily so replay runs work without the Vertex AI SDK installed
+    import vertexai
+    from vertexai.generative_models import GenerativeModel
+
+    key = (project_id, location, model_name)
+    with _shared_models_lock:
+        if key not in _shared_models:
+            vertexai.init(project=project_id, location=location)
+            _shared_models[key] = GenerativeModel(model_name)
+            logger.info(f"Initialized shared Vertex AI model {model_name} for {project_id}/{location}")
+        return _shared_models[key]
+
+
+# GenerativeModel's async client binds its transport to the event loop of its
+# first call, and run_sync gives each analysis / validation / pipeline run a
+# loop of its own. Async calls therefore use one model per running loop; the
+# entries go away with their loop.
+_loop_models = weakref.WeakKeyDictionary()
+
+
+def get_loop_model(project_id, location, model_name):
+    """Return the GenerativeModel for async calls on the running event loop."""
+    from vertexai.generative_models import GenerativeModel
+
+    loop = asyncio.get_running_loop()
+    key = (project_id, location, model_name)
+    with _shared_models_lock:
+        models = _loop_models.setdefault(loop, {})
+    if key not in models:
+        # Initialises vertexai for this project/location once per process
+        get_shared_model(project_id, location, model_name)
+        models[key] = GenerativeModel(model_name)
+    return models[key]
+
+
+def _usage_from_response(response) -> Dict[str, int]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+        "total_tokens": getattr(usage, "total_token_count", 0) or 0,
+    }
+
+
+class VertexBackend(LLMBackend):
+    """Gemini on Vertex AI."""
+
+    name = "vertex"
+
+    def __init__(self, project_id, location="us-central1", model_name=None):
+        self.project_id = project_id
+        self.location = location
+        self.default_model = model_name
+        try:
+            self.model = get_shared_model(project_id, location, model_name) if model_name else None
+            self.available = True
+        except Exception as e:
+            logger.error(f"Failed to initialize Vertex AI: {e}")
+            self.model = None
+            self.available = False
+
+    def _model_for(self, model_name):
+        if model_name == self.default_model and self.model is not None:
+            return self.model
+        return get_shared_model(self.project_id, self.location, model_name)
+
+    def generate(self, model_name, prompt, generation_config):
+        model = self._model_for(model_name)
+        if generation_config:
+            response = model.generate_content(prompt, generation_config=generation_config)
+        else:
+            response = model.generate_content(prompt)
+        return LLMResponse(response.text, _usage_from_response(response))
+
+    async def agenerate(self, model_name, prompt, generation_config):
+        model = get_loop_model(self.project_id, self.location, model_name)
+        if generation_config:
+            response = await model.generate_content_async(prompt, generation_config=generation_config)
+        else:
+            response = await model.generate_content_async(prompt)
+        return LLMResponse(response.text, _usage_from_response(response))
+
+    async def astream(self, model_name, prompt, generation_config):
+        model = get_loop_model(self.project_id, self.location, model_name)
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        stream = await model.generate_content_async(prompt, stream=True, **kwargs)
+        async for chunk in stream:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks carrying only finish reason / usage have no text part
+                text = ""
+            yield LLMResponse(text, _usage_from_response(chunk))
+
+
+class RecordingBackend(LLMBackend):
+    """Delegates to another backend and appends each exchange to a JSONL cassette."""
+
+    name = "record"
+
+    def __init__(self, inner: LLMBackend, cassette_path: str = DEFAULT_CASSETTE_PATH):
+        self.inner = inner
+        self.available = inner.available
+        self.cassette_path = cassette_path
+        self._lock = threading.Lock()
+        cassette_dir = os.path.dirname(cassette_path)
+        if cassette_dir:
+            os.makedirs(cassette_dir, exist_ok=True)
+        logger.info(f"Recording LLM exchanges to {cassette_path}")
+
+    def _record(self, model_name, prompt, generation_config, response: LLMResponse, latency: float):
+        entry = {
+            "key": make_cache_key(model_name, prompt, generation_config),
+            "model": model_name,
+            "generation_config": generation_config,
+            "prompt": prompt,
+            "response": response.text,
+            "usage": response.usage,
+            "latency_ms": round(latency * 1000, 1),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.cassette_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def generate(self, model_name, prompt, generation_config):
+        start = time.monotonic()
+        response = self.inner.generate(model_name, prompt, generation_config)
+        self._record(model_name, prompt, generation_config, response, time.monotonic() - start)
+        return response
+
+    async def agenerate(self, model_name, prompt, generation_config):
+        start = time.monotonic()
+        response = await self.inner.agenerate(model_name, prompt, generation_config)
+        self._record(model_name, prompt, generation_config, response, time.monotonic() - start)
+        return response
+
+    async def astream(self, model_name, prompt, generation_config):
+        start = time.monotonic()
+        parts, usage = [], {}
+        async for chunk in self.inner.astream(model_name, prompt, generation_config):
+            parts.append(chunk.text)
+            usage = chunk.usage or usage
+            yield chunk
+        self._record(model_name, prompt, generation_config, LLMResponse("".join(parts), usage), time.monotonic() - start)
+
+
+class ReplayBackend(LLMBackend):
+    """Serves recorded responses deterministically, with synthetic latency and errors.
+
+    Error injection is seeded per prompt and attempt, so a given cassette,
+    seed and error rate fail the same calls on every run regardless of the
+    order in which concurrent calls arrive.
+    """
+
+    name = "replay"
+
+    def __init__(self, cassette_path: str = DEFAULT_CASSETTE_PATH, latency_ms=REPLAY_LATENCY_MS,
+                 error_rate: float = REPLAY_ERROR_RATE, seed: int = REPLAY_SEED):
+        self.cassette_path = cassette_path
+        self.use_recorded_latency = str(latency_ms).lower() == "recorded"
+        self.latency_seconds = 0.0 if self.use_recorded_latency else float(latency_ms) / 1000.0
+        self.error_rate = error_rate
+        self.seed = seed
+        self._entries = self._load(cassette_path)
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self.misses = 0
+        self.injected_errors = 0
+
+    def _load(self, path) -> Dict[str, dict]:
+        entries = {}
+        if not os.path.exists(path):
+            logger.warning(f"LLM cassette not found: {path} - every call will miss")
+            return entries
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                entries[entry["key"]] = entry
+        logger.info(f"Loaded {len(entries)} recorded LLM exchanges from {path}")
+        return entries
+
+    def _lookup(self, model_name, prompt, generation_config):
+        """Return (entry, delay_seconds); raises for misses and injected errors."""
+        key = make_cache_key(model_name, prompt, generation_config)
+        entry = self._entries.get(key)
+
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+            if entry is None:
+                self.misses += 1
+
+        if entry is None:
+            raise CassetteMissError(f"Prompt not in cassette {self.cassette_path} (key {key[:12]})")
+
+        delay = entry.get("latency_ms", 0) / 1000.0 if self.use_recorded_latency else self.latency_seconds
+
+        if self.error_rate > 0:
+            digest = hashlib.sha256(f"{self.seed}:{key}:{attempt}".encode("utf-8")).digest()
+            if int.from_bytes(digest[:8], "big") / 2 ** 64 < self.error_rate:
+                with self._lock:
+                    self.injected_errors += 1
+                raise InjectedLLMError("429 Resource exhausted (injected by replay backend)")
+        return entry, delay
+
+    def generate(self, model_name, prompt, generation_config):
+        entry, delay = self._lookup(model_name, prompt, generation_config)
+        if delay:
+            time.sleep(delay)
+        return LLMResponse(entry["response"], entry.get("usage"))
+
+    async def agenerate(self, model_name, prompt, generation_config):
+        entry, delay = self._lookup(model_name, prompt, generation_config)
+        if delay:
+            await asyncio.sleep(delay)
+        return LLMResponse(entry["response"], entry.get("usage"))
+
+    async def astream(self, model_name, prompt, generation_config):
+        entry, delay = self._lookup(model_name, prompt, generation_config)
+        text = entry["response"]
+        chunks = [text[i:i + REPLAY_CHUNK_CHARS] for i in range(0, len(text), REPLAY_CHUNK_CHARS)] or [""]
+        # Spread the call's latency evenly over its chunks
+        per_chunk = delay / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if per_chunk:
+                await asyncio.sleep(per_chunk)
+            last = i == len(chunks) - 1
+            yield LLMResponse(chunk, entry.get("usage") if last else None)
+
+
+def create_backend(project_id, location="us-central1", model_name=None, backend: Optional[str] = None,
+                   cassette_path: Optional[str] = None) -> LLMBackend:
+    """Build the backend selected by argument or LLM_BACKEND (vertex | record | replay)."""
+    name = (backend or os.getenv("LLM_BACKEND", "vertex")).lower()
+    cassette_path = cassette_path or DEFAULT_CASSETTE_PATH
+
+    if name == "replay":
+        return ReplayBackend(cassette_path)
+    vertex = VertexBackend(project_id, location, model_name)
+    if name == "record":
+        return RecordingBackend(vertex, cassette_path)
+    if name != "vertex":
+        logger.warning(f"Unknown LLM backend '{name}', using vertex")
+    return vertex
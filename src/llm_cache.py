@@ -0,0 +1,171 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+
+Responses are keyed by a hash of (model name, prompt text, generation settings)
+and stored in a single SQLite database so that re-runs over unchanged DDL,
+procedures and Informatica exports do not pay for the same prompt twice.
+Entries are evicted least-recently-used once the cache exceeds its size cap,
+and unconditionally once they are older than the configured maximum age.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Cache location and limits - overridable per deployment
+DEFAULT_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(".cache", "llm"))
+DEFAULT_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "512"))
+DEFAULT_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+# Evict down to this fraction of the cap so we don't evict on every write
+_EVICT_TARGET_RATIO = 0.9
+
+
+def make_cache_key(model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """Build the content-addressed key for a prompt."""
+    payload = json.dumps(
+        {
+            "model": model_name,
+            "prompt": prompt,
+            "generation_config": generation_config or {},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed LRU cache for LLM responses.
+
+    A single instance is safe to share between threads. Several processes may
+    also point at the same database file; SQLite's WAL mode serialises writers.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_mb: int = DEFAULT_MAX_MB,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "responses.sqlite3")
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_age_seconds = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._purge_expired()
+        logger.info(f"LLM response cache opened at {self.path}")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            response, created_at = row
+            if self.max_age_seconds and now - created_at > self.max_age_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return response
+
+    def put(self, key: str, model_name: str, response: str):
+        """Store a response and evict old entries if the cache is over its cap."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, size, now, now),
+            )
+            self._conn.commit()
+            self._evict_to_size()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and total stored bytes."""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "path": self.path}
+
+    def _purge_expired(self):
+        """Drop entries older than max age."""
+        if not self.max_age_seconds:
+            return
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} expired LLM cache entries")
+
+    def _evict_to_size(self):
+        """Evict least-recently-used entries until under the size cap. Caller holds the lock."""
+        if not self.max_bytes:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * _EVICT_TARGET_RATIO)
+        evicted = 0
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._conn.commit()
+        logger.info(f"Evicted {evicted} LLM cache entries (LRU) to stay under {self.max_bytes} bytes")
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[LLMResponseCache]:
+    """Return the process-wide cache, or None if caching is disabled.
+
+    Controlled by LLM_CACHE_ENABLED (default true). Failing to open the
+    database disables caching rather than failing the run.
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() == "false":
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = LLMResponseCache()
+            except Exception as e:
+                logger.warning(f"LLM response cache unavailable, continuing without it: {e}")
+                return None
+        return _default_cache
@@ -1,31 +1,466 @@
-import vertexai
-from vertexai.generative_models import GenerativeModel
+import asyncio
+import concurrent.futures
 import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from src.llm_cache import LLMResponseCache, get_default_cache, make_cache_key
+from src.concurrency import AdaptiveConcurrencyLimiter, get_shared_limiter, is_backoff_error
+from src.rate_limiter import EXPECTED_OUTPUT_TOKENS, RateLimiter, estimate_tokens, get_shared_rate_limiter
+from src.llm_backends import LLMBackend, LLMResponse, create_backend
+from src.llm_metrics import LLMMetrics
+from src.json_utils import IncrementalJSONParser, mark_partial, recover_truncated_json
+from src.model_router import ModelRouter
+from src.prompts import CONTINUATION_PROMPT
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Retries for quota / deadline errors, with exponential backoff and jitter
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "2"))
+RETRY_MAX_SECONDS = 30.0
+
+# Follow-up requests for the rest of a JSON answer cut off at the output token limit (0 = keep the partial answer)
+MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", "1"))
+# A continuation that starts by repeating at least this much of the answer's tail has the repeat dropped
+_MIN_REPEATED_OVERLAP = 16
+_MAX_REPEATED_OVERLAP = 400
+
+# Sentinel so callers can explicitly pass cache=None to disable caching
+_DEFAULT = object()
+
+# Single-flight registry: prompts currently being generated anywhere in the
+# process. Identical concurrent prompts wait on the leader's future instead of
+# making (and paying for) their own upstream call.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _LeaderCancelled(Exception):
+    """Set on a coalesced future whose leading call was cancelled; its followers run the prompt again."""
+
+
+def field_progress_callback(stage: str, filename: str, status_callback) -> Optional[Callable[[str], None]]:
+    """Build an on_chunk callback that reports top-level JSON fields as they stream in.
+
+    Returns None when there is no status callback, so the call isn't streamed.
+    """
+    if not status_callback:
+        return None
+    parser = IncrementalJSONParser()
+
+    def on_chunk(text):
+        fields = parser.feed(text)
+        if fields:
+            status_callback(stage, f"{filename}: received {', '.join(key for key, _ in fields)}")
+
+    return on_chunk
+
+
+def _append_continuation(text: str, more: str) -> str:
+    """Join a truncated answer and the model's continuation of it.
+
+    Models sometimes wrap the continuation in a fence or restart it with the
+    last line they had written; both are dropped.
+    """
+    if more.lstrip().startswith("```"):
+        more = more.lstrip().partition("\n")[2]
+    for size in range(min(len(text), len(more), _MAX_REPEATED_OVERLAP), _MIN_REPEATED_OVERLAP - 1, -1):
+        if text.endswith(more[:size]):
+            more = more[size:]
+            break
+    return text + more
+
+
+def _emit_chunk(on_chunk, text):
+    """Pass a chunk to a streaming consumer without letting its errors fail the call."""
+    if not on_chunk or not text:
+        return
+    try:
+        on_chunk(text)
+    except Exception as e:
+        logger.warning(f"Streaming consumer raised: {e}")
+
+
 class LLMClient:
-    def __init__(self, project_id, location="us-central1"):
+    def __init__(self, project_id, location="us-central1", cache=_DEFAULT, generation_config: Optional[dict] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None, rate_limiter: Optional[RateLimiter] = None,
+                 backend: Optional[LLMBackend] = None, router: Optional[ModelRouter] = None):
         self.project_id = project_id
         self.location = location
-        self.mock_mode = False 
+        self.mock_mode = False
+        # User explicitly requested "gemini-2.5-flash"
+        self.model_name = DEFAULT_MODEL
+        self.generation_config = generation_config or {}
+        self.backend = backend or create_backend(project_id, location, self.model_name)
+        # Recording needs every prompt to reach the backend, and replay
+        # benchmarks should measure the backend, so only Vertex uses the cache.
+        if cache is _DEFAULT:
+            cache = get_default_cache() if self.backend.name == "vertex" else None
+        self.cache: Optional[LLMResponseCache] = cache
+        # Limiters are process-wide by default so concurrent runs share one quota
+        self.limiter = limiter or get_shared_limiter()
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+        self._stats_lock = threading.Lock()
+        self.metrics = LLMMetrics()
+        self.router = router or ModelRouter(default_model=self.model_name)
+
+    def generate_content(self, prompt, stage: Optional[str] = None, filename: Optional[str] = None,
+                         task: Optional[str] = None, model_name: Optional[str] = None):
+        """Generates content using the LLM, serving repeated prompts from the response cache.
+
+        Identical prompts already in flight elsewhere in the process are
+        coalesced: this call waits for that result instead of re-sending.
+        `stage` and `filename` label the call in the run's LLM metrics.
+        `task` lets the model router pick a model tier; `model_name`
+        overrides it.
+        """
+        model_name = self._resolve_model(task, prompt, model_name)
+        key = make_cache_key(model_name, prompt, self.generation_config)
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            self.metrics.record(stage, filename, model_name, source="cache")
+            return cached
+
+        start = time.monotonic()
+        while True:
+            future, leader = self._join_inflight(key)
+            if leader:
+                break
+            try:
+                text = future.result()
+            except _LeaderCancelled:
+                # One of the waiters takes over as leader
+                continue
+            self.metrics.record(stage, filename, model_name, latency=time.monotonic() - start, source="coalesced")
+            return text
         try:
-            vertexai.init(project=project_id, location=location)
-            # User explicitly requested "gemini-2.5-flash"
-            self.model = GenerativeModel("gemini-2.5-flash")
-        except Exception as e:
-            logger.error(f"Failed to initialize Vertex AI: {e}")
-            self.model = None
+            text = self._generate_uncached(prompt, key, model_name, stage, filename)
+            if not future.done():
+                future.set_result(text)
+            return text
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            self._leave_inflight(key, future)
+
+    async def agenerate_content(self, prompt, stage: Optional[str] = None, filename: Optional[str] = None,
+                                on_chunk: Optional[Callable[[str], None]] = None, task: Optional[str] = None,
+                                model_name: Optional[str] = None):
+        """Async variant of generate_content for engines running on an event loop.
+
+        With `on_chunk`, the response is streamed and each text chunk is passed
+        to the callback as it arrives; the full text is still returned. Cached
+        and coalesced responses are delivered to the callback as one chunk.
+        """
+        model_name = self._resolve_model(task, prompt, model_name)
+        key = make_cache_key(model_name, prompt, self.generation_config)
+        cached = await asyncio.to_thread(self._cache_lookup, key)
+        if cached is not None:
+            self.metrics.record(stage, filename, model_name, source="cache")
+            _emit_chunk(on_chunk, cached)
+            return cached
+
+        start = time.monotonic()
+        while True:
+            future, leader = self._join_inflight(key)
+            if leader:
+                break
+            try:
+                # Shielded: a cancelled follower must not cancel the future other callers share
+                text = await asyncio.shield(asyncio.wrap_future(future))
+            except _LeaderCancelled:
+                # One of the waiters takes over as leader
+                continue
+            self.metrics.record(stage, filename, model_name, latency=time.monotonic() - start, source="coalesced")
+            _emit_chunk(on_chunk, text)
+            return text
+        try:
+            text = await self._agenerate_uncached(prompt, key, model_name, stage, filename, on_chunk)
+            if not future.done():
+                future.set_result(text)
+            return text
+        except asyncio.CancelledError:
+            # Only this caller was cancelled: release the prompt to the callers waiting on it
+            self._leave_inflight(key, future)
+            if not future.done():
+                future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            self._leave_inflight(key, future)
+
+    def generate_json(self, prompt, stage: Optional[str] = None, filename: Optional[str] = None,
+                      task: Optional[str] = None):
+        """Generate and parse a JSON answer, escalating the model tier when parsing fails.
 
-    def generate_content(self, prompt):
-        """Generates content using the LLM."""
-        if not self.model:
+        An answer cut off at the output token limit isn't regenerated: up to
+        LLM_MAX_CONTINUATIONS follow-up requests ask the same model for only
+        the rest of it. If it is still incomplete, the valid prefix is
+        returned; objects are marked with json_utils.PARTIAL_KEY.
+
+        Returns (text, parsed); parsed is None if even the top tier's answer
+        couldn't be parsed, in which case text is that last answer, or if the
+        call itself failed ("Error: ..."), which is returned without escalating.
+        """
+        exchange = self._json_exchange(prompt, stage, filename, task)
+        request = next(exchange)
+        while True:
+            call_prompt, call_stage, model_name, _ = request
+            text = self.generate_content(call_prompt, call_stage, filename, model_name=model_name)
+            try:
+                request = exchange.send(text)
+            except StopIteration as done:
+                return done.value
+
+    async def agenerate_json(self, prompt, stage: Optional[str] = None, filename: Optional[str] = None,
+                             task: Optional[str] = None, on_chunk: Optional[Callable[[str], None]] = None):
+        """Async variant of generate_json."""
+        exchange = self._json_exchange(prompt, stage, filename, task)
+        request = next(exchange)
+        while True:
+            call_prompt, call_stage, model_name, stream = request
+            text = await self.agenerate_content(call_prompt, call_stage, filename,
+                                                on_chunk=on_chunk if stream else None, model_name=model_name)
+            try:
+                request = exchange.send(text)
+            except StopIteration as done:
+                return done.value
+
+    def _json_exchange(self, prompt, stage: Optional[str], filename: Optional[str], task: Optional[str]):
+        """The parse / continue / escalate decisions behind generate_json and agenerate_json.
+
+        A generator: yields (prompt, stage, model name, stream) for each LLM
+        call it needs, is sent the answer text, and returns (text, parsed).
+        Only the answer to the original prompt is streamed.
+        """
+        tier = self.router.route(task, prompt)
+        while True:
+            model_name = self.router.model_for(tier)
+            text = yield prompt, stage, model_name, True
+            if text.startswith("Error"):
+                # The call failed (quota, deadline, no model): a bigger model would only add load
+                return text, None
+            parsed, truncated = recover_truncated_json(text)
+            answer, continued = text, False
+            for _ in range(MAX_CONTINUATIONS if truncated else 0):
+                more = yield self._continuation_prompt(prompt, answer), self._continuation_stage(stage), model_name, False
+                if not more or more.startswith("Error"):
+                    break
+                answer, continued = _append_continuation(answer, more), True
+                completed, still_truncated = recover_truncated_json(answer)
+                if completed is not None and not still_truncated:
+                    text, parsed, truncated = answer, completed, False
+                    break
+            if parsed is not None:
+                self._log_continuation(truncated, continued, filename)
+                return text, mark_partial(parsed) if truncated else parsed
+            logger.warning(f"Could not parse the JSON answer for {filename or 'prompt'} from {model_name}")
+            tier = self.router.escalate(task, tier)
+            if tier is None:
+                return text, None
+
+    @staticmethod
+    def _continuation_prompt(prompt, text: str) -> str:
+        return CONTINUATION_PROMPT.format(prompt=prompt, answer=text)
+
+    @staticmethod
+    def _continuation_stage(stage: Optional[str]) -> str:
+        return f"{stage}_continuation" if stage else "continuation"
+
+    @staticmethod
+    def _log_continuation(truncated: bool, continued: bool, filename: Optional[str]):
+        if not truncated:
+            if continued:
+                logger.info(f"Completed the truncated answer for {filename or 'prompt'} with a continuation request")
+            return
+        logger.warning(f"Keeping the truncated answer for {filename or 'prompt'} as a partial result"
+                       + (" (continuation didn't complete it)" if continued else ""))
+
+    def _resolve_model(self, task, prompt, model_name):
+        if model_name:
+            return model_name
+        if task:
+            return self.router.model_for(self.router.route(task, prompt))
+        return self.model_name
+
+    def _join_inflight(self, key):
+        """Return (future, is_leader) for a prompt key."""
+        with _inflight_lock:
+            future = _inflight.get(key)
+            if future is not None:
+                with self._stats_lock:
+                    self.coalesced += 1
+                logger.info("Coalescing duplicate in-flight LLM prompt")
+                return future, False
+            future = concurrent.futures.Future()
+            _inflight[key] = future
+            return future, True
+
+    def _leave_inflight(self, key, future):
+        with _inflight_lock:
+            # A waiter may already have taken the key over as the new leader
+            if _inflight.get(key) is future:
+                del _inflight[key]
+
+    def _generate_uncached(self, prompt, cache_key, model_name, stage=None, filename=None):
+        if not self.backend.available:
+            logger.error("Vertex AI model not initialized.")
+            self.metrics.record(stage, filename, model_name, error="Model not initialized")
+            return "Error: Model not initialized."
+
+        estimated = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+        for attempt in range(MAX_RETRIES + 1):
+            self.rate_limiter.acquire_sync(estimated)
+            token = self.limiter.acquire_sync()
+            start = time.monotonic()
+            error = None
+            try:
+                response = self.backend.generate(model_name, prompt, self.generation_config)
+                text = response.text
+                self.rate_limiter.reconcile(estimated, response.total_tokens)
+            except Exception as e:
+                error = e
+            finally:
+                latency = time.monotonic() - start
+                self.limiter.release(token, latency, error)
+
+            if error is None:
+                self._record_call(model_name, stage, filename, prompt, response, latency, attempt)
+                self._cache_store(cache_key, text, model_name)
+                return text
+            if not is_backoff_error(error) or attempt == MAX_RETRIES:
+                logger.error(f"Error generating content: {error}")
+                self.metrics.record(stage, filename, model_name, latency=latency, retries=attempt, error=str(error))
+                return f"Error: {error}"
+            time.sleep(self._retry_delay(attempt))
+
+    async def _agenerate_uncached(self, prompt, cache_key, model_name, stage=None, filename=None, on_chunk=None):
+        if not self.backend.available:
             logger.error("Vertex AI model not initialized.")
+            self.metrics.record(stage, filename, model_name, error="Model not initialized")
             return "Error: Model not initialized."
-        
+
+        estimated = estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_limiter.acquire(estimated)
+            token = await self.limiter.acquire()
+            start = time.monotonic()
+            error = None
+            stream_state = {"emitted": False, "first_chunk": None}
+            try:
+                if on_chunk:
+                    response = await self._astream_backend(prompt, model_name, on_chunk, stream_state)
+                else:
+                    response = await self.backend.agenerate(model_name, prompt, self.generation_config)
+                text = response.text
+                self.rate_limiter.reconcile(estimated, response.total_tokens)
+            except Exception as e:
+                error = e
+            finally:
+                latency = time.monotonic() - start
+                self.limiter.release(token, latency, error)
+
+            if error is None:
+                first_chunk = stream_state["first_chunk"] - start if stream_state["first_chunk"] else None
+                self._record_call(model_name, stage, filename, prompt, response, latency, attempt, first_chunk)
+                await asyncio.to_thread(self._cache_store, cache_key, text, model_name)
+                return text
+            # Chunks already handed to the caller can't be taken back, so a
+            # stream that fails part-way is not retried.
+            if not is_backoff_error(error) or attempt == MAX_RETRIES or stream_state["emitted"]:
+                logger.error(f"Error generating content: {error}")
+                self.metrics.record(stage, filename, model_name, latency=latency, retries=attempt, error=str(error))
+                return f"Error: {error}"
+            await asyncio.sleep(self._retry_delay(attempt))
+
+    async def _astream_backend(self, prompt, model_name, on_chunk, stream_state) -> LLMResponse:
+        """Stream one attempt from the backend, forwarding text chunks to on_chunk."""
+        parts, usage = [], {}
+        async for chunk in self.backend.astream(model_name, prompt, self.generation_config):
+            usage = chunk.usage or usage
+            if not chunk.text:
+                continue
+            if not stream_state["emitted"]:
+                stream_state["emitted"] = True
+                stream_state["first_chunk"] = time.monotonic()
+            parts.append(chunk.text)
+            _emit_chunk(on_chunk, chunk.text)
+        return LLMResponse("".join(parts), usage)
+
+    def _record_call(self, model_name, stage, filename, prompt, response: LLMResponse, latency: float, retries: int,
+                     first_chunk: Optional[float] = None):
+        """Record a successful upstream call, estimating tokens if the backend reported no usage."""
+        usage = response.usage
+        estimated = not usage.get("total_tokens")
+        self.metrics.record(
+            stage, filename, model_name,
+            prompt_tokens=estimate_tokens(prompt) if estimated else usage.get("prompt_tokens", 0),
+            output_tokens=estimate_tokens(response.text) if estimated else usage.get("output_tokens", 0),
+            latency=latency,
+            retries=retries,
+            estimated=estimated,
+            first_chunk_latency=first_chunk,
+        )
+
+    def _retry_delay(self, attempt: int) -> float:
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _cache_lookup(self, cache_key):
+        """Return the cached text for a key, or None on a miss or when caching is off."""
+        if not self.cache:
+            return None
+        try:
+            cached = self.cache.get(cache_key)
+        except Exception as e:
+            # A locked, corrupt or unreadable cache is a miss, never a failed call
+            logger.warning(f"Failed to read LLM cache entry: {e}")
+            cached = None
+        self._count(hit=cached is not None)
+        return cached
+
+    def _cache_store(self, cache_key, text, model_name):
+        if not self.cache:
+            return
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            self.cache.put(cache_key, model_name, text)
         except Exception as e:
-            logger.error(f"Error generating content: {e}")
-            return f"Error: {e}"
+            logger.warning(f"Failed to write LLM cache entry: {e}")
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def cache_stats(self) -> dict:
+        """Return hit/miss counters for this client (i.e. for one pipeline run)."""
+        with self._stats_lock:
+            hits, misses = self.cache_hits, self.cache_misses
+        lookups = hits + misses
+        return {
+            "enabled": self.cache is not None,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def dedup_stats(self) -> dict:
+        """Return how many calls from this client were served by another in-flight call."""
+        with self._stats_lock:
+            return {"coalesced_prompts": self.coalesced}
@@ -0,0 +1,132 @@
+"""
+Per-call telemetry for LLM requests.
+
+LLMClient records one entry per generate_content call (stage, filename,
+prompt/output tokens, latency, retries, and whether the answer came from the
+response cache or a coalesced in-flight call). run_pipeline writes the
+aggregate to llm_metrics.json in the run's output directory, with latency
+percentiles and a cost estimate broken down by stage and by file type.
+"""
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens (gemini-2.5-flash list prices by default)
+PRICE_INPUT_PER_MTOK = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", "0.30"))
+PRICE_OUTPUT_PER_MTOK = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", "2.50"))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def estimate_cost(prompt_tokens: int, output_tokens: int) -> float:
+    return (prompt_tokens * PRICE_INPUT_PER_MTOK + output_tokens * PRICE_OUTPUT_PER_MTOK) / 1_000_000
+
+
+def _file_type(filename: Optional[str]) -> str:
+    if not filename:
+        return "(none)"
+    ext = os.path.splitext(filename)[1].lower()
+    return ext or "(no extension)"
+
+
+class LLMMetrics:
+    """Thread-safe collector of LLM call records for one pipeline run."""
+
+    def __init__(self):
+        self._calls: List[dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: Optional[str], filename: Optional[str], model: str, prompt_tokens: int = 0,
+               output_tokens: int = 0, latency: float = 0.0, retries: int = 0, source: str = "llm",
+               error: Optional[str] = None, estimated: bool = False, first_chunk_latency: Optional[float] = None):
+        """Record one call. `source` is "llm", "cache" or "coalesced"; only "llm" calls are billed."""
+        call = {
+            "stage": stage or "unknown",
+            "filename": filename,
+            "model": model,
+            "source": source,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "latency_seconds": round(latency, 4),
+            "first_chunk_seconds": round(first_chunk_latency, 4) if first_chunk_latency is not None else None,
+            "retries": retries,
+            "tokens_estimated": estimated,
+            "error": error,
+        }
+        with self._lock:
+            self._calls.append(call)
+
+    @property
+    def calls(self) -> List[dict]:
+        with self._lock:
+            return list(self._calls)
+
+    @staticmethod
+    def _aggregate(calls: List[dict]) -> dict:
+        billed = [c for c in calls if c["source"] == "llm"]
+        latencies = [c["latency_seconds"] for c in billed]
+        first_chunks = [c["first_chunk_seconds"] for c in billed if c["first_chunk_seconds"] is not None]
+        prompt_tokens = sum(c["prompt_tokens"] for c in billed)
+        output_tokens = sum(c["output_tokens"] for c in billed)
+        return {
+            "calls": len(calls),
+            "llm_calls": len(billed),
+            "cache_hits": sum(1 for c in calls if c["source"] == "cache"),
+            "coalesced": sum(1 for c in calls if c["source"] == "coalesced"),
+            "errors": sum(1 for c in calls if c["error"]),
+            "retries": sum(c["retries"] for c in calls),
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+            "latency_seconds": {
+                "total": round(sum(latencies), 3),
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "max": round(max(latencies), 3) if latencies else 0.0,
+                "first_chunk_p50": round(percentile(first_chunks, 50), 3),
+            },
+            "estimated_cost_usd": round(estimate_cost(prompt_tokens, output_tokens), 4),
+        }
+
+    def summary(self) -> dict:
+        """Totals plus per-stage and per-file-type breakdowns."""
+        calls = self.calls
+        by_stage: Dict[str, List[dict]] = {}
+        by_type: Dict[str, List[dict]] = {}
+        by_model: Dict[str, List[dict]] = {}
+        for call in calls:
+            by_stage.setdefault(call["stage"], []).append(call)
+            by_type.setdefault(_file_type(call["filename"]), []).append(call)
+            by_model.setdefault(call["model"], []).append(call)
+        return {
+            "pricing_usd_per_million_tokens": {"input": PRICE_INPUT_PER_MTOK, "output": PRICE_OUTPUT_PER_MTOK},
+            "totals": self._aggregate(calls),
+            "by_stage": {stage: self._aggregate(c) for stage, c in sorted(by_stage.items())},
+            "by_file_type": {ftype: self._aggregate(c) for ftype, c in sorted(by_type.items())},
+            "by_model": {model: self._aggregate(c) for model, c in sorted(by_model.items())},
+        }
+
+    def write(self, path: str, extra: Optional[dict] = None) -> dict:
+        """Write the summary (plus any `extra` sections) and raw call log to `path`; returns the summary."""
+        summary = {**self.summary(), **(extra or {})}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**summary, "calls": self.calls}, f, indent=2)
+        totals = summary["totals"]
+        logger.info(
+            f"LLM usage: {totals['llm_calls']} calls, {totals['total_tokens']} tokens, "
+            f"p95 {totals['latency_seconds']['p95']}s, ~${totals['estimated_cost_usd']}"
+        )
+        return summary
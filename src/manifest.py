@@ -0,0 +1,161 @@
+"""
+Per-file analysis manifest for incremental runs.
+
+Every run writes analysis_manifest.json next to analysis_results.json: one
+entry per analysed file with its fingerprint and analysis result. A later run
+pointed at that run (config "baseline_run_id") reuses the result of every file
+whose fingerprint still matches and only analyses added or changed files.
+
+Fingerprints come from listing metadata where possible so unchanged GCS
+objects are never downloaded: the object's MD5 (or CRC32C for composite
+objects) plus its generation and size. ZIP members use the CRC-32 and size
+from the archive's central directory; tar members and local files are hashed
+with SHA-256.
+Results are only reused when the baseline analysed the same source system.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from src.json_utils import is_partial, recover_truncated_json
+from src.models import json_default
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "analysis_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_key(blob) -> str:
+    """Stable identity of a file across runs: its local path or object name."""
+    path = getattr(blob, "path", None)
+    return os.path.abspath(path) if path else blob.name
+
+
+def fingerprint(blob) -> dict:
+    """Content fingerprint for a GCS blob (from listing metadata), an archive member or a local file (hashed)."""
+    md5 = getattr(blob, "md5_hash", None)
+    crc32c = getattr(blob, "crc32c", None)
+    if md5 or crc32c:
+        return {
+            "md5": md5,
+            "crc32c": crc32c,
+            "generation": getattr(blob, "generation", None),
+            "size": getattr(blob, "size", None),
+        }
+    # ZIP members carry a CRC-32 in the central directory; tar members are hashed as they stream
+    crc32 = getattr(blob, "crc32", None)
+    if crc32:
+        return {"crc32": crc32, "size": getattr(blob, "size", None)}
+    content_hash = getattr(blob, "content_hash", None)
+    if content_hash:
+        return {"content_hash": content_hash}
+    digest = hashlib.sha256()
+    with blob.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"content_hash": digest.hexdigest()}
+
+
+def _partial_result(result: dict) -> bool:
+    """True for an analysis recovered from a truncated LLM answer (object or array)."""
+    if is_partial(result.get("parsed")):
+        return True
+    analysis = result.get("analysis")
+    return isinstance(analysis, str) and not analysis.startswith(("Error", "Skipped")) \
+        and recover_truncated_json(analysis)[1]
+
+
+def same_content(old: dict, new: dict) -> bool:
+    """True if two fingerprints describe the same bytes."""
+    for field in ("content_hash", "md5", "crc32c", "crc32"):
+        if old.get(field) and new.get(field):
+            return old[field] == new[field] and old.get("size") == new.get("size")
+    # Same object generation means the object hasn't been rewritten
+    return bool(old.get("generation")) and old.get("generation") == new.get("generation")
+
+
+class AnalysisManifest:
+    """File fingerprints and analysis results for one run."""
+
+    def __init__(self, run_id: str, source_system: Optional[str], files: Optional[Dict[str, dict]] = None):
+        self.run_id = run_id
+        self.source_system = source_system
+        self.files: Dict[str, dict] = files or {}
+
+    @classmethod
+    def load(cls, path: str) -> Optional["AnalysisManifest"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring manifest {path}: version {data.get('version')} != {MANIFEST_VERSION}")
+            return None
+        return cls(data.get("run_id"), data.get("source_system"), data.get("files", {}))
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "run_id": self.run_id,
+                "source_system": self.source_system,
+                "written_at": datetime.now(timezone.utc).isoformat(),
+                "files": self.files,
+            }, f, indent=2, default=json_default)
+
+    def record(self, key: str, result_name: str, file_fingerprint: dict, result: dict,
+               content_fingerprint: Optional[str] = None):
+        self.files[key] = {"name": result_name, "fingerprint": file_fingerprint, "result": result}
+        if content_fingerprint:
+            # Normalised-content fingerprint (src/dedup.py) for matching copies in later runs
+            self.files[key]["content_fingerprint"] = content_fingerprint
+
+    def content_fingerprint(self, key: str) -> Optional[str]:
+        return self.files.get(key, {}).get("content_fingerprint")
+
+    def match(self, blob, source_system: Optional[str]) -> Tuple[Optional[dict], dict]:
+        """(reusable baseline result or None, fingerprint) for one blob."""
+        try:
+            blob_fingerprint = fingerprint(blob)
+        except Exception as e:
+            logger.warning(f"Could not fingerprint {blob.name}, re-analysing: {e}")
+            return None, {}
+        entry = self.files.get(file_key(blob))
+        # Duplicates are re-checked against this run's files rather than reused,
+        # and answers recovered from a truncated response are retried
+        if (self.source_system or None) == (source_system or None) and entry \
+                and same_content(entry["fingerprint"], blob_fingerprint) \
+                and not entry["result"].get("duplicate_of") \
+                and not _partial_result(entry["result"]) \
+                and not str(entry["result"].get("analysis", "")).startswith("Error"):
+            return entry["result"], blob_fingerprint
+        return None, blob_fingerprint
+
+    def removed(self, keys) -> List[str]:
+        """Keys of baseline files not among `keys`."""
+        return sorted(set(self.files) - set(keys))
+
+    def partition(self, blobs: List, source_system: Optional[str]) -> Tuple[Dict[str, dict], List, Dict[str, dict], List[str]]:
+        """Split blobs into reusable results and files that need analysis.
+
+        Returns (reused results by filename, blobs to analyse, fingerprint by
+        file key for every blob, keys of baseline files no longer present).
+        """
+        reused, pending, fingerprints = {}, [], {}
+        if (self.source_system or None) != (source_system or None):
+            logger.info(f"Baseline {self.run_id} analysed {self.source_system}, not {source_system}; re-analysing all files")
+        for blob in blobs:
+            result, fingerprints[file_key(blob)] = self.match(blob, source_system)
+            if result is not None:
+                reused[blob.name] = result
+            else:
+                pending.append(blob)
+        return reused, pending, fingerprints, self.removed(fingerprints)
@@ -0,0 +1,108 @@
+"""
+Model tier routing for LLM calls.
+
+Each call names a task (e.g. "ddl_analysis", "scd_detection"). The router
+picks a tier for it - light, standard or heavy - from the task's default and
+the prompt size, and LLMClient.generate_json escalates one tier at a time when
+safe_parse_json can't parse the answer. Decisions and escalation rates are
+counted per task so the tier table can be tuned from a run's metrics.
+"""
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from src.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "true").lower() == "true"
+
+TIERS = ("light", "standard", "heavy")
+TIER_MODELS = {
+    "light": os.getenv("LLM_MODEL_LIGHT", "gemini-2.5-flash-lite"),
+    "standard": os.getenv("LLM_MODEL_STANDARD", "gemini-2.5-flash"),
+    "heavy": os.getenv("LLM_MODEL_HEAVY", "gemini-2.5-pro"),
+}
+
+# Prompts above this size go to a light-tier task's standard model instead
+LIGHT_MAX_PROMPT_TOKENS = int(os.getenv("LLM_LIGHT_MAX_PROMPT_TOKENS", "4000"))
+# Prompts above this size go to the heavy model
+HEAVY_MIN_PROMPT_TOKENS = int(os.getenv("LLM_HEAVY_MIN_PROMPT_TOKENS", "6000"))
+
+# Default tier per task. Tasks not listed use "standard".
+TASK_TIERS = {
+    "ddl_analysis": "light",
+    "scd_detection": "light",
+    "categorization": "light",
+    "domain_inference": "standard",
+    "procedure_analysis": "standard",
+    "etl_analysis": "standard",
+    "informatica_sql": "standard",
+    "validation": "standard",
+}
+# Only these tasks may be promoted to the heavy tier by prompt size
+HEAVY_ELIGIBLE_TASKS = {"etl_analysis", "procedure_analysis"}
+
+
+class ModelRouter:
+    """Chooses a model tier per task and tracks routing and escalation counts."""
+
+    def __init__(self, tier_models: Optional[Dict[str, str]] = None, enabled: bool = ROUTING_ENABLED,
+                 default_model: Optional[str] = None):
+        self.tier_models = dict(tier_models or TIER_MODELS)
+        self.enabled = enabled
+        self.default_model = default_model or self.tier_models["standard"]
+        self._lock = threading.Lock()
+        self._routed: Dict[str, Dict[str, int]] = {}
+        self._escalated: Dict[str, int] = {}
+        self._parse_failures: Dict[str, int] = {}
+
+    def route(self, task: Optional[str], prompt: str) -> str:
+        """Return the tier for a task and prompt."""
+        if not self.enabled or not task:
+            return "standard"
+        tier = TASK_TIERS.get(task, "standard")
+        tokens = estimate_tokens(prompt)
+        if tier == "light" and tokens > LIGHT_MAX_PROMPT_TOKENS:
+            tier = "standard"
+        if task in HEAVY_ELIGIBLE_TASKS and tokens >= HEAVY_MIN_PROMPT_TOKENS:
+            tier = "heavy"
+        with self._lock:
+            by_tier = self._routed.setdefault(task, {})
+            by_tier[tier] = by_tier.get(tier, 0) + 1
+        logger.debug(f"Routing {task} (~{tokens} tokens) to {tier} tier ({self.model_for(tier)})")
+        return tier
+
+    def model_for(self, tier: str) -> str:
+        if not self.enabled:
+            return self.default_model
+        return self.tier_models.get(tier, self.default_model)
+
+    def escalate(self, task: Optional[str], tier: str) -> Optional[str]:
+        """Record a parse failure at `tier` and return the next tier up, or None at the top."""
+        task = task or "unknown"
+        with self._lock:
+            self._parse_failures[task] = self._parse_failures.get(task, 0) + 1
+        if not self.enabled or tier not in TIERS or tier == TIERS[-1]:
+            return None
+        next_tier = TIERS[TIERS.index(tier) + 1]
+        with self._lock:
+            self._escalated[task] = self._escalated.get(task, 0) + 1
+        logger.info(f"Escalating {task} from {tier} to {next_tier} after unparseable response")
+        return next_tier
+
+    def stats(self) -> dict:
+        """Per-task routing counts and escalation rates."""
+        with self._lock:
+            tasks = {}
+            for task, by_tier in self._routed.items():
+                routed = sum(by_tier.values())
+                escalated = self._escalated.get(task, 0)
+                tasks[task] = {
+                    "routed": dict(by_tier),
+                    "parse_failures": self._parse_failures.get(task, 0),
+                    "escalations": escalated,
+                    "escalation_rate": round(escalated / routed, 4) if routed else 0.0,
+                }
+        return {"enabled": self.enabled, "tier_models": dict(self.tier_models), "tasks": tasks}
@@ -0,0 +1,281 @@
+"""
+Typed analysis objects shared by every stage.
+
+Each file's analysis JSON is parsed once, right after analysis, into a
+Table, Procedure or Mapping (or GenericObject for JSON of any other shape).
+The object is stored in the result as ``results[filename]["parsed"]``, next
+to the raw ``analysis`` text. Stages read it with analysis_object() and
+branch on its type rather than probing the raw text for key names.
+
+In analysis_results.json and the run manifest, ``parsed`` is written as its
+dict form with a ``kind`` key; analysis_object() rebuilds the object from
+that dict without any JSON repair. Results written before this field
+existed are parsed from their raw text on first use.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Dict, List, Optional, Union
+
+from src.json_utils import PARTIAL_KEY, safe_parse_json
+
+logger = logging.getLogger(__name__)
+
+
+def _as_list(value) -> list:
+    if value is None or value == "":
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+@dataclass(slots=True)
+class Column:
+    name: str
+    type: str = "STRING"
+    nullable: bool = True
+    default: Optional[str] = None
+    description: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_value(cls, value) -> Optional["Column"]:
+        if isinstance(value, str):
+            # Some answers list columns as "name TYPE" strings
+            parts = value.strip().split(None, 1)
+            return cls(parts[0], parts[1] if len(parts) > 1 else "STRING") if parts else None
+        if not isinstance(value, dict) or not value.get("name"):
+            return None
+        data = dict(value)
+        nullable = data.pop("nullable", True)
+        if isinstance(nullable, str):
+            nullable = nullable.strip().lower() not in ("false", "no", "not null")
+        return cls(
+            name=str(data.pop("name")),
+            type=str(data.pop("type", None) or "STRING"),
+            nullable=bool(nullable),
+            default=data.pop("default", None),
+            description=data.pop("description", None),
+            extra=data,
+        )
+
+    def to_dict(self) -> dict:
+        data = {"name": self.name, "type": self.type, "nullable": self.nullable}
+        if self.default is not None:
+            data["default"] = self.default
+        if self.description is not None:
+            data["description"] = self.description
+        data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class ForeignKey:
+    columns: List[str]
+    references_table: str
+    references_columns: List[str] = field(default_factory=list)
+    name: Optional[str] = None
+
+    @classmethod
+    def from_value(cls, value) -> Optional["ForeignKey"]:
+        if not isinstance(value, dict):
+            return None
+        # The default prompt says referenced_table; adapter prompts and the DDL parser say references_table
+        table = value.get("references_table") or value.get("referenced_table")
+        if not table:
+            return None
+        return cls(
+            columns=[str(c) for c in _as_list(value.get("columns") or value.get("column"))],
+            references_table=str(table),
+            references_columns=[
+                str(c) for c in _as_list(value.get("references_columns") or value.get("referenced_columns")
+                                         or value.get("referenced_column"))
+            ],
+            name=value.get("name"),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "columns": self.columns,
+            "references_table": self.references_table,
+            "references_columns": self.references_columns,
+        }
+
+
+@dataclass(slots=True)
+class Table:
+    kind: ClassVar[str] = "table"
+
+    name: str
+    columns: List[Column] = field(default_factory=list)
+    primary_keys: List[str] = field(default_factory=list)
+    foreign_keys: List[ForeignKey] = field(default_factory=list)
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Table":
+        data = dict(data)
+        return cls(
+            name=str(data.pop("table_name")),
+            columns=[c for c in map(Column.from_value, _as_list(data.pop("columns", None))) if c],
+            primary_keys=[str(k) for k in _as_list(data.pop("primary_keys", None))],
+            foreign_keys=[fk for fk in map(ForeignKey.from_value, _as_list(data.pop("foreign_keys", None))) if fk],
+            extra=data,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "table_name": self.name,
+            "columns": [c.to_dict() for c in self.columns],
+            "primary_keys": self.primary_keys,
+            "foreign_keys": [fk.to_dict() for fk in self.foreign_keys],
+            **self.extra,
+        }
+
+
+@dataclass(slots=True)
+class Procedure:
+    kind: ClassVar[str] = "procedure"
+
+    name: str
+    parameters: List[Any] = field(default_factory=list)
+    tables_read: List[str] = field(default_factory=list)
+    tables_modified: List[str] = field(default_factory=list)
+    dependencies: List[str] = field(default_factory=list)
+    temp_tables: List[str] = field(default_factory=list)
+    logic_summary: str = ""
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Procedure":
+        data = dict(data)
+        return cls(
+            name=str(data.pop("procedure_name")),
+            parameters=_as_list(data.pop("parameters", None)),
+            tables_read=[str(t) for t in _as_list(data.pop("tables_read", None)) if t],
+            tables_modified=[str(t) for t in _as_list(data.pop("tables_modified", None)) if t],
+            dependencies=[str(d) for d in _as_list(data.pop("dependencies", None)) if d],
+            temp_tables=[str(t) for t in _as_list(data.pop("temp_tables", None)) if t],
+            logic_summary=data.pop("logic_summary", None) or "",
+            extra=data,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "procedure_name": self.name,
+            "parameters": self.parameters,
+            "tables_read": self.tables_read,
+            "tables_modified": self.tables_modified,
+            "dependencies": self.dependencies,
+            "temp_tables": self.temp_tables,
+            "logic_summary": self.logic_summary,
+            **self.extra,
+        }
+
+
+@dataclass(slots=True)
+class Mapping:
+    kind: ClassVar[str] = "mapping"
+
+    # None when the export holds no mapping (shared folders, reusable objects)
+    name: Optional[str]
+    sources: List[str] = field(default_factory=list)
+    targets: List[str] = field(default_factory=list)
+    transformations: List[Any] = field(default_factory=list)
+    logic_summary: str = ""
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Mapping":
+        data = dict(data)
+        name = data.pop("mapping_name")
+        return cls(
+            name=str(name) if name not in (None, "", "null") else None,
+            sources=[str(s) for s in _as_list(data.pop("sources", None)) if s],
+            targets=[str(t) for t in _as_list(data.pop("targets", None)) if t],
+            transformations=_as_list(data.pop("transformations", None)),
+            logic_summary=data.pop("logic_summary", None) or "",
+            extra=data,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "mapping_name": self.name,
+            "sources": self.sources,
+            "targets": self.targets,
+            "transformations": self.transformations,
+            "logic_summary": self.logic_summary,
+            **self.extra,
+        }
+
+
+@dataclass(slots=True)
+class GenericObject:
+    """Analysis JSON that describes no table, procedure or mapping."""
+    kind: ClassVar[str] = "unknown"
+
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GenericObject":
+        return cls(dict(data))
+
+    def to_dict(self) -> dict:
+        return dict(self.data)
+
+
+AnalysisObject = Union[Table, Procedure, Mapping, GenericObject]
+
+_KINDS = {cls.kind: cls for cls in (Table, Procedure, Mapping, GenericObject)}
+# Key that identifies each object type in analysis JSON, in priority order
+_IDENTIFYING_KEYS = (("table_name", Table), ("procedure_name", Procedure), ("mapping_name", Mapping))
+
+
+def build_object(data) -> Optional[AnalysisObject]:
+    """Typed object for parsed analysis JSON; None if it isn't a JSON object."""
+    if not isinstance(data, dict):
+        return None
+    for key, cls in _IDENTIFYING_KEYS:
+        if key in data and (data[key] or cls is Mapping):
+            return cls.from_dict(data)
+    return GenericObject.from_dict(data)
+
+
+def parse_analysis(text: str) -> Optional[AnalysisObject]:
+    """Parse (and repair) raw analysis text into a typed object."""
+    if not text or text.startswith(("Error", "Skipped")):
+        return None
+    return build_object(safe_parse_json(text))
+
+
+def analysis_object(result: dict) -> Optional[AnalysisObject]:
+    """The typed object of one analysis result, materialised once and cached on the result."""
+    parsed = result.get("parsed")
+    if parsed is None and "parsed" in result:
+        return None
+    if isinstance(parsed, dict):
+        cls = _KINDS.get(parsed.get("kind"))
+        data = {k: v for k, v in parsed.items() if k != "kind"}
+        parsed = cls.from_dict(data) if cls else build_object(data)
+    elif parsed is None:
+        try:
+            parsed = parse_analysis(str(result.get("analysis", "")))
+        except Exception as e:
+            logger.warning(f"Could not parse analysis: {e}")
+            parsed = None
+    result["parsed"] = parsed
+    return parsed
+
+
+def is_partial_object(obj: Optional[AnalysisObject]) -> bool:
+    """True for an object built from a truncated LLM answer (marked with json_utils.PARTIAL_KEY)."""
+    if obj is None:
+        return False
+    fields = obj.data if isinstance(obj, GenericObject) else obj.extra
+    return fields.get(PARTIAL_KEY) is True
+
+
+def json_default(value):
+    """``default=`` hook for json.dump: typed objects are written as dicts with their kind."""
+    if isinstance(value, (Table, Procedure, Mapping, GenericObject)):
+        return {"kind": value.kind, **value.to_dict()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,272 @@
+"""
+Streaming stage pipeline.
+
+Stages used to run one after another over the whole estate, so the slowest
+analysis call held up reporting, categorisation, translation and validation
+alike. StagePipeline runs them as producers and consumers on one event loop
+instead: each analysis result is pushed onto a bounded queue per per-file
+stage as soon as it completes.
+
+Per-file stages (start as soon as a file is analysed):
+- validation test generation
+- Informatica SQL generation (the .sqlx is written once its dataset is known)
+- table translation, when categorisation isn't part of the run
+
+Barrier stages (need every result): the analysis report, the dependency
+diagram and domain inference. Once domains are known the categorisation
+batches run concurrently and each batch releases its tables straight to SCD
+detection and translation, so a run takes roughly as long as its critical
+path rather than the sum of every stage's slowest item.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.concurrency import run_sync
+from src.models import Mapping, Table, analysis_object
+from src.reporter import Reporter
+from src.visualizer import Visualizer
+
+logger = logging.getLogger(__name__)
+
+STREAMING_ENABLED = os.getenv("PIPELINE_STREAMING_ENABLED", "true").lower() == "true"
+# Results buffered per per-file stage before analysis waits for it to catch up
+STAGE_QUEUE_SIZE = int(os.getenv("PIPELINE_STAGE_QUEUE_SIZE", "32"))
+# Files worked on concurrently per per-file stage; LLM calls are still bounded by the shared limiter
+STAGE_WORKERS = int(os.getenv("PIPELINE_STAGE_WORKERS", "8"))
+
+_DONE = object()
+
+
+class StagePipeline:
+    """Runs analysis and the downstream stages of one run as a producer/consumer pipeline."""
+
+    def __init__(self, output_dir: str, source_system: Optional[str] = None, analyzer=None, categorizer=None,
+                 translator=None, validator=None, categorization_results: Optional[dict] = None,
+                 status_callback: Optional[Callable] = None, queue_size: int = STAGE_QUEUE_SIZE,
+                 workers: int = STAGE_WORKERS):
+        self.output_dir = output_dir
+        self.source_system = source_system
+        self.analyzer = analyzer
+        self.categorizer = categorizer
+        self.translator = translator
+        self.validator = validator
+        self.converter = translator._create_informatica_converter() if translator else None
+        # Without a categorizer, tables are translated against whatever categorization already exists
+        self.categorization_results = categorization_results or {"domains": [], "categorizations": {}}
+        self.status = status_callback or (lambda *args: None)
+        self.queue_size = max(1, queue_size)
+        self.workers = max(1, workers)
+        # Seconds from pipeline start to each stage's first and last activity
+        self.stage_spans: Dict[str, List[float]] = {}
+        self._start = time.monotonic()
+        self._test_definitions = {}
+        self._mapping_sql: List[Tuple[Mapping, str]] = []
+        self._shared_objects = []
+        self._translated = set()
+
+    def run(self, pending: List, reused: Dict[str, dict], on_analysis_complete: Callable) -> dict:
+        """Analyse `pending` and stream every result, reused ones included, through the stages.
+
+        on_analysis_complete(results) is called at the analysis barrier and
+        returns (results, stage_results): the results to report, and the
+        de-duplicated subset the global stages work on. Returns the former.
+        """
+        return run_sync(self._run_async(pending, reused, on_analysis_complete))
+
+    def _mark(self, stage: str):
+        elapsed = round(time.monotonic() - self._start, 3)
+        span = self.stage_spans.setdefault(stage, [elapsed, elapsed])
+        span[1] = elapsed
+
+    async def _run_async(self, pending, reused, on_analysis_complete):
+        self._start = time.monotonic()
+        handlers = {}
+        if self.validator:
+            handlers["validation"] = self._validate_file
+        if self.converter:
+            self.converter._prepare_output_dirs()
+            handlers["informatica_sql"] = self._convert_mapping
+        if self.translator:
+            self.translator._create_dataform_structure()
+            if not self.categorizer:
+                handlers["translation"] = self._translate_file
+
+        queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in handlers}
+        workers = [
+            asyncio.create_task(self._consume(stage, queues[stage], handler))
+            for stage, handler in handlers.items()
+            for _ in range(self.workers)
+        ]
+
+        async def _emit(filename, result):
+            # Ingestion duplicates share their canonical file's result; process it once
+            if result.get("duplicate_of"):
+                return
+            analysis_object(result)
+            for queue in queues.values():
+                await queue.put((filename, result))
+
+        global_stages = None
+        try:
+            results = dict(reused)
+            self._mark("analysis")
+            analysis = None
+            if pending:
+                analysis = asyncio.create_task(self.analyzer._analyze_async(pending, self.status, on_result=_emit))
+            for filename, result in list(reused.items()):
+                await _emit(filename, result)
+            if analysis:
+                results.update(await analysis)
+            # Streamed sources find unchanged files while they are read
+            for filename in sorted(reused.keys() - results.keys()):
+                results[filename] = reused[filename]
+                await _emit(filename, reused[filename])
+            self._mark("analysis")
+
+            # Barrier: everything below needs the complete set of results
+            results, stage_results = on_analysis_complete(results)
+            # Materialise every parsed object before results are shared with worker threads
+            for result in results.values():
+                analysis_object(result)
+            global_stages = asyncio.gather(
+                self._timed("reporting", asyncio.to_thread(
+                    Reporter(output_dir=self.output_dir, source_system=self.source_system).generate_report, results)),
+                self._timed("visualization", asyncio.to_thread(
+                    Visualizer(output_dir=self.output_dir).generate_dependency_diagram, stage_results)),
+                self._categorize(stage_results),
+            )
+            for queue in queues.values():
+                for _ in range(self.workers):
+                    await queue.put(_DONE)
+            await asyncio.gather(*workers)
+            await global_stages
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if global_stages is not None and not global_stages.done():
+                global_stages.cancel()
+
+        self._write_outputs()
+        logger.info(f"Stage spans (s from start): {self.stage_spans}")
+        return results
+
+    async def _timed(self, stage, awaitable):
+        self._mark(stage)
+        try:
+            return await awaitable
+        finally:
+            self._mark(stage)
+
+    async def _consume(self, stage, queue, handler):
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            filename, result = item
+            self._mark(stage)
+            try:
+                await handler(filename, result)
+            except Exception as e:
+                logger.error(f"{stage} failed for {filename}: {e}")
+            self._mark(stage)
+
+    async def _validate_file(self, filename, result):
+        outcome = await self.validator._generate_tests_for_file(filename, result, self.status)
+        if outcome:
+            self._test_definitions[outcome[0]] = outcome[1]
+            self.status("validation", f"Generated tests for {len(self._test_definitions)} objects: {filename}")
+
+    async def _convert_mapping(self, filename, result):
+        kind, payload = self.converter._classify_mapping(filename, result)
+        if kind == "shared":
+            self._shared_objects.append(payload)
+        elif kind == "mapping":
+            logger.info(f"Converting Informatica mapping: {payload.name}")
+            try:
+                sql = await asyncio.to_thread(self.converter._transformation_sql, filename, payload)
+            except Exception as e:
+                logger.error(f"Failed to generate SQL for {payload.name}: {e}")
+                return
+            self._mapping_sql.append((payload, sql))
+
+    async def _translate_file(self, filename, result):
+        table = analysis_object(result)
+        if isinstance(table, Table):
+            await self._translate_table(table)
+
+    async def _translate_table(self, table):
+        self._mark("translation")
+        try:
+            await asyncio.to_thread(
+                self.translator._translate_categorized_table, table,
+                self.categorization_results.get("categorizations", {}), self.categorization_results.get("domains", []),
+            )
+            self._translated.add(table.name)
+            self.status("translation", f"Translated {len(self._translated)} tables: {table.name}")
+        except Exception as e:
+            logger.warning(f"Failed to translate {table.name}: {e}")
+        self._mark("translation")
+
+    async def _categorize(self, stage_results):
+        """Domain inference (barrier), then concurrent batches that each release their tables to translation."""
+        if not self.categorizer:
+            return
+        self._mark("categorization")
+        self.status("categorization", "Inferring business domains...")
+        domains = await asyncio.to_thread(self.categorizer._infer_domains, stage_results)
+        categorizations = {}
+        self.categorization_results = {"domains": domains, "categorizations": categorizations}
+
+        domain_list = self.categorizer._format_domains(domains)
+        batches = self.categorizer._table_batches(stage_results)
+        tables = self._parsed_tables(stage_results) if self.translator else {}
+        self.status("categorization", f"Found {len(domains)} domains. Categorizing {len(batches)} table batches...")
+
+        async def _batch(batch):
+            categorizations.update(await asyncio.to_thread(self.categorizer._categorize_batch, batch, domain_list))
+            self._mark("categorization")
+            names = [t["table"] for t in batch if t["table"] in tables]
+            await asyncio.gather(*[self._translate_table(tables[name]) for name in names])
+
+        await asyncio.gather(*[_batch(batch) for batch in batches])
+        self.categorizer._save_results(domains, categorizations)
+        self.categorizer._generate_report(domains, categorizations)
+        self._mark("categorization")
+
+        # Tables without columns never reach a batch; they take the default domain
+        await asyncio.gather(*[
+            self._translate_table(table) for name, table in tables.items() if name not in self._translated
+        ])
+
+    def _parsed_tables(self, stage_results):
+        tables = {}
+        for data in stage_results.values():
+            table = analysis_object(data)
+            if isinstance(table, Table):
+                tables[table.name] = table
+        return tables
+
+    def _write_outputs(self):
+        """Write the outputs that depend on categorization or on every file."""
+        if self.converter:
+            for mapping, sql in self._mapping_sql:
+                try:
+                    self.converter._create_transformation_sqlx(
+                        mapping.name, sql, mapping.sources, mapping.targets, self.categorization_results,
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to write transformation for {mapping.name}: {e}")
+            if self._shared_objects:
+                self.converter._generate_shared_objects_doc(self._shared_objects)
+            logger.info(f"Informatica conversion complete: {len(self._mapping_sql)} mappings converted, "
+                        f"{len(self._shared_objects)} shared objects documented.")
+        if self.translator:
+            self.translator._write_type_mapping_report()
+            self.status("translation", f"Translation complete: {len(self._translated)} tables processed")
+        if self.validator:
+            self.validator._save_results(self._test_definitions)
+            self.validator._generate_report(self._test_definitions)
+            self.status("validation", f"Validation tests generated for {len(self._test_definitions)} objects")
@@ -0,0 +1,169 @@
+"""
+Token-reducing preprocessors applied to file content before prompting.
+
+Each minifier removes text the analysis prompts never extract from:
+
+- SQL (DDL and procedures): comments, whitespace runs and GRANT/REVOKE
+  statements. String literals and quoted identifiers are left untouched.
+  ``go`` batch separators are normalised to a bare ``go`` line, one token
+  each, so src/chunking.py can still split large files at batch boundaries.
+- Informatica XML: the DOCTYPE, indentation, empty attributes, repository
+  bookkeeping attributes (versions, UUIDs, physical offsets), built-in
+  workflow variables, metadata extensions and empty session attributes.
+  Names, datatypes, keys, expressions, connectors and non-empty table
+  attributes (SQL overrides, filters) are kept.
+
+Set PROMPT_MINIFY_ENABLED=false to send raw content.
+"""
+import logging
+import os
+import re
+from typing import Dict, Tuple
+
+from src.rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+MINIFY_ENABLED = os.getenv("PROMPT_MINIFY_ENABLED", "true").lower() == "true"
+
+_GO_LINE = re.compile(r"^\s*go\s*$", re.IGNORECASE | re.MULTILINE)
+# A whole GRANT / REVOKE statement, continuation lines included. It never runs
+# past its own clauses: it ends at ";", at the end of a line unless the next line
+# continues the statement (ON / TO / FROM / WITH / CASCADE, a leading comma, or
+# the line before ended with a comma), so a go line or the next statement stays
+_PERMISSION_STATEMENT = re.compile(
+    r"^[ \t]*(?:grant|revoke)\b[^\n;]*"
+    r"(?:\n[ \t]*(?:(?:on|to|from|with|cascade)\b|,)[^\n;]*|(?<=,)[ \t]*\n[^\n;]*)*"
+    r";?[ \t]*\n?",
+    re.IGNORECASE | re.MULTILINE,
+)
+_BLANK_LINES = re.compile(r"\n{2,}")
+
+
+def minify_sql(text: str, keep_batches: bool = False) -> str:
+    """Strip comments, whitespace runs, permission grants and (unless `keep_batches`) go separators from SQL."""
+    out = []
+    pending = ""  # whitespace owed before the next emitted token: "", " " or "\n"
+    i, n = 0, len(text)
+
+    def owe(ws):
+        nonlocal pending
+        if ws == "\n" or not pending:
+            pending = ws
+
+    while i < n:
+        char = text[i]
+        nxt = text[i + 1] if i + 1 < n else ""
+
+        if char == "-" and nxt == "-":
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+            owe("\n")
+            continue
+        if char == "/" and nxt == "*":
+            # T-SQL block comments nest
+            depth, i = 1, i + 2
+            while i < n and depth:
+                if text.startswith("/*", i):
+                    depth, i = depth + 1, i + 2
+                elif text.startswith("*/", i):
+                    depth, i = depth - 1, i + 2
+                else:
+                    i += 1
+            owe(" ")
+            continue
+        if char.isspace():
+            owe("\n" if char == "\n" else " ")
+            i += 1
+            continue
+
+        if pending and out:
+            out.append(pending)
+        pending = ""
+
+        if char in "'\"[":
+            close = "]" if char == "[" else char
+            j = i + 1
+            while j < n:
+                if text[j] == close:
+                    # Doubled quote is an escaped quote inside the literal
+                    if close != "]" and j + 1 < n and text[j + 1] == close:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            out.append(text[i:j + 1])
+            i = j + 1
+            continue
+
+        out.append(char)
+        i += 1
+
+    minified = "".join(out)
+    # Permissions first, while go lines still mark where each statement ends
+    minified = _PERMISSION_STATEMENT.sub("", minified)
+    if not keep_batches:
+        minified = _GO_LINE.sub("", minified)
+    minified = _BLANK_LINES.sub("\n", minified)
+    return minified.strip()
+
+
+# Attributes that carry repository bookkeeping or physical layout rather than logic
+_XML_DROP_ATTRIBUTES = (
+    "OBJECTVERSION", "VERSIONNUMBER", "UUID", "CREATION_DATE", "REPOSITORY_VERSION", "PERMISSIONS",
+    "PICTURETEXT", "FIELDNUMBER", "FIELDPROPERTY", "FIELDTYPE", "HIDDEN", "LENGTH", "LEVEL", "OCCURS",
+    "OFFSET", "PHYSICALLENGTH", "PHYSICALOFFSET", "USAGE_FLAGS", "ISREPARTITIONPOINT", "PIPELINE", "STAGE",
+    "PARTITIONTYPE", "ISCLIENTEDITABLE", "ISCLIENTVISIBLE", "ISSHAREREAD", "ISSHAREWRITE", "VENDORNAME",
+    "DOMAINNAME", "MAXLENGTH", "ISPERSISTENT", "ISNULL", "REF_FIELD",
+)
+_XML_DECLARATIONS = re.compile(r"<!DOCTYPE[^>]*>\s*")
+_XML_DROP_ELEMENTS = re.compile(
+    r"<(?:METADATAEXTENSION|ERPINFO|PARTITION)\b[^<>]*/>"
+    r"|<WORKFLOWVARIABLE\b[^<>]*USERDEFINED\s*=\s*\"NO\"[^<>]*/>"
+    r"|<(?:TABLE)?ATTRIBUTE\s+NAME\s*=\s*\"[^\"]*\"\s+VALUE\s*=\s*\"\"\s*/>"
+)
+_XML_EMPTY_ATTRIBUTE = re.compile(r"\s+[A-Z_]+\s*=\s*\"\"")
+_XML_DROP_ATTRIBUTE = re.compile(r"\s+(?:%s)\s*=\s*\"[^\"]*\"" % "|".join(_XML_DROP_ATTRIBUTES))
+_XML_ATTRIBUTE_SPACING = re.compile(r"\s+=\s*\"")
+_XML_INDENT = re.compile(r"^[ \t]+|[ \t]+$", re.MULTILINE)
+
+
+def minify_informatica_xml(text: str) -> str:
+    """Drop Informatica XML content that the ETL analysis prompt doesn't use."""
+    minified = _XML_DECLARATIONS.sub("", text)
+    minified = _XML_DROP_ELEMENTS.sub("", minified)
+    minified = _XML_EMPTY_ATTRIBUTE.sub("", minified)
+    minified = _XML_DROP_ATTRIBUTE.sub("", minified)
+    minified = _XML_ATTRIBUTE_SPACING.sub("=\"", minified)
+    minified = _XML_INDENT.sub("", minified)
+    minified = _BLANK_LINES.sub("\n", minified)
+    return minified.strip()
+
+
+def _minify_sql_for_prompt(text: str) -> str:
+    return minify_sql(text, keep_batches=True)
+
+
+MINIFIERS = {
+    "sybase_ddl": _minify_sql_for_prompt,
+    "sql_transformation": _minify_sql_for_prompt,
+    "informatica_xml": minify_informatica_xml,
+}
+
+
+def preprocess_content(file_type: str, content: str) -> Tuple[str, Dict[str, int]]:
+    """Minify content for its file type. Returns (content, token stats)."""
+    original_tokens = estimate_tokens(content)
+    minifier = MINIFIERS.get(file_type) if MINIFY_ENABLED else None
+    if minifier:
+        try:
+            content = minifier(content)
+        except Exception as e:
+            # Never block analysis on the optimisation; fall back to raw content
+            logger.warning(f"Minifier for {file_type} failed, sending raw content: {e}")
+    minified_tokens = estimate_tokens(content)
+    return content, {
+        "original_tokens": original_tokens,
+        "minified_tokens": minified_tokens,
+        "tokens_saved": original_tokens - minified_tokens,
+    }
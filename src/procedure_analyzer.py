@@ -0,0 +1,324 @@
+"""
+Static dependency analysis for T-SQL / Sybase stored procedures.
+
+Tokenizes procedure source (after comment stripping) and extracts what the
+procedure analysis prompt used to ask the LLM for:
+
+- procedure_name and parameters (name, type, direction)
+- tables_read: FROM / JOIN / MERGE ... USING targets
+- tables_modified: INSERT [INTO], SELECT ... INTO, UPDATE, DELETE [FROM],
+  TRUNCATE TABLE and MERGE [INTO] targets, with UPDATE/DELETE aliases
+  resolved through the statement's FROM clause
+- dependencies: EXEC / EXECUTE targets
+- temp_tables: #tables created or filled by the procedure (kept out of the
+  table lists so lineage only shows persistent tables)
+- dynamic_sql: whether EXEC(@sql) / sp_executesql hides further references
+- complexity: LOW / MEDIUM / HIGH from control flow, cursors and table count
+
+Only the narrative logic_summary still needs the LLM. A procedure with no
+``AS`` before its body (MySQL / PL/SQL style ``BEGIN ... END``) or no
+recognised T-SQL statement in it yields None, so the caller falls back to the
+adapter's procedure prompt. Whether static analysis runs at all comes from the
+``procedure_analysis`` section of the source system config.
+"""
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.ddl_parser import Token, tokenize_sql
+from src.preprocess import minify_sql
+
+logger = logging.getLogger(__name__)
+
+STATIC_ANALYSIS_ENABLED = os.getenv("PROCEDURE_STATIC_ANALYSIS_ENABLED", "true").lower() == "true"
+
+# Words that can follow FROM/JOIN/UPDATE but never name a table
+_NOT_TABLES = {
+    "SELECT", "WHERE", "GROUP", "ORDER", "HAVING", "UNION", "SET", "VALUES", "ON", "AS", "WITH",
+    "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "JOIN", "BEGIN", "END", "IF", "ELSE",
+    "WHILE", "RETURN", "DECLARE", "EXEC", "EXECUTE", "INSERT", "UPDATE", "DELETE", "TRUNCATE",
+    "INTO", "FROM", "AND", "OR", "NOT", "NULL", "TOP", "DISTINCT", "ALL", "STATISTICS",
+}
+# Words that end a table reference's optional alias
+_CLAUSE_WORDS = _NOT_TABLES | {
+    "HOLDLOCK", "NOHOLDLOCK", "NOLOCK", "READPAST", "SHARED", "INDEX", "PREFETCH", "LRU", "MRU",
+    "PLAN", "FOR", "AT", "ISOLATION", "COMMIT", "ROLLBACK", "PRINT", "RAISERROR", "OPEN", "CLOSE",
+    "FETCH", "DEALLOCATE", "SELECT", "GOTO", "WAITFOR", "BREAK", "CONTINUE", "USING", "WHEN", "OUTPUT",
+}
+_DYNAMIC_SQL_PROCS = {"sp_executesql", "sp_exec"}
+# T-SQL statements a procedure body must contain for the static analysis to stand
+_STATEMENT_WORDS = {
+    "SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "TRUNCATE", "EXEC", "EXECUTE", "CREATE",
+    "DECLARE", "SET", "IF", "WHILE", "RETURN", "PRINT", "RAISERROR",
+}
+
+
+def _is_temp(name: str) -> bool:
+    return name.startswith("#") or name.lower().startswith("tempdb.")
+
+
+def _add(items: List[str], name: Optional[str]):
+    if name and name not in items:
+        items.append(name)
+
+
+class ProcedureAnalyzer:
+    """Extracts table and procedure dependencies from T-SQL procedure source."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.enabled = STATIC_ANALYSIS_ENABLED and bool((config or {}).get("enabled", True))
+
+    def analyze(self, content: str) -> List[Optional[dict]]:
+        """Return one analysis per CREATE PROCEDURE in `content`, None for one without a T-SQL body."""
+        tokens = tokenize_sql(minify_sql(content))
+        starts = [
+            i for i in range(len(tokens) - 1)
+            if tokens[i].upper == "CREATE" and tokens[i + 1].upper in ("PROC", "PROCEDURE")
+        ]
+        bounds = starts + [len(tokens)]
+        return [self._analyze_procedure(tokens[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+    def analyze_file(self, content: str) -> Optional[dict]:
+        """One analysis for a file: the first procedure, with every procedure's references merged in."""
+        procedures = self.analyze(content)
+        # One procedure the analyzer can't read would lose its lineage: leave the file to the LLM
+        if not procedures or None in procedures:
+            return None
+        analysis = dict(procedures[0])
+        for key in ("tables_read", "tables_modified", "dependencies", "temp_tables"):
+            merged: List[str] = []
+            for procedure in procedures:
+                for name in procedure[key]:
+                    _add(merged, name)
+            analysis[key] = merged
+        analysis["dynamic_sql"] = any(p["dynamic_sql"] for p in procedures)
+        ranks = ["LOW", "MEDIUM", "HIGH"]
+        analysis["complexity"] = max((p["complexity"] for p in procedures), key=ranks.index)
+        if len(procedures) > 1:
+            analysis["procedures"] = procedures
+        return analysis
+
+    # -------------------------------------------------------------------------
+    # Per-procedure analysis
+    # -------------------------------------------------------------------------
+
+    def _analyze_procedure(self, tokens: List[Token]) -> Optional[dict]:
+        name_parts, i = self._qualified_name(tokens, 2)
+        # Sybase procedure groups: CREATE PROC name;2
+        if i + 1 < len(tokens) and tokens[i].text == ";" and tokens[i + 1].text.isdigit():
+            i += 2
+        # The body starts after AS; a statement before any AS means another dialect's syntax
+        body_start = next((j for j in range(i, len(tokens))
+                           if tokens[j].upper == "AS" or tokens[j].upper in _STATEMENT_WORDS | {"BEGIN"}), None)
+        if body_start is None or tokens[body_start].upper != "AS":
+            return None
+        parameters = self._parameters(tokens[i:body_start])
+        body = tokens[body_start + 1:]
+        if not any(token.upper in _STATEMENT_WORDS for token in body):
+            return None
+
+        aliases = self._aliases(body)
+        cursors = {body[j + 1].value.lower() for j in range(len(body) - 2)
+                   if body[j].upper == "DECLARE" and body[j + 2].upper in ("CURSOR", "INSENSITIVE", "SCROLL")}
+
+        read: List[str] = []
+        modified: List[str] = []
+        dependencies: List[str] = []
+        temp: List[str] = []
+        dynamic = False
+
+        def record(target: List[str], name: Optional[str]):
+            if not name or name.startswith("@") or name.lower() in cursors:
+                return
+            if _is_temp(name):
+                _add(temp, name)
+            else:
+                _add(target, name)
+
+        j = 0
+        while j < len(body):
+            word = body[j].upper
+            if word in ("FROM", "JOIN") and not self._non_table_from(body, j):
+                j = self._table_list(body, j + 1, read, record)
+                continue
+            if word == "INTO" and j + 1 < len(body):
+                record(modified, self._table_name(body, j + 1, column_list=True)[0])
+            elif word == "INSERT" and j + 1 < len(body) and body[j + 1].upper != "INTO":
+                record(modified, self._table_name(body, j + 1, column_list=True)[0])
+            elif word in ("UPDATE", "DELETE") and j + 1 < len(body) and not (j and body[j - 1].upper == "ON"):
+                # ON DELETE / ON UPDATE of a foreign key is not a statement
+                k = j + 1
+                if body[k].upper == "FROM":
+                    k += 1
+                if k < len(body) and body[k].upper == "TOP":
+                    k += 2
+                name = self._table_name(body, k)[0]
+                if name and name.upper() not in _NOT_TABLES:
+                    record(modified, aliases.get(name.lower(), name))
+                if word == "DELETE" and body[j + 1].upper == "FROM":
+                    j = k + 1
+                    continue
+            elif word == "TRUNCATE" and j + 2 < len(body) and body[j + 1].upper == "TABLE":
+                record(modified, self._table_name(body, j + 2)[0])
+            elif word == "MERGE" and j + 1 < len(body):
+                k = j + 2 if body[j + 1].upper == "INTO" else j + 1
+                record(modified, self._table_name(body, k)[0])
+            elif word == "USING" and j + 1 < len(body) and body[j + 1].text != "(":
+                record(read, self._table_name(body, j + 1)[0])
+            elif word == "CREATE" and j + 2 < len(body) and body[j + 1].upper == "TABLE":
+                record(modified, self._table_name(body, j + 2, column_list=True)[0])
+            elif word in ("EXEC", "EXECUTE") and j + 1 < len(body):
+                k = j + 1
+                # EXEC @rc = proc_name
+                if body[k].value.startswith("@") and k + 1 < len(body) and body[k + 1].text == "=":
+                    k += 2
+                if k < len(body) and (body[k].text == "(" or body[k].value.startswith("@")):
+                    dynamic = True
+                else:
+                    name = self._table_name(body, k)[0]
+                    if name and name.lower() in _DYNAMIC_SQL_PROCS:
+                        dynamic = True
+                    elif name:
+                        _add(dependencies, name)
+            j += 1
+
+        return {
+            "procedure_name": name_parts[-1] if name_parts else None,
+            "parameters": parameters,
+            "tables_read": read,
+            "tables_modified": modified,
+            "dependencies": dependencies,
+            "temp_tables": temp,
+            "dynamic_sql": dynamic,
+            "complexity": self._complexity(body, read, modified, cursors),
+        }
+
+    # -------------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _qualified_name(tokens: List[Token], i: int) -> Tuple[List[str], int]:
+        """Read db.owner.name (owner may be empty: db..name); returns (parts, next index)."""
+        if i >= len(tokens):
+            return [], i
+        parts = [tokens[i].value]
+        i += 1
+        while i + 1 < len(tokens) and tokens[i].text == ".":
+            if tokens[i + 1].text == ".":
+                i += 1
+                continue
+            parts.append(tokens[i + 1].value)
+            i += 2
+        return parts, i
+
+    def _table_name(self, tokens: List[Token], i: int, column_list: bool = False) -> Tuple[Optional[str], int]:
+        """Table name at `i`; with `column_list`, a write target whose `(` opens a column list."""
+        if i >= len(tokens) or tokens[i].text in "(),;=" or tokens[i].upper in _NOT_TABLES:
+            return None, i
+        parts, end = self._qualified_name(tokens, i)
+        # Otherwise name( ... ) is a function call, not a table
+        if not column_list and end < len(tokens) and tokens[end].text == "(":
+            return None, end
+        name = parts[-1]
+        if len(parts) > 1 and parts[0].lower() == "tempdb":
+            name = f"tempdb..{name}"
+        return name, end
+
+    def _table_list(self, tokens: List[Token], i: int, target: List[str], record) -> int:
+        """Read `table [alias] [, table [alias]]...` after FROM/JOIN; returns the next index."""
+        while i < len(tokens):
+            name, i = self._table_name(tokens, i)
+            if name is None:
+                return i
+            record(target, name)
+            i = self._skip_alias(tokens, i)
+            if i < len(tokens) and tokens[i].text == ",":
+                i += 1
+                continue
+            return i
+        return i
+
+    @staticmethod
+    def _skip_alias(tokens: List[Token], i: int) -> int:
+        if i < len(tokens) and tokens[i].upper == "AS":
+            i += 1
+        if i < len(tokens) and tokens[i].upper and tokens[i].upper not in _CLAUSE_WORDS \
+                and (tokens[i].text[0].isalpha() or tokens[i].text[0] == "_"):
+            i += 1
+        return i
+
+    def _aliases(self, tokens: List[Token]) -> Dict[str, str]:
+        """alias -> table for every `FROM/JOIN table alias` in the body."""
+        aliases = {}
+        for j, token in enumerate(tokens):
+            if token.upper not in ("FROM", "JOIN"):
+                continue
+            k = j + 1
+            while k < len(tokens):
+                name, k = self._table_name(tokens, k)
+                if name is None:
+                    break
+                if k < len(tokens) and tokens[k].upper == "AS":
+                    k += 1
+                if k < len(tokens) and tokens[k].upper and tokens[k].upper not in _CLAUSE_WORDS \
+                        and (tokens[k].text[0].isalpha() or tokens[k].text[0] == "_"):
+                    aliases[tokens[k].value.lower()] = name
+                    k += 1
+                if k < len(tokens) and tokens[k].text == ",":
+                    k += 1
+                    continue
+                break
+        return aliases
+
+    @staticmethod
+    def _non_table_from(tokens: List[Token], i: int) -> bool:
+        """FROM that names a cursor or a function operand: FETCH NEXT FROM c, TRIM(LEADING ' ' FROM x)."""
+        if i > 0 and tokens[i - 1].upper in ("NEXT", "PRIOR", "FIRST", "LAST", "FETCH", "LEADING", "TRAILING", "BOTH"):
+            return True
+        return False
+
+    def _parameters(self, tokens: List[Token]) -> List[dict]:
+        if tokens and tokens[0].text == "(" and tokens[-1].text == ")":
+            tokens = tokens[1:-1]
+        parameters, current = [], []
+        depth = 0
+        for token in tokens + [Token(",")]:
+            if token.text == "(":
+                depth += 1
+            elif token.text == ")":
+                depth -= 1
+            if token.text == "," and depth == 0:
+                if current and current[0].value.startswith("@"):
+                    parameters.append(self._parameter(current))
+                current = []
+            else:
+                current.append(token)
+        return parameters
+
+    @staticmethod
+    def _parameter(tokens: List[Token]) -> dict:
+        direction = "IN"
+        type_tokens = []
+        in_default = False
+        for token in tokens[1:]:
+            # OUTPUT may follow the default value: @x int = 0 output
+            if token.upper in ("OUTPUT", "OUT"):
+                direction = "OUT"
+            elif token.text == "=":
+                in_default = True
+            elif not in_default:
+                type_tokens.append(token.text)
+        param_type = " ".join(type_tokens).replace(" (", "(").replace("( ", "(").replace(" )", ")").replace(" ,", ",")
+        return {"name": tokens[0].value, "type": param_type, "direction": direction}
+
+    @staticmethod
+    def _complexity(body: List[Token], read: List[str], modified: List[str], cursors) -> str:
+        branches = sum(1 for t in body if t.upper in ("IF", "WHILE", "CASE", "GOTO"))
+        statements = sum(1 for t in body if t.upper in ("SELECT", "INSERT", "UPDATE", "DELETE", "EXEC", "EXECUTE"))
+        score = branches + statements // 2 + 3 * len(cursors) + len(set(read) | set(modified))
+        if score >= 25:
+            return "HIGH"
+        if score >= 8:
+            return "MEDIUM"
+        return "LOW"
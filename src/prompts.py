@@ -123,3 +123,65 @@ Return ONLY a JSON object:
   "history_tracking_columns": []
 }}
 """
+
+PACKED_FILES_INSTRUCTIONS = """
+The content above contains {count} separate files. Each file starts with a line of the form
+=== FILE: <filename> ===
+
+Analyze every file independently, following the instructions above for each one.
+Return ONLY a single JSON object whose keys are the exact filenames and whose values are
+the JSON analysis object for that file, for example:
+{{"first_file.sql": {{ ... }}, "second_file.sql": {{ ... }}}}
+Include every file listed: {filenames}
+"""
+
+INFORMATICA_LOGIC_PROMPT = """
+You are an Informatica PowerCenter expert. The sources, targets and transformations of
+the export below have already been extracted. Interpret only the transformation logic
+(port expressions, SQL overrides, lookup/filter/join conditions and router groups), the
+session-level overrides, command tasks and workflow task order / link conditions.
+
+Mapping: {mapping_name}
+Sources: {sources}
+Targets: {targets}
+
+Transformation logic:
+{logic}
+
+Return ONLY a JSON object:
+{{
+  "logic_summary": "Description of the data flow and business rules, in the order data moves through the mapping",
+  "transformation_descriptions": {{"<transformation name>": "One sentence on what it does"}}
+}}
+"""
+
+PROCEDURE_SUMMARY_PROMPT = """
+You are a {name} Database Expert. The dependencies of the stored procedure below have
+already been extracted:
+- tables read: {tables_read}
+- tables modified: {tables_modified}
+- procedures called: {dependencies}
+- temp tables: {temp_tables}
+
+Describe what the procedure does: its purpose, the main steps in order, and any
+business rules in its conditions and calculations.
+
+Return ONLY a JSON object:
+{{"logic_summary": "..."}}
+
+Procedure:
+{content}
+"""
+
+CONTINUATION_PROMPT = """
+{prompt}
+
+Your answer to the request above was cut off at the output limit. This is what was written so far:
+<<<ANSWER
+{answer}
+ANSWER>>>
+
+Continue the answer from exactly where it stopped. Output only the remaining text, starting with
+the very next character: do not repeat anything already written, do not restart the JSON and do
+not add markdown fences or commentary.
+"""
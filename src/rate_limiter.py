@@ -0,0 +1,123 @@
+"""
+Process-wide token-bucket rate limiting for LLM calls.
+
+Vertex AI enforces quotas on both requests per minute and tokens per minute
+for a project, regardless of how many pipeline runs share it. A single
+RateLimiter per process makes concurrent runs and stages draw from the same
+budget. Callers reserve capacity up front (which may push a bucket into debt)
+and then sleep until the debt is repaid, so waiters are served in arrival
+order rather than racing each other.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "300"))
+TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+# Output size is unknown before the call; reserve this much and reconcile later
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English and code)."""
+    return len(text) // 4 + 1 if text else 0
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute.
+
+    A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, per_minute: int, capacity: Optional[int] = None):
+        self.per_minute = per_minute
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.per_minute / 60.0)
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` tokens and return seconds until the reservation is covered."""
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        # A single request larger than the bucket would otherwise never fit
+        amount = min(amount, self.capacity)
+        self._tokens -= amount
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens * 60.0 / self.per_minute
+
+    def adjust(self, delta: float, now: float):
+        """Credit (positive) or debit (negative) tokens after the fact."""
+        if not self.enabled:
+            return
+        self._refill(now)
+        self._tokens = min(self.capacity, self._tokens + delta)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter shared across threads and event loops."""
+
+    def __init__(self, requests_per_minute: int = REQUESTS_PER_MINUTE, tokens_per_minute: int = TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self.total_wait_seconds = 0.0
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(estimated_tokens, now))
+            self.total_wait_seconds += wait
+        if wait > 1:
+            logger.info(f"Rate limiter delaying LLM call by {wait:.1f}s")
+        return wait
+
+    def acquire_sync(self, estimated_tokens: int):
+        """Reserve one request and `estimated_tokens`, blocking until they are available."""
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire(self, estimated_tokens: int):
+        """Async variant of acquire_sync."""
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage of a call is known."""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.adjust(estimated_tokens - actual_tokens, time.monotonic())
+
+
+_shared_rate_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter."""
+    global _shared_rate_limiter
+    with _shared_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter()
+            logger.info(
+                f"LLM rate limiter: {REQUESTS_PER_MINUTE} requests/min, {TOKENS_PER_MINUTE} tokens/min (0 = unlimited)"
+            )
+        return _shared_rate_limiter
@@ -1,6 +1,8 @@
 import json
 import os
 
+from src.models import analysis_object, json_default
+
 class Reporter:
     def __init__(self, output_dir="output", source_system: str = None):
         self.output_dir = output_dir
@@ -13,7 +15,7 @@ class Reporter:
         # Save raw results to JSON
         json_path = os.path.join(self.output_dir, "analysis_results.json")
         with open(json_path, "w") as f:
-            json.dump(results, f, indent=2)
+            json.dump(results, f, indent=2, default=json_default)
         print(f"Raw results saved to: {json_path}")
 
         report_path = os.path.join(self.output_dir, "analysis_report.txt")
@@ -32,14 +34,11 @@ class Reporter:
                 if analysis.startswith("Error"):
                     f.write(f"[!WARNING]\n{analysis}\n\n")
                 else:
-                    # Try to format JSON if it looks like JSON
-                    try:
-                        # Remove potential markdown code blocks
-                        clean_analysis = analysis.replace("```json", "").replace("```", "")
-                        json_data = json.loads(clean_analysis)
+                    info = analysis_object(data)
+                    if info is not None:
                         f.write("Analysis Summary (JSON)\n")
-                        f.write(f"{json.dumps(json_data, indent=2)}\n\n")
-                    except json.JSONDecodeError:
+                        f.write(f"{json.dumps(info.to_dict(), indent=2)}\n\n")
+                    else:
                         f.write("Raw Analysis\n")
                         f.write(f"{analysis}\n\n")
         
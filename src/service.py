@@ -1,17 +1,31 @@
 import logging
 import os
+import time
 import uuid
 import shutil
 from typing import Callable, Optional
 
-from src.ingestion import IngestionEngine
-from src.analyzer import AnalysisEngine
+from src.ingestion import (
+    PREFETCH_FILES as INGESTION_PREFETCH_FILES, STREAMING_ENABLED as INGESTION_STREAMING_ENABLED, BlobPrefetcher,
+    IngestionEngine,
+)
+from src.archive_source import open_archive
+from src.blob_cache import decode_bytes
+from src.storage import create_storage_client
+from src.ingestion_planner import IngestionPlanner
+from src.analyzer import STREAM_PACK_FILES, AnalysisEngine
+from src.concurrency import iterate_in_thread
 from src.reporter import Reporter
 from src.visualizer import Visualizer
 from src.categorizer import DataCategorizer
 from src.translator import SchemaTranslator
 from src.validator import ValidationEngine
-from google.cloud import storage
+from src.llm_client import DEFAULT_MODEL, LLMClient
+from src.llm_backends import create_backend
+from src.pipeline import STREAMING_ENABLED as PIPELINE_STREAMING_ENABLED, StagePipeline
+from src.adapters.registry import get_adapter
+from src.dedup import DEDUP_ENABLED as CONTENT_DEDUP_ENABLED, DEDUP_REPORT_FILENAME, ContentDeduplicator
+from src.manifest import MANIFEST_FILENAME, AnalysisManifest, file_key, fingerprint
 
 
 logger = logging.getLogger(__name__)
@@ -25,19 +39,109 @@ def _noop_status(stage: str, message: str, current: int = None, total: int = Non
     pass
 
 
+class StageTimer:
+    """Accumulates wall-clock seconds per stage from status callback transitions."""
+
+    def __init__(self, callback: StatusCallback):
+        self._callback = callback
+        self._stage = None
+        self._start = time.monotonic()
+        self.timings = {}
+
+    def __call__(self, stage: str, message: str, current: int = None, total: int = None):
+        now = time.monotonic()
+        if stage != self._stage:
+            self._close(now)
+            self._stage, self._start = stage, now
+        self._callback(stage, message, current, total)
+
+    def _close(self, now: float):
+        if self._stage:
+            self.timings[self._stage] = round(self.timings.get(self._stage, 0.0) + now - self._start, 3)
+
+    def finish(self) -> dict:
+        self._close(time.monotonic())
+        self._stage = None
+        return self.timings
+
+
 class LocalBlob:
     def __init__(self, path: str):
         self._path = path
+        self.path = path
         self.name = os.path.basename(path)
 
+    def download_as_bytes(self) -> bytes:
+        with open(self._path, "rb") as f:
+            return f.read()
+
     def download_as_text(self) -> str:
-        # Try UTF-8 first, fall back to latin-1 for files with special characters
+        return decode_bytes(self.download_as_bytes())
+
+    def open(self, mode: str = "rb"):
+        return open(self._path, mode)
+
+
+def _load_baseline_manifest(output_root: str, baseline_run_id: str, archive_bucket: Optional[str],
+                            project_id: str) -> Optional[AnalysisManifest]:
+    """Load a baseline run's manifest from the local runs dir, or from the archive bucket."""
+    path = os.path.join(output_root, baseline_run_id, MANIFEST_FILENAME)
+    if not os.path.exists(path) and archive_bucket:
         try:
-            with open(self._path, "r", encoding="utf-8") as f:
-                return f.read()
-        except UnicodeDecodeError:
-            with open(self._path, "r", encoding="latin-1") as f:
-                return f.read()
+            blob = create_storage_client(project_id).bucket(archive_bucket).blob(f"runs/{baseline_run_id}/{MANIFEST_FILENAME}")
+            if blob.exists():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                blob.download_to_filename(path)
+        except Exception as e:
+            logger.warning("Could not fetch baseline manifest from gs://%s: %s", archive_bucket, e)
+    manifest = AnalysisManifest.load(path)
+    if manifest is None:
+        logger.warning("No manifest for baseline run %s; analysing every file", baseline_run_id)
+    return manifest
+
+
+def _prefetch_buffer_size() -> int:
+    # A streamed packing group holds its files until it is full, so the buffer must outgrow it
+    return max(INGESTION_PREFETCH_FILES, 2 * STREAM_PACK_FILES)
+
+
+def _stream_files(blobs, files: list, pending: list, deduplicator: ContentDeduplicator,
+                  baseline: Optional[AnalysisManifest] = None, reused: Optional[dict] = None,
+                  fingerprints: Optional[dict] = None, source_system: Optional[str] = None):
+    """Buffered blobs to analyse, as a listing or archive stream produces them.
+
+    Appends every file to `files` and every file to analyse to `pending`.
+    Files unchanged since `baseline` go to `reused` instead, and copies of a
+    file already yielded are dropped, using the content already in memory.
+    Every file that isn't yielded is released here.
+    """
+    for blob in blobs:
+        files.append(blob)
+        if baseline:
+            result, fingerprints[file_key(blob)] = baseline.match(blob, source_system)
+            if result is not None:
+                reused[blob.name] = result
+                content_fp = baseline.content_fingerprint(file_key(blob))
+                if content_fp:
+                    # Later copies of this file share its reused result
+                    deduplicator.add_known(content_fp, blob.name)
+                blob.release()
+                continue
+        if CONTENT_DEDUP_ENABLED and deduplicator.check(blob):
+            blob.release()
+            continue
+        pending.append(blob)
+        yield blob
+
+
+def _load_categorization(path: str) -> dict:
+    """Categorization written by this or an earlier stage, or an empty one."""
+    import json
+
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"domains": [], "categorizations": {}}
 
 
 def run_pipeline(config: dict, status_callback: StatusCallback = None) -> dict:
@@ -48,7 +152,8 @@ def run_pipeline(config: dict, status_callback: StatusCallback = None) -> dict:
         status_callback: Optional callback function(stage, message, current, total)
                         for progress updates
     """
-    status = status_callback or _noop_status
+    status = StageTimer(status_callback or _noop_status)
+    pipeline_start = time.monotonic()
     
     source_type = config.get("source_type", "gcs")
     bucket = config.get("bucket")
@@ -60,6 +165,11 @@ def run_pipeline(config: dict, status_callback: StatusCallback = None) -> dict:
     do_translate = config.get("translate", False)
     do_validate = config.get("validate", False)
     archive_bucket = config.get("archive_bucket")
+    baseline_run_id = config.get("baseline_run_id")
+    # Bucket prefix and include/exclude globs (lists or comma-separated) restricting what is analysed
+    prefix = config.get("prefix")
+    include = config.get("include")
+    exclude = config.get("exclude")
 
     run_id = config.get("run_id") or str(uuid.uuid4())
 
@@ -73,77 +183,255 @@ def run_pipeline(config: dict, status_callback: StatusCallback = None) -> dict:
     os.makedirs(output_dir, exist_ok=True)
 
     analysis_json_path = os.path.join(output_dir, "analysis_results.json")
-
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    incremental = None
+
+    # One client per run: every stage shares the response cache and the
+    # hit/miss counters reported in the run result. The backend can be
+    # switched to record/replay a cassette for offline benchmarking.
+    llm_backend = create_backend(
+        project_id,
+        model_name=DEFAULT_MODEL,
+        backend=config.get("llm_backend"),
+        cassette_path=config.get("llm_cassette"),
+    )
+    llm_client = LLMClient(project_id, backend=llm_backend)
+    ingestion_dedup = None
+    deduplicator = None
+    content_duplicates = {}
+    dedup_report_path = os.path.join(output_dir, DEDUP_REPORT_FILENAME)
+
+    files = None
+    baseline = None
+    ingestion = None
+    archive = None
+    planner = None
+    streamed = False
+    # What analysis reads: the pending list, or a stream of prefetched blobs
+    analysis_source = None
     if skip_analysis and os.path.exists(analysis_json_path):
         import json
 
         logger.info("Skipping analysis, loading results from JSON: %s", analysis_json_path)
         status("analysis", "Loading cached analysis results...")
         with open(analysis_json_path, "r", encoding="utf-8") as f:
-            results = json.load(f)
-        status("analysis", f"Loaded {len(results)} cached results")
+            reused = json.load(f)
+        pending, fingerprints = [], {}
+        status("analysis", f"Loaded {len(reused)} cached results")
     else:
+        baseline = _load_baseline_manifest(base_output_root, baseline_run_id, archive_bucket, project_id) if baseline_run_id else None
+        adapter = get_adapter(source_system)
+        # Analyse each object once even when copies differ in whitespace or comments
+        deduplicator = ContentDeduplicator(adapter.categorize_file)
+        # Skip irrelevant objects by name before download, and start the largest files first
+        planner = IngestionPlanner(adapter.categorize_file, include=include, exclude=exclude)
         if source_type == "gcs":
             if not bucket:
                 raise ValueError("bucket is required when source_type is 'gcs'")
             status("ingestion", f"Connecting to GCS bucket: {bucket}")
-            ingestion = IngestionEngine(bucket)
-            files = ingestion.list_files()
-            logger.info("Found %d files in bucket %s", len(files), bucket)
-            status("ingestion", f"Found {len(files)} files in bucket")
+            ingestion = IngestionEngine(bucket, prefix=prefix)
+            if INGESTION_STREAMING_ENABLED and not baseline:
+                # Listing, downloads, content dedup and analysis overlap; `files`
+                # and `pending` fill in as the listing pages arrive
+                files, pending = [], []
+                reused, fingerprints = {}, {}
+                streamed = True
+                planned = planner.iter_ordered(ingestion.iter_files(admit=planner.admit))
+                analysis_source = iterate_in_thread(_stream_files(
+                    ingestion.prefetch(planned, buffer_size=_prefetch_buffer_size()), files, pending, deduplicator,
+                ))
+                status("ingestion", f"Streaming files from GCS bucket: {bucket}")
+            else:
+                files = planner.order(ingestion.list_files(admit=planner.admit))
+                planner.log_summary()
+                ingestion_dedup = ingestion.dedup_stats()
+                logger.info("Found %d files in bucket %s", len(files), bucket)
+                status("ingestion", f"Found {len(files)} files in bucket ({ingestion_dedup['duplicate_files']} duplicates, "
+                                    f"{sum(planner.skipped.values())} irrelevant objects skipped)")
         elif source_type == "local":
             if not local_files:
                 raise ValueError("local_files must be provided when source_type is 'local'")
-            files = [LocalBlob(path) for path in local_files]
+            files = planner.plan(LocalBlob(path) for path in local_files)
             logger.info("Using %d local files for analysis", len(files))
             status("ingestion", f"Loaded {len(files)} local files")
+        elif source_type == "archive":
+            location = config.get("archive")
+            if not location:
+                raise ValueError("archive is required when source_type is 'archive'")
+            status("ingestion", f"Opening archive: {location}")
+            archive = open_archive(location, project_id)
+            if archive.streamed:
+                # tar.gz can only be read front to back: members are analysed (or matched
+                # against the baseline) as the archive streams past
+                files, pending, reused, fingerprints = [], [], {}, {}
+                streamed = True
+                members = archive.members(admit=planner.admit, buffer_size=_prefetch_buffer_size())
+                analysis_source = iterate_in_thread(_stream_files(
+                    members, files, pending, deduplicator, baseline, reused, fingerprints, source_system,
+                ))
+                status("ingestion", f"Streaming members of {archive.name}")
+            else:
+                files = planner.order(list(archive.members(admit=planner.admit)))
+                planner.log_summary()
+                logger.info("Found %d files in archive %s", len(files), location)
+                status("ingestion", f"Found {len(files)} files in {archive.name} "
+                                    f"({sum(planner.skipped.values())} irrelevant members skipped)")
         else:
             raise ValueError(f"Unsupported source_type: {source_type}")
 
-        status("analysis", f"Analyzing {len(files)} files with LLM...")
-        analyzer = AnalysisEngine(project_id=project_id, source_system=source_system)
-        results = analyzer.analyze(files, status_callback=status)
+        if analysis_source is None:
+            # Reuse the baseline run's results for files whose content hasn't changed
+            if baseline:
+                reused, pending, fingerprints, removed = baseline.partition(files, source_system)
+                incremental = {
+                    "baseline_run_id": baseline_run_id,
+                    "reused": len(reused),
+                    "analyzed": len(pending),
+                    "removed": len(removed),
+                }
+                logger.info("Incremental run against %s: %d unchanged, %d new or changed, %d removed",
+                            baseline_run_id, len(reused), len(pending), len(removed))
+                status("analysis", f"Reusing {len(reused)} unchanged files from run {baseline_run_id[:8]}")
+            else:
+                reused, pending, fingerprints = {}, files, {}
+
+            # Content fingerprints of reused files, recorded by the baseline run
+            known_content = {}
+            if baseline:
+                for blob in files:
+                    content_fp = baseline.content_fingerprint(file_key(blob))
+                    if blob.name in reused and content_fp:
+                        known_content.setdefault(content_fp, blob.name)
+            if CONTENT_DEDUP_ENABLED and pending and (len(pending) > 1 or known_content):
+                status("ingestion", f"Fingerprinting {len(pending)} files for duplicate content...")
+                pending, content_duplicates = deduplicator.dedupe(pending, known_content)
+                if content_duplicates:
+                    status("ingestion", f"{deduplicator.files_checked - len(pending)} files share content with another file")
+                if incremental:
+                    incremental["analyzed"] = len(pending)
+            analysis_source = pending
+            if pending and (ingestion or archive):
+                # Downloads and decompression run ahead of analysis on the ingestion pool
+                # rather than in the analysis tasks
+                prefetcher = ingestion.prefetch(pending, buffer_size=_prefetch_buffer_size()) if ingestion \
+                    else BlobPrefetcher(pending, buffer_size=_prefetch_buffer_size())
+                analysis_source = iterate_in_thread(prefetcher)
+
+    def _finish_analysis(results):
+        """Analysis barrier: fan results out to duplicates, write the manifest and dedup report."""
+        nonlocal ingestion_dedup, content_duplicates, incremental
+        if streamed:
+            # The stream has been read to the end by the time analysis completes
+            if ingestion:
+                ingestion_dedup = ingestion.dedup_stats()
+            content_duplicates = deduplicator.duplicates()
+            logger.info("Streamed %d files; analysed %d", len(files), len(pending))
+            if baseline:
+                removed = baseline.removed(fingerprints)
+                incremental = {
+                    "baseline_run_id": baseline_run_id,
+                    "reused": len(reused),
+                    "analyzed": len(pending),
+                    "removed": len(removed),
+                }
+        # Duplicates share their canonical file's analysis
+        # Content groups first: a byte-identical copy's canonical file may itself be a content copy
+        for duplicates in (content_duplicates, ingestion_dedup["duplicates"] if ingestion_dedup else {}):
+            for canonical, aliases in duplicates.items():
+                if canonical not in results:
+                    continue
+                analysed = results[canonical].get("duplicate_of") or canonical
+                for alias in aliases:
+                    # Same-named copies from different folders already share the canonical entry
+                    if alias != canonical:
+                        results[alias] = dict(results[canonical], duplicate_of=analysed)
+
+        if files is not None:
+            # Every run writes a manifest so it can serve as a later run's baseline
+            manifest = AnalysisManifest(run_id, source_system)
+            for blob in files:
+                key = file_key(blob)
+                if blob.name not in results:
+                    continue
+                try:
+                    file_fingerprint = fingerprints.get(key) or fingerprint(blob)
+                except Exception as e:
+                    logger.warning("Could not fingerprint %s for the manifest: %s", blob.name, e)
+                    continue
+                content_fp = deduplicator.fingerprints.get(blob.name) or (baseline.content_fingerprint(key) if baseline else None)
+                manifest.record(key, blob.name, file_fingerprint, results[blob.name], content_fp)
+            manifest.write(manifest_path)
+
+        if deduplicator:
+            import json
+
+            with open(dedup_report_path, "w", encoding="utf-8") as f:
+                json.dump(deduplicator.report(ingestion_dedup["duplicates"] if ingestion_dedup else None), f, indent=2)
 
-    status("reporting", "Generating analysis report...")
-    reporter = Reporter(output_dir=output_dir, source_system=source_system)
-    reporter.generate_report(results)
+        # Downstream stages only need one copy of each duplicated object
+        stage_results = {name: data for name, data in results.items() if not data.get("duplicate_of")}
+        return results, stage_results
 
-    status("visualization", "Creating dependency diagram...")
-    visualizer = Visualizer(output_dir=output_dir)
-    visualizer.generate_dependency_diagram(results)
+    analyzer = None
+    if pending or streamed:
+        status("analysis", "Analyzing files with LLM as they are listed..." if streamed else f"Analyzing {len(pending)} files with LLM...")
+        analyzer = AnalysisEngine(project_id=project_id, source_system=source_system, llm_client=llm_client)
 
     categorization_results = None
     categorization_json_path = os.path.join(output_dir, "data_categorization.json")
+    stage_spans = None
+
+    if PIPELINE_STREAMING_ENABLED:
+        # Per-file stages start on each file as soon as its analysis completes;
+        # only the report, diagram and domain inference wait for every file
+        if do_translate and not do_categorize:
+            categorization_results = _load_categorization(categorization_json_path)
+        pipeline = StagePipeline(
+            output_dir,
+            source_system=source_system,
+            analyzer=analyzer,
+            categorizer=DataCategorizer(project_id=project_id, output_dir=output_dir, source_system=source_system, llm_client=llm_client) if do_categorize else None,
+            translator=SchemaTranslator(project_id=project_id, output_dir=output_dir, source_system=source_system, llm_client=llm_client) if do_translate else None,
+            validator=ValidationEngine(project_id=project_id, output_dir=output_dir, source_system=source_system, llm_client=llm_client) if do_validate else None,
+            categorization_results=categorization_results,
+            status_callback=status,
+        )
+        results = pipeline.run(analysis_source or [], reused, _finish_analysis)
+        stage_spans = pipeline.stage_spans
+    else:
+        analysed = analyzer.analyze(analysis_source, status_callback=status) if analyzer else {}
+        # Streamed sources add to `reused` while they are read
+        results, stage_results = _finish_analysis({**reused, **analysed})
 
-    if do_categorize:
-        status("categorization", "Categorizing data by business domain...")
-        categorizer = DataCategorizer(project_id=project_id, output_dir=output_dir, source_system=source_system)
-        categorizer.categorize(results, status_callback=status)
+        status("reporting", "Generating analysis report...")
+        reporter = Reporter(output_dir=output_dir, source_system=source_system)
+        reporter.generate_report(results)
 
-        import json
+        status("visualization", "Creating dependency diagram...")
+        visualizer = Visualizer(output_dir=output_dir)
+        visualizer.generate_dependency_diagram(stage_results)
 
-        if os.path.exists(categorization_json_path):
-            with open(categorization_json_path, "r", encoding="utf-8") as f:
-                categorization_results = json.load(f)
+        if do_categorize:
+            status("categorization", "Categorizing data by business domain...")
+            categorizer = DataCategorizer(project_id=project_id, output_dir=output_dir, source_system=source_system, llm_client=llm_client)
+            categorizer.categorize(stage_results, status_callback=status)
 
-    if do_translate:
-        if not categorization_results:
-            import json
+        if do_translate:
+            categorization_results = _load_categorization(categorization_json_path)
+            status("translation", "Translating schemas to BigQuery/Dataform...")
+            translator = SchemaTranslator(project_id=project_id, output_dir=output_dir, source_system=source_system, llm_client=llm_client)
+            translator.translate(stage_results, categorization_results, status_callback=status)
 
-            if os.path.exists(categorization_json_path):
-                with open(categorization_json_path, "r", encoding="utf-8") as f:
-                    categorization_results = json.load(f)
-            else:
-                categorization_results = {"domains": [], "categorizations": {}}
+        if do_validate:
+            status("validation", "Generating validation test cases...")
+            validator = ValidationEngine(project_id=project_id, output_dir=output_dir, source_system=source_system, llm_client=llm_client)
+            validator.validate(stage_results, status_callback=status)
 
-        status("translation", "Translating schemas to BigQuery/Dataform...")
-        translator = SchemaTranslator(project_id=project_id, output_dir=output_dir, source_system=source_system)
-        translator.translate(results, categorization_results, status_callback=status)
+    if archive:
+        archive.close()
 
-    if do_validate:
-        status("validation", "Generating validation test cases...")
-        validator = ValidationEngine(project_id=project_id, output_dir=output_dir, source_system=source_system)
-        validator.validate(results, status_callback=status)
+    llm_metrics_path = os.path.join(output_dir, "llm_metrics.json")
+    llm_metrics = llm_client.metrics.write(llm_metrics_path, extra={"model_routing": llm_client.router.stats()})
 
     dataform_dir = os.path.join(output_dir, "dataform") if os.path.isdir(os.path.join(output_dir, "dataform")) else None
     validation_tests_path = os.path.join(output_dir, "validation_tests.json") if os.path.exists(os.path.join(output_dir, "validation_tests.json")) else None
@@ -155,7 +443,7 @@ def run_pipeline(config: dict, status_callback: StatusCallback = None) -> dict:
     gcs_uris = {}
     if archive_bucket:
         try:
-            client = storage.Client(project=project_id)
+            client = create_storage_client(project_id)
             bucket_obj = client.bucket(archive_bucket)
             base_prefix = f"runs/{run_id}/"
 
@@ -175,6 +463,9 @@ def run_pipeline(config: dict, status_callback: StatusCallback = None) -> dict:
             gcs_uris["categorization_report_uri"] = _upload(categorization_report_path, "categorization_report.txt")
             gcs_uris["validation_tests_uri"] = _upload(validation_tests_path, "validation_tests.json")
             gcs_uris["validation_report_uri"] = _upload(validation_report_path, "validation_report.txt")
+            gcs_uris["llm_metrics_uri"] = _upload(llm_metrics_path, "llm_metrics.json")
+            gcs_uris["analysis_manifest_uri"] = _upload(manifest_path, MANIFEST_FILENAME)
+            gcs_uris["dedup_report_uri"] = _upload(dedup_report_path, DEDUP_REPORT_FILENAME)
 
             if dataform_dir and os.path.isdir(dataform_dir):
                 archive_base = os.path.join(output_dir, "dataform")
@@ -194,9 +485,31 @@ def run_pipeline(config: dict, status_callback: StatusCallback = None) -> dict:
         "dataform_dir": dataform_dir,
         "validation_tests_path": validation_tests_path,
         "validation_report_path": validation_report_path,
+        "analysis_manifest_path": manifest_path if os.path.exists(manifest_path) else None,
+        "dedup_report_path": dedup_report_path if os.path.exists(dedup_report_path) else None,
+        "incremental": incremental,
+        "ingestion_plan": planner.summary() if planner else None,
+        "blob_cache": ingestion.cache_stats() if ingestion else None,
+        "llm_backend": llm_backend.name,
+        "llm_cache": llm_client.cache_stats(),
+        "llm_metrics_path": llm_metrics_path,
+        "llm_usage": llm_metrics["totals"],
+        "model_routing": llm_metrics["model_routing"],
+        "dedup": {
+            **llm_client.dedup_stats(),
+            "duplicate_files": ingestion_dedup["duplicate_files"] if ingestion_dedup else 0,
+            "duplicates": ingestion_dedup["duplicates"] if ingestion_dedup else {},
+            "content_duplicate_files": sum(len(aliases) for aliases in content_duplicates.values()),
+            "content_duplicates": content_duplicates,
+        },
     }
 
     if gcs_uris:
         result["gcs_uris"] = gcs_uris
 
+    result["stage_timings"] = status.finish()
+    if stage_spans:
+        result["stage_spans"] = stage_spans
+    result["total_seconds"] = round(time.monotonic() - pipeline_start, 3)
+
     return result
@@ -0,0 +1,266 @@
+"""
+Object storage clients.
+
+- The default is google.cloud.storage, used as-is.
+- LocalStorageClient emulates the parts of it this tool uses on a local
+  directory: each sub-directory of STORAGE_LOCAL_ROOT is a bucket, and each
+  file below it is an object named by its relative path. Buckets can be
+  listed. Objects support paged listing, read, write, exists, and ranged
+  open(). Listing metadata (size, MD5, generation) behaves like GCS, so
+  ingestion, dedup, the blob cache and incremental manifests work unchanged.
+  This lets the pipeline run and be benchmarked in air-gapped environments,
+  against synthetic buckets, without credentials.
+
+Select with STORAGE_BACKEND=gcs|local. STORAGE_LOCAL_LATENCY_MS adds a
+synthetic round-trip delay to every emulated request (listing page,
+download, upload), to approximate network-bound ingestion.
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs").lower()
+LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "local_storage")
+LOCAL_LATENCY_MS = float(os.getenv("STORAGE_LOCAL_LATENCY_MS", "0"))
+# GCS's default page size for list_blobs
+_DEFAULT_PAGE_SIZE = 1000
+
+
+def _share_connection_pool(client, size: int):
+    """Size a GCS client's HTTP connection pool for `size` concurrent downloads.
+
+    requests keeps 10 connections per host by default, so a larger download
+    pool would otherwise open and drop a connection on most requests.
+    """
+    try:
+        import requests
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        client._http.mount("https://", adapter)
+        client._http._auth_request.session.mount("https://", adapter)
+    except Exception as e:
+        logger.warning(f"Could not resize the GCS connection pool: {e}")
+
+
+def create_storage_client(project_id: Optional[str] = None, pool_size: Optional[int] = None,
+                          backend: Optional[str] = None):
+    """Build the client selected by argument or STORAGE_BACKEND (gcs | local)."""
+    name = (backend or STORAGE_BACKEND).lower()
+    if name == "local":
+        return LocalStorageClient(LOCAL_ROOT)
+    if name != "gcs":
+        logger.warning(f"Unknown storage backend '{name}', using gcs")
+
+    from google.cloud import storage
+
+    client = storage.Client(project=project_id)
+    if pool_size:
+        _share_connection_pool(client, pool_size)
+    return client
+
+
+def _simulate_round_trip():
+    if LOCAL_LATENCY_MS > 0:
+        time.sleep(LOCAL_LATENCY_MS / 1000)
+
+
+class LocalObject:
+    """An object in a LocalBucket, backed by one file.
+
+    Like a GCS Blob, metadata is populated by listing (or reload()); objects
+    from bucket.blob(name) have none until then. The generation is the
+    file's modification time in microseconds, so rewriting an object gives
+    it a new generation.
+    """
+
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.path, *name.split("/"))
+        self.size: Optional[int] = None
+        self.generation: Optional[int] = None
+        self.crc32c = None
+        self._md5_hash: Optional[str] = None
+        self._loaded = False
+
+    def __repr__(self):
+        return f"<LocalObject: {self.bucket.name}, {self.name}, {self.generation}>"
+
+    def reload(self):
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        self.generation = stat.st_mtime_ns // 1000
+        self._md5_hash = None
+        self._loaded = True
+
+    @property
+    def md5_hash(self) -> Optional[str]:
+        """Base64 MD5 of the content, as GCS reports it; computed on first use."""
+        if not self._loaded:
+            return None
+        if self._md5_hash is None:
+            digest = hashlib.md5()
+            with open(self.path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            self._md5_hash = base64.b64encode(digest.digest()).decode("ascii")
+        return self._md5_hash
+
+    def exists(self) -> bool:
+        _simulate_round_trip()
+        return os.path.isfile(self.path)
+
+    def download_as_bytes(self) -> bytes:
+        _simulate_round_trip()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def download_as_text(self, encoding: str = "utf-8") -> str:
+        return self.download_as_bytes().decode(encoding)
+
+    def download_to_filename(self, filename: str):
+        _simulate_round_trip()
+        shutil.copyfile(self.path, filename)
+
+    def upload_from_string(self, data, content_type: Optional[str] = None):
+        _simulate_round_trip()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Readers never see a partially written object
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.uploading"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+        self.reload()
+
+    def upload_from_filename(self, filename: str, content_type: Optional[str] = None):
+        with open(filename, "rb") as f:
+            self.upload_from_string(f.read(), content_type)
+
+    def open(self, mode: str = "rb", chunk_size: Optional[int] = None):
+        if mode == "rb":
+            _simulate_round_trip()
+            return open(self.path, "rb")
+        if mode == "wb":
+            return _LocalUpload(self)
+        raise ValueError(f"Unsupported mode for local objects: {mode}")
+
+
+class _LocalUpload(io.BytesIO):
+    """Write stream that uploads its content when closed, like a GCS BlobWriter."""
+
+    def __init__(self, blob: LocalObject):
+        super().__init__()
+        self._blob = blob
+
+    def close(self):
+        if not self.closed:
+            self._blob.upload_from_string(self.getvalue())
+        super().close()
+
+
+class _LocalListing:
+    """Result of list_blobs: iterable directly or page by page via .pages."""
+
+    def __init__(self, bucket: "LocalBucket", prefix: Optional[str], page_size: Optional[int]):
+        self._bucket = bucket
+        self._prefix = prefix or ""
+        self._page_size = max(1, page_size or _DEFAULT_PAGE_SIZE)
+
+    def _names(self) -> List[str]:
+        names = []
+        for dirpath, _, filenames in os.walk(self._bucket.path):
+            rel_dir = os.path.relpath(dirpath, self._bucket.path)
+            for filename in filenames:
+                if filename.endswith(".uploading"):
+                    continue
+                rel = filename if rel_dir == "." else os.path.join(rel_dir, filename)
+                name = rel.replace(os.sep, "/")
+                if name.startswith(self._prefix):
+                    names.append(name)
+        # GCS lists objects in lexicographic name order
+        return sorted(names)
+
+    @property
+    def pages(self) -> Iterator[Iterator[LocalObject]]:
+        names = self._names()
+        for start in range(0, len(names), self._page_size):
+            _simulate_round_trip()
+            page = []
+            for name in names[start:start + self._page_size]:
+                blob = LocalObject(self._bucket, name)
+                try:
+                    blob.reload()
+                except FileNotFoundError:
+                    # Deleted between walking the directory and listing it
+                    continue
+                page.append(blob)
+            yield iter(page)
+
+    def __iter__(self) -> Iterator[LocalObject]:
+        for page in self.pages:
+            yield from page
+
+
+class LocalBucket:
+    def __init__(self, client: "LocalStorageClient", name: str):
+        self.client = client
+        self.name = name
+        self.path = os.path.join(client.root, name)
+
+    def __repr__(self):
+        return f"<LocalBucket: {self.name}>"
+
+    def blob(self, name: str) -> LocalObject:
+        return LocalObject(self, name)
+
+    def get_blob(self, name: str) -> Optional[LocalObject]:
+        blob = self.blob(name)
+        try:
+            blob.reload()
+        except FileNotFoundError:
+            return None
+        return blob
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.path)
+
+    def list_blobs(self, prefix: Optional[str] = None, page_size: Optional[int] = None) -> _LocalListing:
+        return _LocalListing(self, prefix, page_size)
+
+
+class LocalStorageClient:
+    """Stand-in for google.cloud.storage.Client over a local directory."""
+
+    def __init__(self, root: str = LOCAL_ROOT):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        logger.info(f"Using local storage emulator at {os.path.abspath(root)}")
+
+    def bucket(self, bucket_name: str) -> LocalBucket:
+        return LocalBucket(self, bucket_name)
+
+    def create_bucket(self, bucket_name: str) -> LocalBucket:
+        bucket = self.bucket(bucket_name)
+        os.makedirs(bucket.path, exist_ok=True)
+        return bucket
+
+    def list_buckets(self) -> List[LocalBucket]:
+        return [self.bucket(name) for name in sorted(os.listdir(self.root))
+                if os.path.isdir(os.path.join(self.root, name))]
+
+    def list_blobs(self, bucket_or_name, prefix: Optional[str] = None,
+                   page_size: Optional[int] = None) -> _LocalListing:
+        bucket = bucket_or_name if isinstance(bucket_or_name, LocalBucket) else self.bucket(bucket_or_name)
+        if not bucket.exists():
+            raise FileNotFoundError(f"Bucket not found: {bucket.name} (under {self.root})")
+        return bucket.list_blobs(prefix=prefix, page_size=page_size)
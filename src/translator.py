@@ -3,19 +3,19 @@ import os
 import re
 import logging
 from typing import Optional
-from google.cloud import storage
 from src.llm_client import LLMClient
-from src.json_utils import safe_parse_json
+from src.models import Column, Table, analysis_object, is_partial_object
 from src.adapters.registry import get_adapter
 from src.adapters.base import SourceAdapter
+from src.storage import create_storage_client
 
 logger = logging.getLogger(__name__)
 
 class SchemaTranslator:
-    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None):
+    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None, llm_client: Optional[LLMClient] = None):
         self.output_dir = output_dir
         self.dataform_dir = os.path.join(output_dir, "dataform")
-        self.llm_client = LLMClient(project_id)
+        self.llm_client = llm_client or LLMClient(project_id)
         
         # Load source system adapter
         self.adapter = get_adapter(source_system)
@@ -99,43 +99,31 @@ class SchemaTranslator:
         categorizations = categorization_results.get("categorizations", {})
         
         # Count tables for progress
-        table_files = [f for f, d in analysis_results.items() if 'table_name' in d.get('analysis', '')]
-        total_tables = len(table_files)
+        tables = []
+        for filename, data in analysis_results.items():
+            info = analysis_object(data)
+            if isinstance(info, Table):
+                if is_partial_object(info):
+                    # Columns may be missing; generating DDL from it would silently drop them
+                    logger.warning(f"Skipping {filename}: its analysis was truncated, re-run analysis to translate it")
+                    continue
+                tables.append((filename, info))
+        total_tables = len(tables)
         
         if status_callback:
             status_callback("translation", f"Translating {total_tables} tables to BigQuery...", 2, 4)
         
         # Translate source tables
         translated_count = 0
-        for filename, data in analysis_results.items():
-            analysis = data.get('analysis', '')
-            if 'table_name' not in analysis:
-                continue
-            
+        for filename, table in tables:
             try:
-                # Extract table info using safe JSON parsing with repair
-                info = safe_parse_json(analysis)
-                if not info:
-                    logger.warning(f"Could not parse JSON for {filename}, skipping")
-                    continue
-                
-                table_name = info.get("table_name")
-                
-                if not table_name:
-                    continue
-                
                 translated_count += 1
-                logger.info(f"Translating {table_name}...")
+                logger.info(f"Translating {table.name}...")
                 
                 if status_callback:
-                    status_callback("translation", f"Translating table {translated_count}/{total_tables}: {table_name}", translated_count, total_tables)
-                
-                # Determine domain and dataset
-                domain = self._get_table_domain(table_name, categorizations, domains)
-                dataset = self.domain_to_dataset.get(domain, "crown_default")
+                    status_callback("translation", f"Translating table {translated_count}/{total_tables}: {table.name}", translated_count, total_tables)
                 
-                # Translate schema
-                self._translate_table(table_name, info, dataset, domain)
+                self._translate_categorized_table(table, categorizations, domains)
                 
             except Exception as e:
                 logger.warning(f"Failed to translate {filename}: {e}")
@@ -146,16 +134,7 @@ class SchemaTranslator:
         
         # Convert Informatica transformations (pass source_system for function mappings)
         logger.info("Converting Informatica transformations...")
-        from src.informatica_converter import InformaticaConverter
-        # Get source_system name from adapter to pass to InformaticaConverter
-        source_system_name = self.adapter.name.lower().replace(" ", "").replace("-", "")
-        # Map adapter name back to config name (e.g., "Sybase ASE" -> "sybase")
-        source_system_key = None
-        for key in ["sybase", "oracle", "sqlserver", "mysql", "postgres", "teradata", "snowflake"]:
-            if key in source_system_name:
-                source_system_key = key
-                break
-        informatica_converter = InformaticaConverter(output_dir=self.output_dir, source_system=source_system_key)
+        informatica_converter = self._create_informatica_converter()
         informatica_converter.convert_informatica_mappings(analysis_results, categorization_results)
         
         if status_callback:
@@ -169,6 +148,25 @@ class SchemaTranslator:
         # entries to add to the GCS mapping file.
         self._write_type_mapping_report()
 
+    def _create_informatica_converter(self):
+        """InformaticaConverter for the same source system, sharing this translator's LLM client."""
+        from src.informatica_converter import InformaticaConverter
+        # Get source_system name from adapter to pass to InformaticaConverter
+        source_system_name = self.adapter.name.lower().replace(" ", "").replace("-", "")
+        # Map adapter name back to config name (e.g., "Sybase ASE" -> "sybase")
+        source_system_key = None
+        for key in ["sybase", "oracle", "sqlserver", "mysql", "postgres", "teradata", "snowflake"]:
+            if key in source_system_name:
+                source_system_key = key
+                break
+        return InformaticaConverter(output_dir=self.output_dir, source_system=source_system_key, llm_client=self.llm_client)
+
+    def _translate_categorized_table(self, table, categorizations, domains):
+        """Translate one parsed table into the dataset of its categorized domain."""
+        domain = self._get_table_domain(table.name, categorizations, domains)
+        dataset = self.domain_to_dataset.get(domain, "crown_default")
+        self._translate_table(table.name, table, dataset, domain)
+
     def _create_dataform_structure(self):
         """Creates Dataform project structure."""
         # Create directories
@@ -213,22 +211,18 @@ module.exports = {{ mapSourceType }};
 
     def _translate_table(self, table_name, table_info, dataset, domain):
         """Translates a single table to Dataform .sqlx."""
-        columns = table_info.get("columns", [])
-        primary_keys = table_info.get("primary_keys", [])
+        columns = table_info.columns
+        primary_keys = table_info.primary_keys
         
         # Map columns to BigQuery types
         bq_columns = []
         for col in columns:
-            col_name = col.get("name")
-            source_type = col.get("type", "STRING")
-            nullable = col.get("nullable", True)
-            
             # Map type
-            bq_type = self._map_type(source_type)
+            bq_type = self._map_type(col.type)
             
             # Build column definition
-            null_constraint = "" if nullable else " NOT NULL"
-            bq_columns.append(f"  {col_name} {bq_type}{null_constraint}")
+            null_constraint = "" if col.nullable else " NOT NULL"
+            bq_columns.append(f"  {col.name} {bq_type}{null_constraint}")
         
         # Determine partitioning and clustering
         partition_field = self._suggest_partition_field(columns)
@@ -335,7 +329,7 @@ module.exports = {{ mapSourceType }};
         Lines starting with '#' or empty lines are ignored.
         """
         try:
-            client = storage.Client()
+            client = create_storage_client()
             bucket = client.bucket(bucket_name)
             blob = bucket.blob(blob_path)
             if not blob.exists():
@@ -377,13 +371,13 @@ module.exports = {{ mapSourceType }};
         """Suggests a partition field based on column types."""
         # Look for date/timestamp fields
         for col in columns:
-            col_name = col.get("name", "").lower()
-            col_type = col.get("type", "").upper()
+            col_name = col.name.lower()
+            col_type = col.type.upper()
             
             if "DATE" in col_type or "TIMESTAMP" in col_type or "DATETIME" in col_type:
                 # Prefer fields with common date names
                 if any(keyword in col_name for keyword in ["date", "dt", "time", "dttm"]):
-                    return col.get("name")
+                    return col.name
         
         return None
 
@@ -396,9 +390,9 @@ module.exports = {{ mapSourceType }};
         # Otherwise, look for common filter columns
         cluster_candidates = []
         for col in columns:
-            col_name = col.get("name", "").lower()
+            col_name = col.name.lower()
             if any(keyword in col_name for keyword in ["id", "code", "type", "status", "site"]):
-                cluster_candidates.append(col.get("name"))
+                cluster_candidates.append(col.name)
                 if len(cluster_candidates) >= 4:
                     break
         
@@ -500,7 +494,9 @@ module.exports = {{ mapSourceType }};
         # Format columns for the prompt
         column_info = []
         for col in columns:
-            if isinstance(col, dict):
+            if isinstance(col, Column):
+                column_info.append(f"{col.name}: {col.type}")
+            elif isinstance(col, dict):
                 column_info.append(f"{col.get('name', 'unknown')}: {col.get('type', 'unknown')}")
             else:
                 # Already formatted string
@@ -514,16 +510,10 @@ module.exports = {{ mapSourceType }};
         )
         
         try:
-            response = self.llm_client.generate_content(prompt)
-            
-            # Parse response
-            clean_response = response.replace("```json", "").replace("```", "").strip()
-            if "{" in clean_response:
-                start = clean_response.find("{")
-                end = clean_response.rfind("}") + 1
-                clean_response = clean_response[start:end]
-            
-            result = json.loads(clean_response)
+            # Small, cheap task: routed to the light model, escalated only if the JSON won't parse
+            response, result = self.llm_client.generate_json(prompt, stage="scd_detection", task="scd_detection")
+            if not isinstance(result, dict):
+                raise ValueError(f"unparseable SCD response: {response[:200]}")
             
             # Normalize scd_type value
             scd_type = result.get("scd_type", "scd_type1").lower().replace("-", "_").replace(" ", "_")
@@ -583,7 +573,10 @@ module.exports = {{ mapSourceType }};
         # Count SCD2 indicator columns
         scd2_column_count = 0
         for col in columns:
-            col_name = col.get("name", "").lower() if isinstance(col, dict) else str(col).lower()
+            if isinstance(col, Column):
+                col_name = col.name.lower()
+            else:
+                col_name = col.get("name", "").lower() if isinstance(col, dict) else str(col).lower()
             for indicator in scd2_column_indicators:
                 if indicator in col_name:
                     scd2_column_count += 1
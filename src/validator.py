@@ -1,70 +1,77 @@
+import asyncio
 import json
 import os
 import logging
 from typing import Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from src.llm_client import LLMClient
+from src.llm_client import LLMClient, field_progress_callback
 from src.prompts import VALIDATION_TEST_PROMPT
-from src.json_utils import safe_parse_json
+from src.json_utils import PARTIAL_KEY
+from src.models import analysis_object, is_partial_object
 from src.adapters.registry import get_adapter
+from src.concurrency import run_sync
 
 logger = logging.getLogger(__name__)
 
-# Max parallel LLM calls for validation
-MAX_WORKERS = int(os.getenv("VALIDATION_MAX_WORKERS", "5"))
-
 
 class ValidationEngine:
-    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None):
+    def __init__(self, project_id="dan-sandpit", output_dir="output", source_system: Optional[str] = None, llm_client: Optional[LLMClient] = None):
         self.output_dir = output_dir
-        self.llm_client = LLMClient(project_id)
+        self.llm_client = llm_client or LLMClient(project_id)
         self.adapter = get_adapter(source_system)
         os.makedirs(output_dir, exist_ok=True)
         logger.info(f"ValidationEngine initialized for source system: {self.adapter.name}")
 
-    def _generate_tests_for_file(self, filename, data):
-        """Generate validation tests for a single file - designed for parallel execution."""
+    async def _generate_tests_for_file(self, filename, data, status_callback=None):
+        """Generate validation tests for a single file - designed for concurrent execution."""
         analysis_text = data.get("analysis", "")
         if not analysis_text or analysis_text.startswith("Error"):
             return None
 
-        # Use safe JSON parsing with repair
-        info = safe_parse_json(analysis_text)
-        if not info:
+        info = analysis_object(data)
+        if info is None:
             logger.warning(f"Skipping {filename} for validation, could not parse JSON")
             return None
 
-        # Determine object type for prompt context
-        object_type = "table" if "table_name" in info else "procedure" if "procedure_name" in info else "mapping" if "mapping_name" in info else "unknown"
+        # Object type for prompt context
+        object_type = info.kind
 
+        analysis = {key: value for key, value in info.to_dict().items() if key != PARTIAL_KEY}
         prompt = VALIDATION_TEST_PROMPT.format(
             object_type=object_type, 
-            analysis=json.dumps(info, indent=2),
+            analysis=json.dumps(analysis, indent=2),
             source_system=self.adapter.name
         )
-        response = self.llm_client.generate_content(prompt)
-
-        # Use safe JSON parsing with repair for LLM response
-        tests = safe_parse_json(response)
+        # Parsed with repair; escalates to a stronger model if the answer isn't valid JSON
+        _, tests = await self.llm_client.agenerate_json(
+            prompt, stage="validation", filename=filename, task="validation",
+            on_chunk=field_progress_callback("validation", filename, status_callback),
+        )
         if not tests:
             logger.warning(f"Failed to parse validation tests for {filename}")
             return None
         
-        return filename, {
+        result = {
             "object_type": object_type,
             "tests": tests,
         }
+        if is_partial_object(info):
+            # Generated from a truncated analysis: the tests may not cover the whole object
+            result["partial_analysis"] = True
+        return filename, result
 
     def validate(self, analysis_results, status_callback=None):
-        """Generates validation test definitions from analysis results in parallel.
+        """Generates validation test definitions from analysis results concurrently.
 
         This initial implementation does not execute tests against source/BigQuery.
         It focuses on generating structured test cases and a human-readable report
         that can later be wired into automated execution.
         """
         logger.info("Starting validation & test generation...")
-        
+        run_sync(self._validate_async(analysis_results, status_callback))
+        logger.info("Validation & test generation complete.")
+
+    async def _validate_async(self, analysis_results, status_callback=None):
         if status_callback:
             status_callback("validation", "Generating validation test cases...", 1, 3)
 
@@ -72,22 +79,22 @@ class ValidationEngine:
         total_files = len(analysis_results)
         completed = 0
         
-        # Use ThreadPoolExecutor for parallel LLM calls
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_file = {
-                executor.submit(self._generate_tests_for_file, filename, data): filename
-                for filename, data in analysis_results.items()
-            }
-            
-            for future in as_completed(future_to_file):
-                filename = future_to_file[future]
-                completed += 1
-                try:
-                    result = future.result()
-                    if result:
-                        test_definitions[result[0]] = result[1]
-                except Exception as e:
-                    logger.error(f"Failed to generate tests for {filename}: {e}")
+        async def _run(filename, data):
+            try:
+                return filename, await self._generate_tests_for_file(filename, data, status_callback), None
+            except Exception as e:
+                return filename, None, e
+
+        # All files share one event loop; the LLM client's limiter bounds concurrency
+        tasks = [asyncio.create_task(_run(filename, data)) for filename, data in analysis_results.items()]
+        
+        for next_done in asyncio.as_completed(tasks):
+            filename, result, error = await next_done
+            completed += 1
+            if error is not None:
+                logger.error(f"Failed to generate tests for {filename}: {error}")
+            elif result:
+                test_definitions[result[0]] = result[1]
 
         if status_callback:
             status_callback("validation", "Saving validation results...", 2, 3)
@@ -99,8 +106,6 @@ class ValidationEngine:
         
         self._generate_report(test_definitions)
 
-        logger.info("Validation & test generation complete.")
-
     def _save_results(self, test_definitions):
         """Save validation test definitions to JSON."""
         output_path = os.path.join(self.output_dir, "validation_tests.json")
@@ -129,6 +134,8 @@ class ValidationEngine:
                 name = tests.get("object_name") or filename
 
                 f.write(f"## {name} ({object_type})\n\n")
+                if obj.get("partial_analysis"):
+                    f.write("> Generated from a truncated analysis; tests may not cover the whole object.\n\n")
 
                 # High-level summary if provided
                 if "summary" in tests:
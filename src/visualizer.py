@@ -1,7 +1,6 @@
-import json
 import os
 import logging
-from src.json_utils import safe_parse_json
+from src.models import Mapping, Procedure, Table, analysis_object
 
 logger = logging.getLogger(__name__)
 
@@ -17,68 +16,43 @@ class Visualizer:
         edges = set()
 
         for filename, data in results.items():
-            analysis_text = data.get('analysis', '')
-            if not analysis_text or analysis_text.startswith("Error"):
+            info = analysis_object(data)
+            if info is None:
                 continue
 
-            try:
-                # Use safe JSON parsing with repair
-                info = safe_parse_json(analysis_text)
-                if not info:
-                    logger.warning(f"Could not parse JSON for {filename}")
-                    continue
-                
-                # Node Identification
-                node_name = None
-                node_type = "unknown"
+            # Node Identification
+            if isinstance(info, Table):
+                node_name, node_type = info.name, "table"
+            elif isinstance(info, Procedure):
+                node_name, node_type = info.name, "procedure"
+            elif isinstance(info, Mapping):
+                node_name, node_type = info.name or filename, "mapping"  # Fallback if null
+            else:
+                continue
 
-                if "table_name" in info:
-                    node_name = info["table_name"]
-                    node_type = "table"
-                elif "procedure_name" in info:
-                    node_name = info["procedure_name"]
-                    node_type = "procedure"
-                elif "mapping_name" in info:
-                    node_name = info["mapping_name"] or filename # Fallback if null
-                    node_type = "mapping"
-                
-                if node_name:
-                    nodes.add((node_name, node_type))
+            nodes.add((node_name, node_type))
 
-                    # Edge Identification
-                    # 1. Foreign Keys (Table -> Table)
-                    if "foreign_keys" in info:
-                        for fk in info["foreign_keys"]:
-                            if isinstance(fk, dict) and "referenced_table" in fk:
-                                edges.add((node_name, fk["referenced_table"], "FK"))
-                    
-                    # 2. SP Dependencies (SP -> Table/SP)
-                    if "tables_read" in info:
-                        for tbl in info["tables_read"]:
-                            edges.add((node_name, tbl, "READS"))
-                    if "tables_modified" in info:
-                        for tbl in info["tables_modified"]:
-                            edges.add((node_name, tbl, "MODIFIES"))
-                    if "dependencies" in info:
-                        for dep in info["dependencies"]:
-                            edges.add((node_name, dep, "CALLS"))
+            # Edge Identification
+            # 1. Foreign Keys (Table -> Table)
+            if isinstance(info, Table):
+                for fk in info.foreign_keys:
+                    edges.add((node_name, fk.references_table, "FK"))
 
-                    # 3. Mapping Dependencies (Mapping -> Table)
-                    if "sources" in info and info["sources"]:
-                        for src in info["sources"]:
-                            if src:  # Skip None values
-                                edges.add((src, node_name, "SOURCE"))
-                    if "targets" in info and info["targets"]:
-                        for tgt in info["targets"]:
-                            if tgt:  # Skip None values
-                                edges.add((node_name, tgt, "TARGET"))
+            # 2. SP Dependencies (SP -> Table/SP)
+            if isinstance(info, Procedure):
+                for tbl in info.tables_read:
+                    edges.add((node_name, tbl, "READS"))
+                for tbl in info.tables_modified:
+                    edges.add((node_name, tbl, "MODIFIES"))
+                for dep in info.dependencies:
+                    edges.add((node_name, dep, "CALLS"))
 
-            except json.JSONDecodeError:
-                logger.warning(f"Could not parse JSON for {filename}")
-                continue
-            except Exception as e:
-                logger.warning(f"Error processing {filename}: {e}")
-                continue
+            # 3. Mapping Dependencies (Mapping -> Table)
+            if isinstance(info, Mapping):
+                for src in info.sources:
+                    edges.add((src, node_name, "SOURCE"))
+                for tgt in info.targets:
+                    edges.add((node_name, tgt, "TARGET"))
 
         # Generate Mermaid Content
         mermaid_content = "graph TD\n"
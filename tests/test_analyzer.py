@@ -0,0 +1,48 @@
+import asyncio
+
+from src.analyzer import AnalysisEngine
+
+TSQL_PROCEDURE = """create procedure [dbo].[load_sales] @id int
+as
+begin
+    insert into sales_fact select * from staging_sales where id = @id
+    exec log_event 1
+end
+"""
+MYSQL_PROCEDURE = """CREATE PROCEDURE load_sales(IN p_id INT)
+BEGIN
+    INSERT INTO sales_fact SELECT * FROM staging_sales WHERE id = p_id;
+    CALL log_event(1);
+END
+"""
+
+
+class RecordingClient:
+    def __init__(self):
+        self.prompts = []
+
+    async def agenerate_json(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return '{"logic_summary": "Loads sales."}', {"logic_summary": "Loads sales."}
+
+
+def _analyze(source_system, content):
+    client = RecordingClient()
+    engine = AnalysisEngine(source_system=source_system, llm_client=client)
+    _, result = asyncio.run(engine._analyze_content("load_sales.sql", "sql_transformation", content))
+    return client.prompts, result
+
+
+def test_static_analysis_uses_the_source_system_persona():
+    prompts, result = _analyze("sqlserver", TSQL_PROCEDURE)
+    assert result["parsed_by"] == "procedure_analyzer"
+    assert result["parsed"].tables_modified == ["sales_fact"]
+    assert "You are a SQL Server Database Expert" in prompts[0]
+    assert "Sybase" not in prompts[0]
+
+
+def test_other_dialects_keep_the_adapter_prompt():
+    prompts, result = _analyze("mysql", MYSQL_PROCEDURE)
+    assert "parsed_by" not in result
+    assert "tables read:" not in prompts[0]
+    assert "CALL log_event(1)" in prompts[0]
@@ -0,0 +1,66 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from src.archive_source import is_archive, open_archive
+from src.manifest import fingerprint
+
+MEMBERS = {
+    "ddl/t.sql": b"create table T (a int)",
+    "__MACOSX/ddl/._t.sql": b"junk",
+    "ddl/.DS_Store": b"junk",
+    "ddl/._u.sql": b"junk",
+    "wf/m.xml": b"<A/>",
+}
+
+
+def _write_zip(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in MEMBERS.items():
+            zf.writestr(name, data)
+
+
+def _write_tar(path):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(f"./{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def test_zip_members_skip_os_bookkeeping(tmp_path):
+    path = tmp_path / "estate.zip"
+    _write_zip(path)
+    archive = open_archive(str(path))
+    try:
+        members = list(archive.members())
+        assert [m.name for m in members] == ["estate.zip/ddl/t.sql", "estate.zip/wf/m.xml"]
+        assert members[0].download_as_text() == "create table T (a int)"
+        assert fingerprint(members[1]) == {"crc32": members[1].crc32, "size": 4}
+        assert [m.name for m in archive.members(admit=lambda m: m.name.endswith(".xml"))] == ["estate.zip/wf/m.xml"]
+    finally:
+        archive.close()
+
+
+def test_tar_members_stream_and_hash(tmp_path):
+    path = tmp_path / "estate.tar.gz"
+    _write_tar(path)
+    archive = open_archive(str(path))
+    seen = []
+    for member in archive.members(buffer_size=1):
+        seen.append((member.name, member.download_as_bytes()))
+        assert fingerprint(member)["content_hash"]
+        member.release()
+    assert seen == [("estate.tar.gz/ddl/t.sql", MEMBERS["ddl/t.sql"]), ("estate.tar.gz/wf/m.xml", b"<A/>")]
+
+
+def test_unsupported_or_missing_archives(tmp_path):
+    assert is_archive("x.TGZ") and not is_archive("x.sql")
+    with pytest.raises(ValueError):
+        open_archive(str(tmp_path / "missing.zip"))
+    other = tmp_path / "estate.rar"
+    other.write_bytes(b"")
+    with pytest.raises(ValueError):
+        open_archive(str(other))
@@ -0,0 +1,28 @@
+import io
+
+from src.blob_cache import BlobContentCache, CacheCounters, CachedBlob
+from src.storage import LocalStorageClient
+
+
+def _listed_blob(tmp_path, data):
+    client = LocalStorageClient(str(tmp_path / "gcs"))
+    client.create_bucket("src").blob("exports/m_big.XML").upload_from_string(data)
+    return next(iter(client.list_blobs("src")))
+
+
+def test_open_on_a_miss_streams_into_the_cache(tmp_path):
+    data = b"<POWERMART>" + b"<X/>" * 10000 + b"</POWERMART>"
+    blob = _listed_blob(tmp_path, data)
+    blob.download_as_bytes = None  # a miss must not load the whole object into memory
+    cache = BlobContentCache(str(tmp_path / "cache"))
+    counters = CacheCounters()
+
+    with CachedBlob(blob, "src", cache, counters).open("rb") as stream:
+        assert not isinstance(stream, io.BytesIO)
+        assert stream.read() == data
+    assert counters.to_dict() == {"hits": 0, "misses": 1, "bytes_downloaded": len(data)}
+
+    with CachedBlob(blob, "src", cache, counters).open("rb") as stream:
+        assert stream.read() == data
+    assert counters.to_dict()["hits"] == 1
+    assert cache.stats()["bytes"] == len(data)
@@ -0,0 +1,46 @@
+from src.chunking import merge_partial_analyses, pack_units, split_informatica_xml, split_sql
+from src.rate_limiter import estimate_tokens
+
+
+def test_oversized_single_line_is_cut_to_the_budget():
+    content = "<MAPPING NAME='m'>" + "<X A='1'/>" * 5000 + "</MAPPING>"
+    chunks = split_informatica_xml(content, max_tokens=1000)
+    assert len(chunks) > 1
+    assert "".join(chunks) == content
+    assert all(estimate_tokens(chunk) <= 1001 for chunk in chunks)
+
+
+def test_oversized_batch_without_boundaries_is_split_at_lines():
+    content = "".join(f"insert into t values ({i})\n" for i in range(2000))
+    chunks = split_sql(content, max_tokens=500)
+    assert len(chunks) > 1
+    assert "".join(chunks) == content
+
+
+def test_content_within_the_budget_stays_whole():
+    assert pack_units(["select 1\n"], 100) == ["select 1\n"]
+
+
+def test_engine_splits_unsplittable_oversized_content():
+    from src.analyzer import AnalysisEngine
+    from src.chunking import CHUNK_TOKEN_BUDGET
+
+    content = "x" * (CHUNK_TOKEN_BUDGET * 4 * 3)
+    stats = {"minified_tokens": estimate_tokens(content)}
+    chunks = AnalysisEngine._split_oversized(None, "big.XML", "informatica_xml", content, stats)
+    assert chunks and len(chunks) >= 3
+    assert all(estimate_tokens(chunk) <= CHUNK_TOKEN_BUDGET + 1 for chunk in chunks)
+
+
+def test_chunk_answers_merge_into_one_analysis():
+    merged = merge_partial_analyses([
+        {"procedure_name": "p", "tables_read": ["A"], "complexity": "LOW", "summary": "Loads A.",
+         "dependencies": {"calls": ["q"]}},
+        {"procedure_name": "p_part2", "tables_read": ["A", "B"], "complexity": "HIGH", "summary": "Loads B.",
+         "dependencies": {"calls": ["q", "r"], "reads": []}},
+        {"procedure_name": "", "complexity": "medium", "summary": "Loads B."},
+    ])
+    assert merged == {
+        "procedure_name": "p", "tables_read": ["A", "B"], "complexity": "HIGH",
+        "summary": "Loads A.\n\nLoads B.", "dependencies": {"calls": ["q", "r"], "reads": []},
+    }
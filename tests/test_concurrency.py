@@ -0,0 +1,47 @@
+import asyncio
+
+from src.concurrency import AdaptiveConcurrencyLimiter, is_backoff_error, run_sync
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_backoff_errors_are_recognised():
+    assert is_backoff_error(ResourceExhausted("429 Quota exceeded"))
+    assert not is_backoff_error(ValueError("bad prompt"))
+    assert not is_backoff_error(None)
+
+
+def test_quota_error_halves_the_limit_once_per_generation():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, max_limit=64)
+    tokens = [limiter.acquire_sync() for _ in range(2)]
+    limiter.release(tokens[0], 1.0, ResourceExhausted("429"))
+    limiter.release(tokens[1], 1.0, ResourceExhausted("429"))
+    assert limiter.limit == 4
+
+
+def test_healthy_calls_raise_the_limit_additively():
+    limiter = AdaptiveConcurrencyLimiter(initial=2, max_limit=64, target_latency=10)
+    for _ in range(10):
+        limiter.release(limiter.acquire_sync(), 0.1)
+    assert limiter.limit > 2
+
+
+def test_waiters_are_granted_slots_as_calls_finish():
+    limiter = AdaptiveConcurrencyLimiter(initial=1, max_limit=1)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        token = await limiter.acquire()
+        peak = max(peak, limiter.in_flight)
+        await asyncio.sleep(0.001)
+        limiter.release(token, 0.001)
+
+    async def run():
+        await asyncio.gather(*[call() for _ in range(5)])
+
+    run_sync(run())
+    assert peak == 1
+    assert limiter.in_flight == 0
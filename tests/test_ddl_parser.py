@@ -0,0 +1,37 @@
+from src.ddl_parser import DDLParser
+
+TABLE_DDL = '''
+CREATE TABLE "sybaseadmin"."D_AGE" (
+    "AGEID" "SMALL_IDENTIFIER" NOT NULL,
+    "AGE" "SMALL_NUMBER" NULL,
+    "AGEBAND" varchar(20) NULL,
+    PRIMARY KEY ( "AGEID" ASC )
+) IN "IQ_ACTIVE_MAIN";
+
+ALTER TABLE "sybaseadmin"."F_RATING" ADD CONSTRAINT "FK_RATING_AGE" FOREIGN KEY ( "AGEID" ) REFERENCES "sybaseadmin"."D_AGE" ( "AGEID" );
+
+CREATE UNIQUE HG INDEX "IDX_AGE_HG" ON "sybaseadmin"."D_AGE" ("AGE" ASC) IN "IQ_ACTIVE_MAIN";
+grant select on D_AGE to public
+'''
+
+
+def test_table_ddl_is_parsed_confidently():
+    analysis = DDLParser().parse_confident(TABLE_DDL)
+    assert analysis["table_name"] == "D_AGE"
+    assert [(c["name"], c["type"], c["nullable"]) for c in analysis["columns"]] == [
+        ("AGEID", "SMALL_IDENTIFIER", False), ("AGE", "SMALL_NUMBER", True), ("AGEBAND", "varchar(20)", True),
+    ]
+    assert analysis["primary_keys"] == ["AGEID"]
+    assert analysis["indexes"] == [{"name": "IDX_AGE_HG", "columns": ["AGE"], "index_type": "HG", "is_unique": True}]
+
+
+def test_unrecognised_statements_fall_back_to_the_llm():
+    ddl = TABLE_DDL + "create trigger trg on D_AGE for insert as print 'x'\nexec sp_something\n"
+    assert DDLParser().parse_confident(ddl) is None
+
+
+def test_several_tables_fall_back_to_the_llm():
+    ddl = "create table a (x int);\ncreate table b (y int);\n"
+    analysis, confidence, issues = DDLParser().parse(ddl)
+    assert analysis is None and confidence == 0.0
+    assert issues
@@ -0,0 +1,46 @@
+from src.dedup import ContentDeduplicator, content_fingerprint
+
+
+class FakeBlob:
+    def __init__(self, name, data):
+        self.name = name
+        self._data = data
+
+    def download_as_bytes(self):
+        return self._data
+
+
+def _categorize(name):
+    return "sybase_ddl" if name.endswith(".sql") else "informatica_xml" if name.endswith(".xml") else "other"
+
+
+def test_formatting_and_comment_differences_alias():
+    blobs = [
+        FakeBlob("input/t.sql", b"create table T (a int)\ngo\n"),
+        FakeBlob("poc/t.sql", b"-- copy\r\ncreate   table T (a int)\r\n\r\ngo\r\ngrant select on T to public\r\n"),
+        FakeBlob("input/m.xml", b"<A>\n  <B x='1'/>\n</A>"),
+        FakeBlob("poc/m.xml", b"<!-- saved --><A><B x='1'/></A>"),
+        FakeBlob("other.sql", b"create table U (a int)"),
+    ]
+    dedup = ContentDeduplicator(_categorize, workers=2)
+    unique, duplicates = dedup.dedupe(blobs)
+    assert [b.name for b in unique] == ["input/t.sql", "input/m.xml", "other.sql"]
+    assert duplicates == {"input/t.sql": ["poc/t.sql"], "input/m.xml": ["poc/m.xml"]}
+    report = dedup.report()
+    assert report["files_checked"] == 5 and report["content_duplicate_files"] == 2
+
+
+def test_file_type_is_part_of_the_fingerprint():
+    assert content_fingerprint("sybase_ddl", "x") != content_fingerprint("other", "x")
+
+
+def test_known_fingerprints_and_unreadable_files():
+    class Broken(FakeBlob):
+        def download_as_bytes(self):
+            raise OSError("gone")
+
+    known = {content_fingerprint("sybase_ddl", "create table T (a int)"): "baseline/t.sql"}
+    blobs = [FakeBlob("t.sql", b"create table T (a int)"), Broken("x.sql", b""), Broken("y.sql", b"")]
+    unique, duplicates = ContentDeduplicator(_categorize).dedupe(blobs, known)
+    assert [b.name for b in unique] == ["x.sql", "y.sql"]
+    assert duplicates == {"baseline/t.sql": ["t.sql"]}
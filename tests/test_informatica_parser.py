@@ -0,0 +1,53 @@
+import io
+
+from src.informatica_parser import parse_informatica_xml
+
+SESSION_EXPORT = b"""<?xml version="1.0"?>
+<POWERMART><REPOSITORY NAME="R"><FOLDER NAME="F">
+  <TASK NAME="cmd_Parse" REUSABLE="YES" TYPE="Command">
+    <ATTRIBUTE NAME="Fail task if any command fails" VALUE="NO"/>
+    <VALUEPAIR EXECORDER="1" NAME="Command1" VALUE="parse.pl $PMTargetFileDir"/>
+  </TASK>
+  <SESSION MAPPINGNAME="m_Rating" NAME="s_m_Rating" REUSABLE="YES">
+    <SESSTRANSFORMATIONINST SINSTANCENAME="SQ_Rating" TRANSFORMATIONNAME="SQ_Rating" TRANSFORMATIONTYPE="Source Qualifier">
+      <ATTRIBUTE NAME="Sql Query" VALUE="SELECT id FROM rating WHERE site = 1"/>
+      <ATTRIBUTE NAME="Tracing Level" VALUE="Normal"/>
+    </SESSTRANSFORMATIONINST>
+    <SESSIONCOMPONENT REFOBJECTNAME="cmd_Parse" REUSABLE="YES" TYPE="Post-session success command"/>
+  </SESSION>
+</FOLDER></REPOSITORY></POWERMART>
+"""
+
+WORKFLOW_EXPORT = b"""<?xml version="1.0"?>
+<POWERMART><REPOSITORY NAME="R"><FOLDER NAME="F">
+  <WORKFLOW NAME="wkf_Load">
+    <TASKINSTANCE NAME="Start" TASKNAME="Start" TASKTYPE="Start"/>
+    <TASKINSTANCE NAME="s_a" TASKNAME="s_a" TASKTYPE="Session"/>
+    <WORKFLOWLINK FROMTASK="Start" TOTASK="s_a" CONDITION="$Start.Status = SUCCEEDED"/>
+  </WORKFLOW>
+</FOLDER></REPOSITORY></POWERMART>
+"""
+
+
+def test_session_export_is_named_after_its_mapping():
+    extract = parse_informatica_xml(io.BytesIO(SESSION_EXPORT))
+    assert extract.to_analysis()["mapping_name"] == "m_Rating"
+
+
+def test_session_overrides_and_commands_reach_the_logic_chunks():
+    chunks = parse_informatica_xml(io.BytesIO(SESSION_EXPORT)).logic_chunks()
+    assert len(chunks) == 1
+    assert "Sql Query: SELECT id FROM rating WHERE site = 1" in chunks[0]
+    assert "Command1: parse.pl $PMTargetFileDir" in chunks[0]
+    assert "runs cmd_Parse" in chunks[0]
+    assert "Tracing Level" not in chunks[0]
+
+
+def test_workflow_export_has_logic_chunks():
+    chunks = parse_informatica_xml(io.BytesIO(WORKFLOW_EXPORT)).logic_chunks()
+    assert chunks and "Start -> s_a when $Start.Status = SUCCEEDED" in chunks[0]
+
+
+def test_other_xml_is_empty():
+    extract = parse_informatica_xml(io.BytesIO(b"<project><target name='build'/></project>"))
+    assert extract.is_empty()
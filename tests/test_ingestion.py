@@ -0,0 +1,22 @@
+from src.ingestion import BlobPrefetcher
+
+
+class FakeBlob:
+    def __init__(self, name, data):
+        self.name = name
+        self._data = data
+
+    def download_as_bytes(self):
+        return self._data
+
+
+def test_prefetcher_yields_in_order_and_counts_every_download():
+    blobs = [FakeBlob(f"f{i}.sql", b"x" * i) for i in range(500)]
+    prefetcher = BlobPrefetcher(blobs, workers=16, buffer_size=32)
+    names = []
+    for blob in prefetcher:
+        names.append(blob.name)
+        blob.release()
+    assert names == [blob.name for blob in blobs]
+    assert prefetcher.files_downloaded == 500
+    assert prefetcher.bytes_downloaded == sum(range(500))
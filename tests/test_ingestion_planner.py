@@ -0,0 +1,43 @@
+from src.ingestion_planner import IngestionPlanner, parse_globs
+
+
+class FakeBlob:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+def _categorize(name):
+    name = name.lower()
+    return "sybase_ddl" if name.endswith(".sql") else "informatica_xml" if name.endswith(".xml") else "unknown"
+
+
+def test_filters_and_orders_largest_first():
+    blobs = [FakeBlob("ddl/a.sql", 10), FakeBlob("ddl/B.SQL", 30), FakeBlob("wf/m.xml", 50),
+             FakeBlob("ddl/tmp/c.sql", 99), FakeBlob("readme.txt", 5), FakeBlob("ddl/d.sql", 30)]
+    planner = IngestionPlanner(_categorize, include="ddl/*,wf/*", exclude=["*/tmp/*"])
+    planned = planner.plan(blobs)
+    assert [b.name for b in planned] == ["wf/m.xml", "ddl/B.SQL", "ddl/d.sql", "ddl/a.sql"]
+    summary = planner.summary()
+    assert summary["files_seen"] == 6 and summary["files_planned"] == 4 and summary["bytes_planned"] == 120
+    assert summary["skipped"] == {"not_included": 1, "excluded": 1}
+
+
+def test_unknown_types_and_listing_order_options():
+    blobs = [FakeBlob("a.sql", 1), FakeBlob("notes.txt", 2), FakeBlob("b.sql", 3)]
+    planner = IngestionPlanner(_categorize, include=[], exclude=[], skip_unknown=False, largest_first=False)
+    assert planner.plan(blobs) == blobs
+    planner = IngestionPlanner(_categorize, include=[], exclude=[])
+    assert [b.name for b in planner.plan(blobs)] == ["b.sql", "a.sql"]
+    assert planner.skipped_examples == {"unknown_type": ["notes.txt"]}
+
+
+def test_streamed_order_is_per_window():
+    blobs = [FakeBlob(f"{i}.sql", size) for i, size in enumerate([1, 3, 2, 9, 8, 7, 5])]
+    planner = IngestionPlanner(_categorize, include=[], exclude=[], window=3)
+    assert [b.size for b in planner.iter_ordered(blobs)] == [3, 2, 1, 9, 8, 7, 5]
+
+
+def test_parse_globs():
+    assert parse_globs(" *.sql, ,*.xml ") == ["*.sql", "*.xml"]
+    assert parse_globs(None) == []
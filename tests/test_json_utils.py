@@ -0,0 +1,61 @@
+import json
+
+from src.json_utils import IncrementalJSONParser, is_partial, recover_truncated_json, safe_parse_json
+from src.models import Table, analysis_object, is_partial_object
+
+
+def test_string_cut_off_in_an_array_is_dropped():
+    assert recover_truncated_json('{"source_tables":["A","B') == ({"source_tables": ["A"]}, True)
+
+
+def test_complete_string_before_the_cut_is_kept():
+    assert recover_truncated_json('{"source_tables":["A","B"') == ({"source_tables": ["A", "B"]}, True)
+
+
+def test_value_cut_off_mid_string_drops_its_key():
+    assert recover_truncated_json('{"a":"x","b":"ab') == ({"a": "x"}, True)
+
+
+def test_array_element_cut_off_is_dropped_not_kept_as_a_fragment():
+    text = '{"table_name":"CUSTOMER","columns":[{"name":"id","type":"INT"},{"name":"st'
+    value, truncated = recover_truncated_json(text)
+    assert truncated
+    assert value == {"table_name": "CUSTOMER", "columns": [{"name": "id", "type": "INT"}]}
+
+
+def test_cut_off_element_of_a_top_level_array_is_dropped():
+    assert recover_truncated_json('[{"name":"a"},{"name":"b","ty') == ([{"name": "a"}], True)
+
+
+def test_truncated_table_is_marked_partial_on_its_typed_object():
+    parsed = safe_parse_json('{"table_name":"CUSTOMER","columns":[{"name":"id","type":"INT"},{"name":"st')
+    assert is_partial(parsed)
+    table = analysis_object({"parsed": parsed})
+    assert isinstance(table, Table)
+    assert [column.name for column in table.columns] == ["id"]
+    assert is_partial_object(table)
+
+
+def _stream(text, size):
+    parser = IncrementalJSONParser()
+    fields = []
+    for i in range(0, len(text), size):
+        fields += parser.feed(text[i:i + size])
+    return parser, fields
+
+
+def test_streamed_fields_do_not_depend_on_chunk_size():
+    text = 'Here:\n```json\n{"table_name": "T", "columns": [{"name": "a\\",}"}], "bad": tru, "n": {"x": [1]}}\n```'
+    expected = [("table_name", "T"), ("columns", [{"name": 'a",}'}]), ("bad", "tru"), ("n", {"x": [1]})]
+    for size in (1, 2, 7, 40, len(text)):
+        parser, fields = _stream(text, size)
+        assert fields == expected and parser.done
+
+
+def test_streamed_text_is_released_once_fields_complete():
+    columns = [{"name": f"col_{i}", "type": "varchar(40)"} for i in range(2000)]
+    text = json.dumps({"table_name": "T", "columns": columns, "summary": "s" * 50})
+    parser, fields = _stream(text[:-20], 40)
+    assert [key for key, _ in fields] == ["table_name", "columns"]
+    # Only the unfinished "summary" field is still buffered, not the columns before it
+    assert len("".join(parser._pieces)) < 100
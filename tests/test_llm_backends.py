@@ -0,0 +1,32 @@
+import asyncio
+import sys
+import types
+
+from src import llm_backends
+
+
+def _fake_vertexai(monkeypatch):
+    class GenerativeModel:
+        def __init__(self, model_name):
+            self.model_name = model_name
+
+    vertexai = types.ModuleType("vertexai")
+    vertexai.init = lambda **kwargs: None
+    generative_models = types.ModuleType("vertexai.generative_models")
+    generative_models.GenerativeModel = GenerativeModel
+    vertexai.generative_models = generative_models
+    monkeypatch.setitem(sys.modules, "vertexai", vertexai)
+    monkeypatch.setitem(sys.modules, "vertexai.generative_models", generative_models)
+    monkeypatch.setattr(llm_backends, "_shared_models", {})
+
+
+def test_async_model_is_not_shared_across_event_loops(monkeypatch):
+    _fake_vertexai(monkeypatch)
+
+    async def model_pair():
+        return (llm_backends.get_loop_model("p", "l", "m"), llm_backends.get_loop_model("p", "l", "m"))
+
+    first_a, first_b = asyncio.run(model_pair())
+    second, _ = asyncio.run(model_pair())
+    assert first_a is first_b
+    assert second is not first_a
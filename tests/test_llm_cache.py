@@ -0,0 +1,23 @@
+from src.llm_cache import LLMResponseCache, make_cache_key
+
+
+def test_key_covers_model_prompt_and_generation_config():
+    key = make_cache_key("m", "p", {"temperature": 0})
+    assert key == make_cache_key("m", "p", {"temperature": 0})
+    assert key != make_cache_key("other", "p", {"temperature": 0})
+    assert key != make_cache_key("m", "p", {"temperature": 1})
+    assert make_cache_key("m", "p") == make_cache_key("m", "p", {})
+
+
+def test_responses_persist_across_instances(tmp_path):
+    key = make_cache_key("m", "prompt")
+    LLMResponseCache(str(tmp_path)).put(key, "m", "answer")
+    assert LLMResponseCache(str(tmp_path)).get(key) == "answer"
+    assert LLMResponseCache(str(tmp_path)).get(make_cache_key("m", "other")) is None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), max_age_days=1e-9)
+    key = make_cache_key("m", "prompt")
+    cache.put(key, "m", "answer")
+    assert cache.get(key) is None
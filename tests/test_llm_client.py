@@ -0,0 +1,60 @@
+import asyncio
+import sqlite3
+
+from src.llm_backends import LLMBackend, LLMResponse
+from src.llm_client import LLMClient
+
+
+class EchoBackend(LLMBackend):
+    name = "echo"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, model_name, prompt, generation_config):
+        self.calls += 1
+        return LLMResponse(f"answer to {prompt}")
+
+    async def agenerate(self, model_name, prompt, generation_config):
+        return self.generate(model_name, prompt, generation_config)
+
+
+class LockedCache:
+    def get(self, key):
+        raise sqlite3.OperationalError("database is locked")
+
+    def put(self, key, model_name, text):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_unreadable_cache_is_a_miss():
+    backend = EchoBackend()
+    client = LLMClient("test-project", cache=LockedCache(), backend=backend)
+    assert client.generate_content("q") == "answer to q"
+    assert backend.calls == 1
+    assert client.cache_stats()["misses"] == 1
+
+
+class SlowBackend(EchoBackend):
+    async def agenerate(self, model_name, prompt, generation_config):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return LLMResponse(f"answer to {prompt}")
+
+
+def test_cancelled_leader_hands_the_prompt_to_its_followers():
+    backend = SlowBackend()
+    client = LLMClient("test-project", cache=None, backend=backend)
+
+    async def run():
+        leader = asyncio.create_task(client.agenerate_content("same prompt"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(client.agenerate_content("same prompt"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader
+
+    text, leader = asyncio.run(run())
+    assert leader.cancelled()
+    assert text == "answer to same prompt"
+    assert backend.calls == 2
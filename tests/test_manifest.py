@@ -0,0 +1,54 @@
+from src.manifest import AnalysisManifest, fingerprint
+
+
+class FakeBlob:
+    def __init__(self, name, md5, generation=1, size=10):
+        self.name = name
+        self.md5_hash = md5
+        self.generation = generation
+        self.size = size
+
+
+def _manifest(blobs, source_system="sybase", result=None):
+    manifest = AnalysisManifest("run-1", source_system)
+    for blob in blobs:
+        manifest.record(blob.name, blob.name, fingerprint(blob), result or {"analysis": "{}", "parsed": {"a": 1}})
+    return manifest
+
+
+def test_round_trip_and_partition(tmp_path):
+    path = str(tmp_path / "analysis_manifest.json")
+    _manifest([FakeBlob("a.sql", "m1"), FakeBlob("b.sql", "m2"), FakeBlob("gone.sql", "m3")]).write(path)
+    manifest = AnalysisManifest.load(path)
+
+    changed = FakeBlob("b.sql", "m2-new", generation=2)
+    added = FakeBlob("c.sql", "m4")
+    reused, pending, fingerprints, removed = manifest.partition(
+        [FakeBlob("a.sql", "m1"), changed, added], "sybase")
+    assert list(reused) == ["a.sql"]
+    assert pending == [changed, added]
+    assert set(fingerprints) == {"a.sql", "b.sql", "c.sql"}
+    assert removed == ["gone.sql"]
+
+
+def test_other_source_system_reuses_nothing():
+    blob = FakeBlob("a.sql", "m1")
+    reused, pending, _, _ = _manifest([blob]).partition([blob], "oracle")
+    assert reused == {} and pending == [blob]
+
+
+def test_errors_and_truncated_answers_are_retried():
+    blob = FakeBlob("a.sql", "m1")
+    for result in ({"analysis": "Error: quota"},
+                   {"analysis": '{"table_name": "T", "columns": [{"name": "a"'}):
+        reused, pending, _, _ = _manifest([blob], result=result).partition([blob], "sybase")
+        assert reused == {} and pending == [blob]
+
+
+def test_unreadable_or_old_manifest_is_ignored(tmp_path):
+    path = tmp_path / "analysis_manifest.json"
+    assert AnalysisManifest.load(str(path)) is None
+    path.write_text("{not json")
+    assert AnalysisManifest.load(str(path)) is None
+    path.write_text('{"version": 0, "files": {}}')
+    assert AnalysisManifest.load(str(path)) is None
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import src.pipeline as pipeline
+from src.models import Mapping, Table, analysis_object, build_object
+from src.pipeline import StagePipeline
+
+DOMAINS = [{"name": "Sales"}]
+
+
+def _table(name):
+    data = {"table_name": name, "columns": [{"name": "id", "type": "int"}]}
+    return {"type": "sybase_ddl", "analysis": json.dumps(data), "parsed": build_object(data)}
+
+
+def _mapping(name):
+    data = {"mapping_name": name, "sources": ["A"], "targets": ["B"], "transformations": [], "logic_summary": "x"}
+    return {"type": "informatica_xml", "analysis": json.dumps(data), "parsed": build_object(data)}
+
+
+class Recorder:
+    """Calls per stage and file, shared by the stubs (some run on worker threads)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.analysis_done = False
+        self.domains_inferred = False
+        # Tables translated with domains that weren't inferred yet
+        self.translated_early = []
+
+    def record(self, stage, name):
+        with self.lock:
+            self.calls.append((stage, name))
+
+    def names(self, stage):
+        return sorted(name for s, name in self.calls if s == stage)
+
+
+class FakeBlob:
+    def __init__(self, name):
+        self.name = name
+
+
+class StubAnalyzer:
+    def __init__(self, recorder, reused):
+        self.recorder = recorder
+        self.reused = reused
+        self.stages_ran_during_analysis = False
+
+    async def _analyze_async(self, blobs, status, on_result):
+        results = {}
+        for blob in blobs:
+            results[blob.name] = _mapping("m_load") if blob.name.endswith(".xml") else _table(blob.name[4:5].upper())
+            await on_result(blob.name, results[blob.name])
+            if blob.name == "etl/m_load.xml":
+                # Per-file stages must pick up these results while analysis is still running
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline and not self._stages_started():
+                    await asyncio.sleep(0.01)
+                self.stages_ran_during_analysis = self._stages_started()
+        # A streamed source finds an unchanged file while it is read
+        self.reused["ddl/d.sql"] = _table("D")
+        self.recorder.analysis_done = True
+        return results
+
+    def _stages_started(self):
+        calls = list(self.recorder.calls)
+        return ("validation", "ddl/a.sql") in calls and ("informatica_sql", "m_load") in calls
+
+
+class StubValidator:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    async def _generate_tests_for_file(self, filename, result, status):
+        self.recorder.record("validation", filename)
+        return filename, {"tests": []}
+
+    def _save_results(self, definitions):
+        self.recorder.record("validation_saved", len(definitions))
+
+    def _generate_report(self, definitions):
+        pass
+
+
+class StubConverter:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def _prepare_output_dirs(self):
+        pass
+
+    def _classify_mapping(self, filename, result):
+        self.recorder.record("classified", filename)
+        mapping = analysis_object(result)
+        return ("mapping", mapping) if isinstance(mapping, Mapping) else (None, None)
+
+    def _transformation_sql(self, filename, mapping):
+        self.recorder.record("informatica_sql", mapping.name)
+        return "select 1"
+
+    def _create_transformation_sqlx(self, name, sql, sources, targets, categorization_results):
+        self.recorder.record("sqlx", name)
+
+    def _generate_shared_objects_doc(self, shared):
+        pass
+
+
+class StubTranslator:
+    def __init__(self, recorder, categorizing):
+        self.recorder = recorder
+        self.categorizing = categorizing
+
+    def _create_informatica_converter(self):
+        return StubConverter(self.recorder)
+
+    def _create_dataform_structure(self):
+        pass
+
+    def _translate_categorized_table(self, table, categorizations, domains):
+        assert isinstance(table, Table)
+        if self.categorizing and not self.recorder.domains_inferred or domains != DOMAINS:
+            self.recorder.translated_early.append(table.name)
+        self.recorder.record("translation", table.name)
+
+    def _write_type_mapping_report(self):
+        pass
+
+
+class StubCategorizer:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def _infer_domains(self, stage_results):
+        self.recorder.record("domains", len(stage_results))
+        # Slow enough that a table released early would be translated first
+        time.sleep(0.05)
+        self.recorder.domains_inferred = True
+        return DOMAINS
+
+    def _format_domains(self, domains):
+        return "Sales"
+
+    def _table_batches(self, stage_results):
+        # D has no batch, like a table without columns
+        return [[{"table": "A"}, {"table": "B"}], [{"table": "C"}]]
+
+    def _categorize_batch(self, batch, domain_list):
+        assert self.recorder.domains_inferred
+        self.recorder.record("categorized_batch", batch[0]["table"])
+        return {t["table"]: {"domain": "Sales"} for t in batch}
+
+    def _save_results(self, domains, categorizations):
+        self.recorder.record("categorization_saved", len(categorizations))
+
+    def _generate_report(self, domains, categorizations):
+        pass
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = Recorder()
+
+    class StubReporter:
+        def __init__(self, output_dir, source_system=None):
+            pass
+
+        def generate_report(self, results):
+            recorder.record("reporting", len(results))
+
+    class StubVisualizer:
+        def __init__(self, output_dir):
+            pass
+
+        def generate_dependency_diagram(self, results):
+            recorder.record("visualization", len(results))
+
+    monkeypatch.setattr(pipeline, "Reporter", StubReporter)
+    monkeypatch.setattr(pipeline, "Visualizer", StubVisualizer)
+    return recorder
+
+
+def _run(recorder, tmp_path, categorize):
+    reused = {"ddl/c.sql": _table("C"), "copy/a.sql": {**_table("A"), "duplicate_of": "ddl/a.sql"}}
+    analyzer = StubAnalyzer(recorder, reused)
+    stage = StagePipeline(
+        str(tmp_path), analyzer=analyzer, categorizer=StubCategorizer(recorder) if categorize else None,
+        translator=StubTranslator(recorder, categorize), validator=StubValidator(recorder),
+        # Without categorisation the run translates against an existing categorization
+        categorization_results=None if categorize else {"domains": DOMAINS, "categorizations": {}},
+        queue_size=1, workers=2,
+    )
+
+    def on_analysis_complete(results):
+        assert recorder.analysis_done
+        return results, {name: data for name, data in results.items() if not data.get("duplicate_of")}
+
+    pending = [FakeBlob("ddl/a.sql"), FakeBlob("etl/m_load.xml"), FakeBlob("ddl/b.sql")]
+    results = stage.run(pending, reused, on_analysis_complete)
+    return analyzer, stage, results
+
+
+def test_stages_stream_and_translation_waits_for_domains(recorder, tmp_path):
+    analyzer, stage, results = _run(recorder, tmp_path, categorize=True)
+
+    assert analyzer.stages_ran_during_analysis
+    assert set(results) == {"ddl/a.sql", "etl/m_load.xml", "ddl/b.sql", "ddl/c.sql", "ddl/d.sql", "copy/a.sql"}
+    files = ["ddl/a.sql", "ddl/b.sql", "ddl/c.sql", "ddl/d.sql", "etl/m_load.xml"]
+    # Every file once per stage; the ingestion duplicate shares its canonical file's result
+    assert recorder.names("validation") == files
+    assert recorder.names("classified") == files
+    assert recorder.names("informatica_sql") == ["m_load"]
+    assert recorder.names("sqlx") == ["m_load"]
+    assert recorder.names("translation") == ["A", "B", "C", "D"]
+    assert recorder.translated_early == []
+    assert recorder.names("domains") == [5]
+    assert recorder.names("reporting") == [6] and recorder.names("visualization") == [5]
+    assert stage.categorization_results["domains"] == DOMAINS
+    assert set(stage.categorization_results["categorizations"]) == {"A", "B", "C"}
+    assert stage.stage_spans["validation"][0] < stage.stage_spans["analysis"][1]
+
+
+def test_tables_translate_per_file_without_categorization(recorder, tmp_path):
+    _run(recorder, tmp_path, categorize=False)
+    assert recorder.names("translation") == ["A", "B", "C", "D"]
+    assert recorder.translated_early == []
+    assert recorder.names("validation") == ["ddl/a.sql", "ddl/b.sql", "ddl/c.sql", "ddl/d.sql", "etl/m_load.xml"]
+    assert recorder.names("domains") == []
@@ -0,0 +1,20 @@
+from src.preprocess import minify_sql
+
+
+def test_grant_without_semicolon_keeps_following_batches():
+    sql = "create table T (a int not null)\ngo\ngrant select on T to public\ngo\nsp_primarykey T, a\ngo\n"
+    assert minify_sql(sql) == "create table T (a int not null)\nsp_primarykey T, a"
+
+
+def test_grant_without_semicolon_keeps_go_lines_for_chunking():
+    sql = "create table T (a int)\ngo\ngrant select on T to public\ngo\nsp_primarykey T, a\ngo\n"
+    assert minify_sql(sql, keep_batches=True) == "create table T (a int)\ngo\ngo\nsp_primarykey T, a\ngo"
+
+
+def test_multi_line_grant_is_removed_up_to_the_next_statement():
+    sql = "create table T (a int)\ngrant select,\n  insert\n  on T\n  to public\ncreate index i on T(a)\n"
+    assert minify_sql(sql) == "create table T (a int)\ncreate index i on T(a)"
+
+
+def test_grant_ends_at_semicolon():
+    assert minify_sql("grant all on T to dbo; select 1\nrevoke select on T from bob\n") == "select 1"
@@ -0,0 +1,89 @@
+import pytest
+
+from src.procedure_analyzer import ProcedureAnalyzer
+
+# (name, procedure body, expected subset of the analysis)
+CASES = [
+    ("insert_into_column_list", "insert into tgt (a, b) select a, b from src",
+     {"tables_modified": ["tgt"], "tables_read": ["src"], "temp_tables": []}),
+    ("insert_column_list_values", "insert tgt (a, b) values (1, 2)",
+     {"tables_modified": ["tgt"], "tables_read": [], "temp_tables": []}),
+    ("insert_into_temp_column_list", "insert into #tmp (a) select a from src",
+     {"tables_modified": [], "tables_read": ["src"], "temp_tables": ["#tmp"]}),
+    ("create_temp_table", "create table #work (id int, name varchar(30))",
+     {"tables_modified": [], "temp_tables": ["#work"]}),
+    ("select_into", "select a into #copy from dbo.src",
+     {"tables_modified": [], "tables_read": ["src"], "temp_tables": ["#copy"]}),
+    ("function_in_from_is_not_a_table", "select * from tgt where id in (select max(id) from hist)",
+     {"tables_read": ["tgt", "hist"], "tables_modified": []}),
+    ("truncate_table", "truncate table stage_t",
+     {"tables_modified": ["stage_t"]}),
+    ("update_alias_resolved", "update t set a = s.a from tgt t join src s on t.id = s.id",
+     {"tables_modified": ["tgt"], "tables_read": ["tgt", "src"]}),
+    ("delete_alias_resolved", "delete t from tgt t join src s on t.id = s.id",
+     {"tables_modified": ["tgt"], "tables_read": ["tgt", "src"]}),
+    ("merge", "merge into dw.tgt as t using src s on t.id = s.id "
+              "when matched then update set a = s.a when not matched then insert (id) values (s.id);",
+     {"tables_modified": ["tgt"], "tables_read": ["src"]}),
+    ("exec_dependencies", "exec dbo.log_event 1\nexecute @rc = audit..write_log @id",
+     {"dependencies": ["log_event", "write_log"], "dynamic_sql": False}),
+    ("exec_dynamic_sql", "exec (@sql)",
+     {"dependencies": [], "dynamic_sql": True}),
+    ("sp_executesql_is_dynamic_sql", "exec sp_executesql @sql, N'@id int', @id",
+     {"dependencies": [], "dynamic_sql": True}),
+    ("delete_from_at_end_of_body", "delete from",
+     {"tables_modified": [], "tables_read": []}),
+    ("update_at_end_of_body", "update",
+     {"tables_modified": []}),
+    ("on_delete_cascade_is_not_a_delete", "create table #t (id int references parent(id) on delete cascade)",
+     {"tables_modified": [], "temp_tables": ["#t"]}),
+    ("on_update_cascade_is_not_an_update", "create table work_t (id int references parent(id) on update cascade)",
+     {"tables_modified": ["work_t"]}),
+]
+
+# (name, parameter list, expected parameters)
+PARAMETER_CASES = [
+    ("output_after_default", "@x int = 0 output, @y varchar(10) = 'a'",
+     [{"name": "@x", "type": "int", "direction": "OUT"}, {"name": "@y", "type": "varchar(10)", "direction": "IN"}]),
+    ("out_without_default", "@total numeric(12,2) out",
+     [{"name": "@total", "type": "numeric(12, 2)", "direction": "OUT"}]),
+]
+
+
+def _procedure(body: str) -> str:
+    return f"create procedure p_check @id int\nas\nbegin\n{body}\nend\n"
+
+
+@pytest.mark.parametrize("name, body, expected", CASES, ids=[case[0] for case in CASES])
+def test_lineage(name, body, expected):
+    analysis = ProcedureAnalyzer().analyze_file(_procedure(body))
+    assert {key: analysis.get(key) for key in expected} == expected
+
+
+@pytest.mark.parametrize("name, parameters, expected", PARAMETER_CASES, ids=[case[0] for case in PARAMETER_CASES])
+def test_parameters(name, parameters, expected):
+    analysis = ProcedureAnalyzer().analyze_file(f"create procedure p_check {parameters}\nas\nselect 1\n")
+    assert analysis["parameters"] == expected
+
+
+@pytest.mark.parametrize("source", [
+    "create proc p as delete from",
+    "create proc p as delete top",
+    "create proc p as update",
+    "create proc p as exec @rc =",
+])
+def test_statement_cut_off_at_end_of_file(source):
+    analysis = ProcedureAnalyzer().analyze_file(source)
+    assert analysis["tables_modified"] == []
+    assert analysis["dependencies"] == []
+
+
+@pytest.mark.parametrize("source", [
+    "CREATE PROCEDURE load_sales(IN p_id INT) BEGIN INSERT INTO sales_fact SELECT * FROM staging_sales; "
+    "CALL log_event(1); END",
+    "create proc p begin insert into t select a as b from s end",
+    "create proc p as begin end",
+    _procedure("select 1") + "create procedure p_other (IN x INT) BEGIN DELETE FROM t; END",
+])
+def test_procedures_without_a_tsql_body_fall_back_to_the_llm(source):
+    assert ProcedureAnalyzer().analyze_file(source) is None
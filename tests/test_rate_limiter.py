@@ -0,0 +1,31 @@
+from src.rate_limiter import TokenBucket, estimate_tokens
+
+
+def test_bucket_reports_the_wait_for_a_reservation_beyond_its_tokens():
+    bucket = TokenBucket(per_minute=600)
+    assert bucket.reserve(600, now=bucket._updated) == 0.0
+    # 60 more tokens at 10 tokens/second
+    assert bucket.reserve(60, now=bucket._updated) == 6.0
+
+
+def test_oversized_request_is_capped_at_the_bucket_capacity():
+    bucket = TokenBucket(per_minute=100)
+    assert bucket.reserve(10_000, now=bucket._updated) == 0.0
+
+
+def test_disabled_bucket_never_waits():
+    bucket = TokenBucket(per_minute=0)
+    assert not bucket.enabled
+    assert bucket.reserve(1_000_000, now=0.0) == 0.0
+
+
+def test_reconcile_credits_overestimated_tokens():
+    bucket = TokenBucket(per_minute=600)
+    bucket.reserve(600, now=bucket._updated)
+    bucket.adjust(60, now=bucket._updated)
+    assert bucket.reserve(60, now=bucket._updated) == 0.0
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("x" * 400) == 101